@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Open Omeka SQL dumps for the extraction scripts
+Reads huginn_shoebox.sql as-is or straight from a .sql.gz / .sql.bz2 /
+.sql.xz / .sql.zst backup without decompressing it to disk first.
+Compressed dumps are decompressed ahead of the parser in a background thread.
+"""
+
+import bz2
+import gzip
+import io
+import lzma
+import queue
+import threading
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:  # only needed for .zst dumps
+    zstandard = None
+
+COMPRESSED_SUFFIXES = ('.gz', '.bz2', '.xz', '.zst')
+CHUNK_SIZE = 1024 * 1024  # bytes handed from the decompression thread at a time
+QUEUE_DEPTH = 8           # chunks decompressed ahead of the parser
+
+def _open_compressed(path):
+    """Open a compressed dump as a binary stream, or return None for plain files"""
+    suffix = path.suffix.lower()
+    if suffix == '.gz':
+        return gzip.open(path, 'rb')
+    if suffix == '.bz2':
+        return bz2.open(path, 'rb')
+    if suffix == '.xz':
+        return lzma.open(path, 'rb')
+    if suffix == '.zst':
+        if zstandard is None:
+            raise RuntimeError(f"Reading {path.name} needs the zstandard package "
+                               f"(pip install zstandard)")
+        # Dumps compressed in parts (zstd of concatenated files, pzstd) have
+        # several frames; the reader otherwise stops after the first one
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True,
+                                                          read_across_frames=True)
+    return None
+
+class ThreadedReader(io.RawIOBase):
+    """Binary stream whose data is read from `source` by a background thread"""
+
+    def __init__(self, source):
+        super().__init__()
+        self._source = source
+        self._queue = queue.Queue(maxsize=QUEUE_DEPTH)
+        self._stop = threading.Event()
+        self._chunk = memoryview(b'')
+        self._eof = False
+        self._thread = threading.Thread(target=self._pump, daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        # Time out periodically so close() can stop a producer blocked on a full queue
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _pump(self):
+        try:
+            while not self._stop.is_set():
+                chunk = self._source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                self._put(chunk)
+        except Exception as e:
+            self._put(e)
+        finally:
+            self._put(None)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self._chunk:
+            if self._eof:
+                return 0
+            item = self._queue.get()
+            if item is None:
+                self._eof = True
+                return 0
+            if isinstance(item, Exception):
+                self._eof = True
+                raise item
+            self._chunk = memoryview(item)
+
+        n = min(len(buffer), len(self._chunk))
+        buffer[:n] = self._chunk[:n]
+        self._chunk = self._chunk[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._stop.set()
+            self._thread.join()
+            self._source.close()
+        super().close()
+
+def find_dump(sql_file):
+    """
+    Return the dump to read for `sql_file`
+    If the plain .sql file is missing, falls back to a compressed sibling
+    (huginn_shoebox.sql -> huginn_shoebox.sql.gz, .bz2, .xz, .zst).
+    """
+    path = Path(sql_file)
+    if path.exists():
+        return path
+    for suffix in COMPRESSED_SUFFIXES:
+        candidate = path.with_name(path.name + suffix)
+        if candidate.exists():
+            return candidate
+    raise FileNotFoundError(f"No SQL dump found at {path} (or {path.name}.gz/.bz2/.xz/.zst)")
+
+def open_dump(sql_file, encoding='utf-8'):
+    """Open a (possibly compressed) SQL dump as a text stream"""
+    path = find_dump(sql_file)
+    source = _open_compressed(path)
+    if source is None:
+        return open(path, 'r', encoding=encoding)
+
+    print(f"Streaming compressed dump {path.name}")
+    raw = ThreadedReader(source)
+    return io.TextIOWrapper(io.BufferedReader(raw, CHUNK_SIZE), encoding=encoding)
@@ -3,15 +3,14 @@
 Extract letters from Omeka SQL dump and convert to JSON flat files
 """
 
-import json
+import argparse
 import re
-import os
 
-def parse_sql_inserts(sql_file, table_name):
-    """Extract INSERT statements for a specific table"""
-    with open(sql_file, 'r', encoding='utf-8') as f:
-        content = f.read()
+from dump_reader import open_dump
+from letter_sync import LetterSync, add_sync_arguments
 
+def parse_sql_inserts(content, table_name):
+    """Extract INSERT statements for a specific table"""
     # Find INSERT statements for this table
     pattern = rf"INSERT INTO `{table_name}` VALUES (.+?);"
     matches = re.findall(pattern, content, re.DOTALL)
@@ -73,28 +72,37 @@ def parse_row_values(row_str):
 
     return values
 
+parser = add_sync_arguments(argparse.ArgumentParser(description=__doc__))
+parser.add_argument('sql_file', nargs='?', default='../huginn_shoebox.sql',
+                    help='SQL dump to read (.sql, .sql.gz, .sql.bz2, .sql.xz or .sql.zst)')
+args = parser.parse_args()
+
 # Read SQL file
-sql_file = '../huginn_shoebox.sql'
+sql_file = args.sql_file
 print("Extracting data from SQL file...\n")
 
+# Read the dump once and reuse it for every table
+with open_dump(sql_file) as f:
+    content = f.read()
+
 # Extract tables
 print("Extracting items...")
-items = parse_sql_inserts(sql_file, 'omeka_items')
+items = parse_sql_inserts(content, 'omeka_items')
 
 print("Extracting element_texts...")
-element_texts = parse_sql_inserts(sql_file, 'omeka_element_texts')
+element_texts = parse_sql_inserts(content, 'omeka_element_texts')
 
 print("Extracting elements...")
-elements = parse_sql_inserts(sql_file, 'omeka_elements')
+elements = parse_sql_inserts(content, 'omeka_elements')
 
 print("Extracting tags...")
-tags = parse_sql_inserts(sql_file, 'omeka_tags')
+tags = parse_sql_inserts(content, 'omeka_tags')
 
 print("Extracting taggings...")
-taggings = parse_sql_inserts(sql_file, 'omeka_taggings')
+taggings = parse_sql_inserts(content, 'omeka_taggings')
 
 print("Extracting files...")
-files = parse_sql_inserts(sql_file, 'omeka_files')
+files = parse_sql_inserts(content, 'omeka_files')
 
 print(f"\nFound:")
 print(f"  {len(items)} items")
@@ -116,6 +124,7 @@ for tag in tags:
 
 # Process each item
 print("\nProcessing letters...")
+sync = LetterSync.from_args('letters', args)
 count = 0
 
 for item in items:
@@ -168,14 +177,12 @@ for item in items:
             })
     letter['files'] = letter_files
 
-    # Write to JSON file
-    filename = f'letters/{item_id:04d}.json'
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(letter, f, indent=2, ensure_ascii=False)
+    # Write to JSON file (skipped if unchanged since the last extraction)
+    sync.write(letter)
 
     count += 1
     if count % 10 == 0:
         print(f"Processed {count} letters...")
 
-print(f"\n✓ Extracted {count} letters to JSON files in explore/letters/")
-print(f"✓ Each letter saved as XXXX.json (e.g., 0001.json, 0002.json)")
+print(f"\n✓ Extracted {count} letters from the dump")
+sync.finish()
@@ -4,10 +4,12 @@ Extract letters from Omeka SQL dump and convert to JSON flat files
 Uses SQLite to parse MySQL dump
 """
 
-import json
+import argparse
 import sqlite3
 import re
-import os
+
+from dump_reader import open_dump
+from letter_sync import LetterSync, add_sync_arguments
 
 def convert_mysql_to_sqlite_line(line):
     """Convert MySQL syntax to SQLite compatible syntax"""
@@ -35,8 +37,13 @@ def convert_mysql_to_sqlite_line(line):
 
     return line
 
+parser = add_sync_arguments(argparse.ArgumentParser(description=__doc__))
+parser.add_argument('sql_file', nargs='?', default='../huginn_shoebox.sql',
+                    help='SQL dump to read (.sql, .sql.gz, .sql.bz2, .sql.xz or .sql.zst)')
+args = parser.parse_args()
+
 print("Reading SQL file...")
-sql_file = '../huginn_shoebox.sql'
+sql_file = args.sql_file
 
 # Create in-memory SQLite database
 conn = sqlite3.connect(':memory:')
@@ -45,7 +52,7 @@ cursor = conn.cursor()
 
 # Read and execute SQL
 print("Loading data into SQLite...")
-with open(sql_file, 'r', encoding='utf-8') as f:
+with open_dump(sql_file) as f:
     sql_commands = []
     current_command = []
 
@@ -89,6 +96,7 @@ items = cursor.fetchall()
 
 print(f"Found {len(items)} letters\n")
 
+sync = LetterSync.from_args('letters', args)
 count = 0
 for item in items:
     item_id, added, modified, public = item
@@ -143,16 +151,14 @@ for item in items:
         for row in cursor.fetchall()
     ]
 
-    # Write to JSON file
-    filename = f'letters/{item_id:04d}.json'
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(letter, f, indent=2, ensure_ascii=False)
+    # Write to JSON file (skipped if unchanged since the last extraction)
+    sync.write(letter)
 
     count += 1
     if count % 10 == 0:
         print(f"Processed {count} letters...")
 
-print(f"\n✓ Extracted {count} letters to JSON files in explore/letters/")
-print(f"✓ Each letter saved as XXXX.json (e.g., 0001.json, 0002.json)")
+print(f"\n✓ Extracted {count} letters from the dump")
+sync.finish()
 
 conn.close()
@@ -3,8 +3,15 @@
 /**
  * Extract letters from Omeka database and convert to JSON flat files
  * This version outputs JSON to stdout for remote execution
+ *
+ * With --ndjson (or ?format=ndjson) each letter is written as one JSON
+ * object per line as soon as it is built, so the caller can stream them
  */
 
+$ndjson = (isset($argv) && in_array('--ndjson', $argv, true))
+    || (isset($_GET['format']) && $_GET['format'] === 'ndjson');
+$jsonFlags = JSON_UNESCAPED_UNICODE | JSON_UNESCAPED_SLASHES;
+
 // Database connection
 $dbConfig = [
     'host' => 'mysql.huginn.net',
@@ -22,7 +29,8 @@ $mysqli = new mysqli(
 );
 
 if ($mysqli->connect_error) {
-    die(json_encode(['error' => 'Connection failed: ' . $mysqli->connect_error]));
+    $error = json_encode(['error' => 'Connection failed: ' . $mysqli->connect_error]);
+    die($ndjson ? $error . "\n" : $error);
 }
 
 $mysqli->set_charset('utf8');
@@ -116,11 +124,19 @@ while ($item = $result->fetch_assoc()) {
     }
     $letter['files'] = $files;
 
-    $letters[$itemId] = $letter;
+    if ($ndjson) {
+        // One letter per line, flushed immediately
+        echo json_encode($letter, $jsonFlags) . "\n";
+        flush();
+    } else {
+        $letters[$itemId] = $letter;
+    }
 }
 
 $mysqli->close();
 
 // Output all letters as JSON
-echo json_encode($letters, JSON_PRETTY_PRINT | JSON_UNESCAPED_UNICODE | JSON_UNESCAPED_SLASHES);
+if (!$ndjson) {
+    echo json_encode($letters, JSON_PRETTY_PRINT | $jsonFlags);
+}
 ?>
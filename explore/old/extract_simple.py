@@ -3,9 +3,12 @@
 Extract letters by parsing SQL INSERT statements directly
 """
 
-import json
+import argparse
 import re
 
+from dump_reader import open_dump
+from letter_sync import LetterSync, add_sync_arguments
+
 def unescape_sql_string(s):
     """Unescape SQL string escapes"""
     s = s.replace("\\'", "'")
@@ -89,8 +92,13 @@ def parse_insert_values(values_str):
 
     return rows
 
+parser = add_sync_arguments(argparse.ArgumentParser(description=__doc__))
+parser.add_argument('sql_file', nargs='?', default='../huginn_shoebox.sql',
+                    help='SQL dump to read (.sql, .sql.gz, .sql.bz2, .sql.xz or .sql.zst)')
+args = parser.parse_args()
+
 print("Reading SQL file...")
-sql_file = '../huginn_shoebox.sql'
+sql_file = args.sql_file
 
 # Read the SQL file and extract INSERT statements
 items_data = []
@@ -100,7 +108,7 @@ tags_data = []
 taggings_data = []
 files_data = []
 
-with open(sql_file, 'r', encoding='utf-8') as f:
+with open_dump(sql_file) as f:
     current_table = None
     collecting_insert = False
     insert_buffer = []
@@ -183,6 +191,7 @@ for tag in tags_data:
 print("Processing letters...")
 
 # Process each item
+sync = LetterSync.from_args('letters', args)
 count = 0
 for item in items_data:
     item_id = int(item[0])
@@ -234,14 +243,12 @@ for item in items_data:
             })
     letter['files'] = letter_files
 
-    # Write to JSON file
-    filename = f'letters/{item_id:04d}.json'
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(letter, f, indent=2, ensure_ascii=False)
+    # Write to JSON file (skipped if unchanged since the last extraction)
+    sync.write(letter)
 
     count += 1
     if count % 10 == 0:
         print(f"Processed {count} letters...")
 
-print(f"\n✓ Extracted {count} letters to JSON files in explore/letters/")
-print(f"✓ Each letter saved as XXXX.json (e.g., 0001.json, 0002.json)")
+print(f"\n✓ Extracted {count} letters from the dump")
+sync.finish()
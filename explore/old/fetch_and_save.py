@@ -1,46 +1,91 @@
 #!/usr/bin/env python3
 """
 Fetch JSON data from PHP extraction script and save to individual files
+The PHP script runs in --ndjson mode and emits one letter per line; letters
+are decoded as they arrive and written by a small pool of writer threads,
+so memory stays bounded and files land on disk while extraction is running.
 """
 
+import argparse
 import json
 import subprocess
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from letter_sync import LetterSync, add_sync_arguments
+
+WRITER_THREADS = 4
+MAX_PENDING_WRITES = WRITER_THREADS * 4  # letters decoded but not yet written
+
+parser = add_sync_arguments(argparse.ArgumentParser(description=__doc__))
+args = parser.parse_args()
 
 print("Extracting letters from database using PHP...")
 
-# Run the PHP script and capture output
-result = subprocess.run(
-    ['php', 'extract_letters_web.php'],
-    capture_output=True,
+# Run the PHP script and read its output line by line
+process = subprocess.Popen(
+    ['php', 'extract_letters_web.php', '--ndjson'],
+    stdout=subprocess.PIPE,
     text=True,
+    encoding='utf-8',
     cwd='/Users/kml8/shell/shoebox/explore'
 )
 
-if result.returncode != 0:
-    print(f"Error running PHP script: {result.stderr}")
-    exit(1)
+sync = LetterSync.from_args('letters', args)
+pending = threading.BoundedSemaphore(MAX_PENDING_WRITES)
+write_errors = []
+failed = False
 
-# Parse the JSON output
-try:
-    letters = json.loads(result.stdout)
-except json.JSONDecodeError as e:
-    print(f"Error parsing JSON: {e}")
-    print(f"Output was: {result.stdout[:500]}")
-    exit(1)
-
-print(f"Found {len(letters)} letters\n")
+def save_letter(letter):
+    try:
+        sync.write(letter)
+    except Exception as e:
+        write_errors.append(f"{letter.get('id')}: {e}")
+    finally:
+        pending.release()
 
-# Save each letter to its own file
+# Save each new or changed letter to its own file
 count = 0
-for item_id, letter in letters.items():
-    filename = f'letters/{int(item_id):04d}.json'
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(letter, f, indent=2, ensure_ascii=False)
+with ThreadPoolExecutor(max_workers=WRITER_THREADS) as writers:
+    for line in process.stdout:
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            letter = json.loads(line)
+        except json.JSONDecodeError as e:
+            print(f"Error parsing JSON: {e}")
+            print(f"Line was: {line[:500]}")
+            failed = True
+            break
 
-    count += 1
-    if count % 10 == 0:
-        print(f"Saved {count} letters...")
+        if 'error' in letter:
+            print(f"Error from PHP script: {letter['error']}")
+            failed = True
+            break
+
+        # Blocks once MAX_PENDING_WRITES letters are queued for writing
+        pending.acquire()
+        writers.submit(save_letter, letter)
+
+        count += 1
+        if count % 10 == 0:
+            print(f"Received {count} letters...")
+
+if failed:
+    process.kill()
+process.stdout.close()
+returncode = process.wait()
+
+for error in write_errors:
+    print(f"✗ Error saving letter {error}")
+
+if failed or returncode != 0:
+    if returncode:
+        print(f"Error running PHP script (exit code {returncode})")
+    exit(1)
 
-print(f"\n✓ Extracted {count} letters to JSON files in explore/letters/")
-print(f"✓ Each letter saved as XXXX.json (e.g., 0001.json, 0002.json)")
+print(f"\n✓ Extracted {count} letters from the database")
+sync.finish()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Character n-gram language identifier for Norwegian/English letter text
+Trained on letters that were already split by hand with the <-SPLITTLETTER->
+marker: the part before the marker is Norwegian, the part after is English.
+
+The model is a naive Bayes classifier over character trigrams, stored as a
+single table of per-trigram log-odds (Norwegian vs. English). It is cached
+in language_model.json next to this script and retrained on demand.
+
+A normalized paragraph is " word word ... word ", so its trigrams are those
+of each " word " plus one "x y" trigram per pair of neighbouring words (the
+last letter of one, the first of the next). predict_proba() normalizes a
+whole batch in one pass, sums a per-word weight that is computed once per
+distinct word, and adds the lookups of the boundary trigrams.
+
+Usage:
+  python3 language_model.py train [--store DIR_OR_DB]
+  python3 language_model.py evaluate [--store DIR_OR_DB]
+  python3 language_model.py classify "Kjære onkel, tusen takk for brevet"
+"""
+
+import argparse
+import html
+import json
+import math
+import random
+import re
+import sys
+from collections import Counter
+from itertools import repeat
+from pathlib import Path
+
+# letter_store lives with the build scripts in new/
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'new'))
+from letter_store import open_store
+
+MODEL_FILE = Path(__file__).resolve().parent / 'language_model.json'
+TRAINING_STORE = Path(__file__).resolve().parents[2] / 'new' / 'letters-raw'
+SPLIT_MARKER = '<-SPLITTLETTER->'
+LANGUAGES = ('norwegian', 'english')
+
+ORDER = 3        # character n-gram length
+ALPHA = 0.5      # additive smoothing
+MIN_COUNT = 2    # n-grams seen fewer times than this are dropped from the model
+
+TAG_RE = re.compile(r'<[^>\x00]+>')
+WORD_RE = re.compile(r'[^\W\d_]+')
+
+def normalize(text):
+    """Lowercase letters-only text with HTML tags and entities removed"""
+    text = html.unescape(re.sub(r'<[^>]+>', ' ', text))
+    text = re.sub(r'[\W\d_]+', ' ', text.lower())
+    return f" {text.strip()} "
+
+def batch_words(texts):
+    """The words of each text, as normalize() leaves them, in one pass"""
+    # \x00 separates the texts; tags may not span it
+    joined = html.unescape(TAG_RE.sub(' ', '\x00'.join(texts))).lower()
+    return [WORD_RE.findall(text) for text in joined.split('\x00')]
+
+def ngrams(text, order=ORDER):
+    text = normalize(text)
+    return [text[i:i + order] for i in range(len(text) - order + 1)]
+
+def split_paragraphs(text):
+    """Split on blank lines or <p> tags, dropping empty paragraphs"""
+    parts = re.split(r'(?:\r?\n\s*){2,}|<p[^>]*>', text)
+    return [p.strip() for p in parts if p.strip()]
+
+def training_paragraphs(store):
+    """Yield (paragraph, language) from every marker-split letter in the store"""
+    for letter in store.iter_letters():
+        text = (letter.get('metadata', {}).get('Text') or [''])[0] or ''
+        if SPLIT_MARKER not in text:
+            continue
+        norwegian, english = text.split(SPLIT_MARKER, 1)
+        for paragraph in split_paragraphs(norwegian):
+            yield paragraph, 'norwegian'
+        for paragraph in split_paragraphs(english):
+            yield paragraph, 'english'
+
+class LanguageModel:
+    """Two-language naive Bayes model over character n-grams"""
+
+    def __init__(self, log_odds, unseen, prior, order=ORDER, languages=LANGUAGES):
+        self.log_odds = log_odds  # n-gram -> log P(g|lang0) - log P(g|lang1)
+        self.unseen = unseen      # log-odds for n-grams not in the table
+        self.prior = prior        # log P(lang0) - log P(lang1), per paragraph
+        self.order = order
+        self.languages = tuple(languages)
+        self._word_scores = {}    # word -> summed log-odds of the n-grams of " word "
+
+    @classmethod
+    def train(cls, samples, order=ORDER, alpha=ALPHA, min_count=MIN_COUNT):
+        """Train from (text, language) pairs"""
+        counts = {language: Counter() for language in LANGUAGES}
+        documents = Counter()
+        for text, language in samples:
+            counts[language].update(ngrams(text, order))
+            documents[language] += 1
+
+        first, second = LANGUAGES
+        vocabulary = set(counts[first]) | set(counts[second])
+        totals = {language: sum(counts[language].values()) + alpha * (len(vocabulary) + 1)
+                  for language in LANGUAGES}
+
+        def log_p(language, count):
+            return math.log((count + alpha) / totals[language])
+
+        log_odds = {}
+        for gram in vocabulary:
+            a, b = counts[first][gram], counts[second][gram]
+            if a + b >= min_count:
+                log_odds[gram] = round(log_p(first, a) - log_p(second, b), 4)
+
+        unseen = log_p(first, 0) - log_p(second, 0)
+        prior = math.log((documents[first] + 1) / (documents[second] + 1))
+        return cls(log_odds, unseen, prior, order)
+
+    @classmethod
+    def load(cls, path=MODEL_FILE):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['log_odds'], data['unseen'], data['prior'],
+                   data['order'], data['languages'])
+
+    def save(self, path=MODEL_FILE):
+        data = {
+            'languages': list(self.languages),
+            'order': self.order,
+            'prior': self.prior,
+            'unseen': self.unseen,
+            'log_odds': self.log_odds
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+
+    def score(self, text):
+        """Log-odds that text is in the first language"""
+        lookup = self.log_odds.get
+        unseen = self.unseen
+        return self.prior + sum(lookup(gram, unseen) for gram in ngrams(text, self.order))
+
+    def batch_scores(self, texts):
+        """score() of every text, summing per-word weights over the batch"""
+        if self.order != 3:
+            # The word/boundary split only covers trigrams
+            return [self.score(text) for text in texts]
+
+        lookup = self.log_odds.get
+        unseen = self.unseen
+        batch = batch_words(texts)
+        word_scores = self._word_scores
+        for word in set().union(*batch) - word_scores.keys():
+            padded = f" {word} "
+            word_scores[word] = sum(lookup(padded[i:i + 3], unseen)
+                                    for i in range(len(padded) - 2))
+
+        word_score = word_scores.__getitem__
+        scores = []
+        for words in batch:
+            score = self.prior + sum(map(word_score, words))
+            if len(words) > 1:
+                # "x y": last letter of a word, space, first letter of the next
+                boundaries = map(''.join, zip([word[-1] for word in words], repeat(' '),
+                                              [word[0] for word in words[1:]]))
+                score += sum(map(lookup, boundaries, repeat(unseen)))
+            scores.append(score)
+        return scores
+
+    def predict_proba(self, texts):
+        """
+        Probabilities for a batch of texts
+        Returns a list of {language: probability} dicts
+        """
+        first, second = self.languages
+        results = []
+        for score in self.batch_scores(texts):
+            # Clamp to keep exp() in range for long paragraphs
+            score = max(-50.0, min(50.0, score))
+            p = 1 / (1 + math.exp(-score))
+            results.append({first: p, second: 1 - p})
+        return results
+
+_model = None
+
+def get_model(retrain=False, store_path=TRAINING_STORE):
+    """Load the cached model, training (and caching) it if needed"""
+    global _model
+    if _model is not None and not retrain:
+        return _model
+
+    if MODEL_FILE.exists() and not retrain:
+        _model = LanguageModel.load()
+    else:
+        with open_store(store_path) as store:
+            _model = LanguageModel.train(training_paragraphs(store))
+        _model.save()
+    return _model
+
+def predict_proba(texts):
+    """Batch-score texts with the cached model"""
+    return get_model().predict_proba(texts)
+
+def evaluate(store_path, holdout=0.2, seed=1):
+    """Train on a random split of the letters and report held-out accuracy"""
+    with open_store(store_path) as store:
+        ids = store.ids()
+        random.Random(seed).shuffle(ids)
+        test_ids = set(ids[:int(len(ids) * holdout)])
+
+        train, test = [], []
+        for letter in store.iter_letters():
+            target = test if letter['id'] in test_ids else train
+            text = (letter.get('metadata', {}).get('Text') or [''])[0] or ''
+            if SPLIT_MARKER not in text:
+                continue
+            norwegian, english = text.split(SPLIT_MARKER, 1)
+            target.extend((p, 'norwegian') for p in split_paragraphs(norwegian))
+            target.extend((p, 'english') for p in split_paragraphs(english))
+
+    model = LanguageModel.train(train)
+    probabilities = model.predict_proba([text for text, _ in test])
+    correct = sum(1 for (_, language), p in zip(test, probabilities)
+                  if max(p, key=p.get) == language)
+    short = [(i, s) for i, s in enumerate(test) if len(s[0]) < 40]
+    short_correct = sum(1 for i, (_, language) in short
+                        if max(probabilities[i], key=probabilities[i].get) == language)
+
+    print(f"Trained on {len(train)} paragraphs, tested on {len(test)}")
+    print(f"  Accuracy: {correct / max(len(test), 1):.1%}")
+    print(f"  Short paragraphs (<40 chars): {short_correct}/{len(short)}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['train', 'evaluate', 'classify'])
+    parser.add_argument('text', nargs='*', help='text to classify')
+    parser.add_argument('--store', default=TRAINING_STORE,
+                        help='letters to train on (default: new/letters-raw/)')
+    args = parser.parse_args()
+
+    if args.command == 'train':
+        model = get_model(retrain=True, store_path=args.store)
+        print(f"✓ Trained model with {len(model.log_odds)} {model.order}-grams")
+        print(f"  Saved to {MODEL_FILE}")
+    elif args.command == 'evaluate':
+        evaluate(args.store)
+    else:
+        text = ' '.join(args.text)
+        for language, p in predict_proba([text])[0].items():
+            print(f"{language}: {p:.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Letter listing and query API for the editing server
+
+  GET /api/letters              paged listing
+        ?offset=0&limit=100     page (limit=all for everything)
+        &fields=id,Title        projection: top-level keys (id, tags, files, ...)
+                                or metadata fields (Title, Creator, ...);
+                                fields=* returns whole letters
+        &creator=...&year=1948&tag=...
+                                filters; repeat a parameter to match any value
+  GET /api/letters/<id>         one letter, with the same fields projection
+
+Responses come from an in-memory cache of parsed letters. The store's
+per-letter stamps (file mtimes for letters/, the stamp column for a packed
+store) are checked at most once per CHECK_INTERVAL, and only letters whose
+stamp changed are re-read; the server's own saves update the cache directly.
+"""
+
+import json
+import secrets
+import threading
+import time
+from urllib.parse import parse_qs
+
+from corpus import letter_creators
+
+CHECK_INTERVAL = 1.0  # seconds between stamp scans of the store
+DEFAULT_LIMIT = 100
+DEFAULT_FIELDS = ('id', 'Title', 'Creator', 'LetterDate')
+
+TOP_LEVEL_FIELDS = ('id', 'added', 'modified', 'public', 'tags', 'files',
+                    'norwegian-tfidf', 'english-tfidf')
+
+def letter_year(letter):
+    date = (letter.get('metadata', {}).get('LetterDate') or [''])[0] or ''
+    return date[:4].strip()
+
+def project(letter, fields):
+    """Copy of a letter with only the requested fields"""
+    if fields is None:
+        return letter
+    result = {'id': letter['id']}
+    metadata = {}
+    for field in fields:
+        if field in TOP_LEVEL_FIELDS:
+            if field in letter:
+                result[field] = letter[field]
+        elif field in letter.get('metadata', {}):
+            metadata[field] = letter['metadata'][field]
+    if metadata:
+        result['metadata'] = metadata
+    return result
+
+class LetterCache:
+    """Parsed letters kept in memory, refreshed from the store's stamps"""
+
+    def __init__(self, store, check_interval=CHECK_INTERVAL):
+        self.store = store
+        self.check_interval = check_interval
+        self.generation = 0  # bumped whenever any letter changes
+        # generation restarts at 0 with the process, so validators also carry
+        # a per-process nonce: letters edited while the server was down must
+        # not match an ETag handed out before
+        self.instance = secrets.token_hex(4)
+        self._entries = {}   # id -> (stamp, letter, creators (casefolded), year, tags)
+        self._ids = []
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def _entry(self, stamp, letter):
+        return (stamp, letter,
+                {c.casefold() for c in letter_creators(letter)},
+                letter_year(letter),
+                {t.strip().casefold() for t in letter.get('tags') or [] if t})
+
+    def refresh(self, force=False):
+        """Re-read letters whose stamp changed since the last scan"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._checked < self.check_interval:
+                return
+            self._checked = now
+
+            stamps = self.store.stamps()
+            changed = False
+            for letter_id in list(self._entries):
+                if letter_id not in stamps:
+                    del self._entries[letter_id]
+                    changed = True
+            for letter_id, stamp in stamps.items():
+                entry = self._entries.get(letter_id)
+                if entry is not None and entry[0] == stamp:
+                    continue
+                try:
+                    letter = self.store.get(letter_id)
+                except (KeyError, json.JSONDecodeError):
+                    continue  # removed or half-written by another tool; next scan
+                self._entries[letter_id] = self._entry(stamp, letter)
+                changed = True
+
+            if changed:
+                self._ids = sorted(self._entries)
+                self.generation += 1
+
+    @property
+    def version(self):
+        """Changes whenever any letter does, including across server restarts"""
+        return f"{self.instance}-{self.generation}"
+
+    def update(self, letter_id):
+        """Pick up a letter the server itself just wrote"""
+        with self._lock:
+            try:
+                self._entries[letter_id] = self._entry(self.store.stamp(letter_id),
+                                                       self.store.get(letter_id))
+            except KeyError:
+                self._entries.pop(letter_id, None)
+            self._ids = sorted(self._entries)
+            self.generation += 1
+
+    def get(self, letter_id):
+        self.refresh()
+        with self._lock:
+            entry = self._entries.get(letter_id)
+        if entry is None:
+            raise KeyError(letter_id)
+        return entry[1]
+
+    def query(self, creators=(), years=(), tags=()):
+        """Letters (in id order) matching every given filter"""
+        self.refresh()
+        creators = {c.casefold() for c in creators}
+        tags = {t.casefold() for t in tags}
+        years = set(years)
+
+        with self._lock:
+            entries = [self._entries[letter_id] for letter_id in self._ids]
+        return [letter for _, letter, creator_set, year, tag_set in entries
+                if (not creators or creators & creator_set)
+                and (not years or year in years)
+                and (not tags or tags & tag_set)]
+
+def parse_fields(params):
+    value = ','.join(params.get('fields', []))
+    if value == '*':
+        return None
+    fields = tuple(f.strip() for f in value.split(',') if f.strip())
+    return fields or DEFAULT_FIELDS
+
+def list_letters(cache, query_string):
+    """Body of GET /api/letters; raises ValueError for bad parameters"""
+    params = parse_qs(query_string)
+    offset = int(params.get('offset', ['0'])[0])
+    limit = params.get('limit', [str(DEFAULT_LIMIT)])[0]
+    limit = None if limit == 'all' else int(limit)
+    if offset < 0 or (limit is not None and limit < 0):
+        raise ValueError("offset and limit must not be negative")
+
+    fields = parse_fields(params)
+    matches = cache.query(creators=params.get('creator', []),
+                          years=params.get('year', []),
+                          tags=params.get('tag', []))
+    page = matches[offset:] if limit is None else matches[offset:offset + limit]
+
+    return {
+        'total': len(matches),
+        'offset': offset,
+        'limit': limit,
+        'letters': [project(letter, fields) for letter in page],
+    }
+
+def get_letter(cache, letter_id, query_string):
+    """Body of GET /api/letters/<id>; whole letter unless fields= is given"""
+    params = parse_qs(query_string)
+    fields = parse_fields(params) if 'fields' in params else None
+    return project(cache.get(letter_id), fields)
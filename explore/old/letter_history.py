@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Content-addressed version history for saved letters
+Replaces the timestamped NNNN.YYYYMMDD_HHMMSS.json copies the editing server
+used to write into letters/.
+
+Layout (kept outside the letter directory):
+
+  history/
+    log.jsonl        one line per save: {"ts", "note", "versions": {id: hash}}
+    objects/ab/cdef  one object per distinct letter text, named by its SHA-1
+
+Identical texts are stored once. Each object is zlib-compressed with the
+previous version of the same letter as preset dictionary, so an edit costs
+roughly the size of the change rather than the size of the letter. Delta
+chains are capped at MAX_CHAIN objects; the next version is stored whole.
+
+Usage:
+  python3 letter_history.py list 12
+  python3 letter_history.py show <hash>
+  python3 letter_history.py import letters/ [--delete]   # old timestamped backups
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import zlib
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+HISTORY_DIR = 'history'
+MAX_CHAIN = 16         # longest run of objects depending on each other
+ZDICT_SIZE = 32 * 1024  # zlib only looks this far back
+
+# Old-style backups written by letter_splitter_server.py before this module
+BACKUP_FILE_RE = re.compile(r'^(\d+)\.(\d{8}_\d{6})\.json$')
+
+def text_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+class LetterHistory:
+    """Append-only history of letter versions"""
+
+    def __init__(self, root=HISTORY_DIR):
+        self.root = Path(root)
+        self.objects_dir = self.root / 'objects'
+        self.log_path = self.root / 'log.jsonl'
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._versions = defaultdict(list)  # letter id -> [entry, ...], oldest first
+        self._depth = {}                    # object hash -> delta chain length
+        self._load_log()
+
+    def __repr__(self):
+        return f"LetterHistory({str(self.root)!r})"
+
+    def _load_log(self):
+        try:
+            with open(self.log_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        self._index(json.loads(line))
+        except FileNotFoundError:
+            pass
+
+    def _index(self, entry):
+        for letter_id, digest in entry['versions'].items():
+            self._versions[int(letter_id)].append(
+                {'hash': digest, 'ts': entry['ts'], 'note': entry.get('note', '')})
+
+    def _object_path(self, digest):
+        return self.objects_dir / digest[:2] / digest[2:]
+
+    def _read_object(self, digest):
+        """Return (base hash or None, compressed bytes)"""
+        with open(self._object_path(digest), 'rb') as f:
+            data = f.read()
+        header, _, payload = data.partition(b'\n')
+        return (header.decode('ascii') or None), payload
+
+    def depth(self, digest):
+        if digest not in self._depth:
+            base, _ = self._read_object(digest)
+            self._depth[digest] = 0 if base is None else self.depth(base) + 1
+        return self._depth[digest]
+
+    def read(self, digest):
+        """Full text of a stored version"""
+        if not re.fullmatch(r'[0-9a-f]{40}', digest or ''):
+            raise KeyError(digest)
+        try:
+            base, payload = self._read_object(digest)
+        except FileNotFoundError:
+            raise KeyError(digest) from None
+
+        if base is None:
+            return zlib.decompress(payload).decode('utf-8')
+        zdict = self.read(base).encode('utf-8')[-ZDICT_SIZE:]
+        decompressor = zlib.decompressobj(zdict=zdict)
+        return (decompressor.decompress(payload) + decompressor.flush()).decode('utf-8')
+
+    def _store(self, text, base):
+        """Write an object for text (compressed against base); returns its hash"""
+        digest = text_hash(text)
+        path = self._object_path(digest)
+        if path.exists():
+            return digest
+
+        if base is not None and self.depth(base) >= MAX_CHAIN - 1:
+            base = None
+
+        if base is None:
+            payload = zlib.compress(text.encode('utf-8'), 9)
+        else:
+            zdict = self.read(base).encode('utf-8')[-ZDICT_SIZE:]
+            compressor = zlib.compressobj(9, zdict=zdict)
+            payload = compressor.compress(text.encode('utf-8')) + compressor.flush()
+
+        path.parent.mkdir(exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write((base or '').encode('ascii') + b'\n' + payload)
+        os.replace(tmp_path, path)
+        self._depth[digest] = 0 if base is None else self.depth(base) + 1
+        return digest
+
+    def latest(self, letter_id):
+        versions = self._versions.get(int(letter_id))
+        return versions[-1]['hash'] if versions else None
+
+    def record(self, versions, note='', ts=None):
+        """
+        Record new versions of one or more letters as a single log entry
+        versions maps letter id -> letter JSON text. Letters whose text is
+        unchanged since their last recorded version are left out; returns
+        the {id: hash} that was recorded (empty if nothing changed).
+        """
+        with self._lock:
+            recorded = {}
+            for letter_id, text in versions.items():
+                latest = self.latest(letter_id)
+                digest = self._store(text, latest)
+                if digest != latest:
+                    recorded[str(int(letter_id))] = digest
+
+            if recorded:
+                entry = {'ts': ts or datetime.now().isoformat(timespec='seconds'),
+                         'note': note, 'versions': recorded}
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                self._index(entry)
+            return recorded
+
+    def list(self, letter_id):
+        """Recorded versions of a letter, newest first"""
+        with self._lock:
+            return list(reversed(self._versions.get(int(letter_id), [])))
+
+    def size(self):
+        """Bytes used by all stored objects"""
+        return sum(path.stat().st_size for path in self.objects_dir.rglob('*') if path.is_file())
+
+def import_backups(history, letters_dir, delete=False):
+    """Load old NNNN.YYYYMMDD_HHMMSS.json backups into the history, oldest first"""
+    backups = []
+    for path in Path(letters_dir).iterdir():
+        match = BACKUP_FILE_RE.match(path.name)
+        if match:
+            backups.append((match.group(2), int(match.group(1)), path))
+    backups.sort()
+    backup_bytes = sum(path.stat().st_size for _, _, path in backups)
+
+    imported = 0
+    for timestamp, letter_id, path in backups:
+        ts = datetime.strptime(timestamp, '%Y%m%d_%H%M%S').isoformat()
+        with open(path, 'r', encoding='utf-8') as f:
+            history.record({letter_id: f.read()}, note=f'backup {path.name}', ts=ts)
+        imported += 1
+        if delete:
+            path.unlink()
+    return imported, backup_bytes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['list', 'show', 'import'])
+    parser.add_argument('target', help='letter id, version hash or letter directory')
+    parser.add_argument('--history', default=HISTORY_DIR,
+                        help='history directory (default: history/)')
+    parser.add_argument('--delete', action='store_true',
+                        help='remove old backup files once imported')
+    args = parser.parse_args()
+
+    history = LetterHistory(args.history)
+
+    if args.command == 'list':
+        for version in history.list(int(args.target)):
+            print(f"{version['hash'][:12]}  {version['ts']}  {version['note']}")
+    elif args.command == 'show':
+        sys.stdout.write(history.read(args.target) + '\n')
+    else:
+        imported, backup_bytes = import_backups(history, args.target, args.delete)
+        print(f"✓ Imported {imported} backups into {history}")
+        print(f"  Backups: {backup_bytes:,} bytes")
+        print(f"  History: {history.size():,} bytes")
+
+if __name__ == '__main__':
+    main()
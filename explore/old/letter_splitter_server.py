@@ -1,20 +1,220 @@
 #!/usr/bin/env python3
 """
 Simple HTTP server with file write capability for letter splitting tool
+Letters are kept in letters/ by default; --store letters.db serves and saves
+them from a packed letter store instead (see new/letter_store.py)
+
+Requests are handled in parallel threads, so several transcribers can work
+at once. Saves to the same letter are serialized by a per-letter lock, and
+letters are written atomically (temp file + rename).
+
+Every save is recorded in a compressed, deduplicated version history kept in
+history/ (see letter_history.py) instead of timestamped copies in letters/:
+
+  GET  /history/<id>          versions of a letter, newest first
+  GET  /history/<id>/<hash>   the letter as it was at that version
+  POST /history/<id>/restore  {"hash": ...} makes that version current again
+
+POST /save_letters.py saves many letters at once ({"letters": [{"filename",
+"data"}, ...]}): every letter is validated first, then all are written in one
+store transaction (one SQLite commit, or a grouped atomic rename for a letter
+directory) and recorded as a single history entry.
+
+Editors list and query letters through GET /api/letters (paging, field
+projection, creator/year/tag filters) and /api/letters/<id>, answered from
+an in-memory cache of parsed letters (see letter_api.py).
+
+Static files go through a fast path (see static_files.py): precompressed
+.br/.gz siblings, ETag/304 revalidation, byte ranges and an in-memory cache
+of small files. /pdfs/ is served from new/pdfs/; use --root ../../new to
+serve the browser app itself.
 """
+import argparse
+import contextlib
+import functools
+import hashlib
 import http.server
-import socketserver
 import json
 import os
-from urllib.parse import parse_qs
+import re
+import threading
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
 import sys
-from datetime import datetime
+
+# letter_store lives with the build scripts in new/
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'new'))
+from letter_store import letter_id_from_filename, open_store
+from letter_api import LetterCache, get_letter, list_letters
+from letter_history import HISTORY_DIR, LetterHistory
+from static_files import StaticFilesMixin
 
 PORT = 8002
+LETTERS_DIR = 'letters'
+PDF_DIR = Path(__file__).resolve().parents[2] / 'new' / 'pdfs'
+
+# GET/HEAD /letters/XXXX.json is answered from the letter store
+LETTER_URL_RE = re.compile(r'^/letters/(\d+)\.json$')
+HISTORY_URL_RE = re.compile(r'^/history/(\d+)(?:/([0-9a-f]{40}))?$')
+RESTORE_URL_RE = re.compile(r'^/history/(\d+)/restore$')
+API_URL_RE = re.compile(r'^/api/letters(?:/(\d+))?$')
+
+# One lock per letter id, created on first use
+_letter_locks = {}
+_letter_locks_guard = threading.Lock()
+
+def letter_lock(letter_id):
+    """Lock serializing the backup-and-write sequence for one letter"""
+    with _letter_locks_guard:
+        lock = _letter_locks.get(letter_id)
+        if lock is None:
+            lock = _letter_locks[letter_id] = threading.Lock()
+        return lock
+
+class LetterSplitterServer(http.server.ThreadingHTTPServer):
+    """One thread per request, so a slow save or large file doesn't block other editors"""
+    request_queue_size = 64  # listen backlog; the default of 5 drops bursts of saves
+
+class LetterSplitterHandler(StaticFilesMixin, http.server.SimpleHTTPRequestHandler):
+    store = None    # set in main()
+    history = None  # set in main()
+    letters = None  # LetterCache, set in main()
+    mounts = {'/pdfs/': str(PDF_DIR)}
+
+    def do_GET(self):
+        if not self.send_letter() and not self.send_history() and not self.send_api():
+            super().do_GET()
+
+    def do_HEAD(self):
+        if (not self.send_letter(head_only=True) and not self.send_history(head_only=True)
+                and not self.send_api(head_only=True)):
+            super().do_HEAD()
+
+    def send_letter(self, head_only=False):
+        """Serve /letters/XXXX.json from the store; returns False for other paths"""
+        match = LETTER_URL_RE.match(urlsplit(self.path).path)
+        if not match:
+            return False
+
+        try:
+            body = self.store.get_raw(int(match.group(1))).encode('utf-8')
+        except KeyError:
+            self.send_error(404, "Letter not found")
+            return True
+
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(body)
+        return True
+
+    def send_json(self, data, status=200, etag=None, head_only=False):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-cache')
+        if etag:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(body)
+
+    def send_history(self, head_only=False):
+        """Serve /history/<id>[/<hash>]; returns False for other paths"""
+        match = HISTORY_URL_RE.match(urlsplit(self.path).path)
+        if not match:
+            return False
+
+        letter_id, digest = int(match.group(1)), match.group(2)
+        if digest is None:
+            self.send_json({'id': letter_id, 'versions': self.history.list(letter_id)},
+                           head_only=head_only)
+            return True
+
+        if digest not in {v['hash'] for v in self.history.list(letter_id)}:
+            self.send_error(404, "Version not found")
+            return True
+        body = self.history.read(digest).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(body)
+        return True
+
+    def send_api(self, head_only=False):
+        """Serve /api/letters[/<id>]; returns False for other paths"""
+        url = urlsplit(self.path)
+        match = API_URL_RE.match(url.path)
+        if not match:
+            return False
+
+        # Responses only change when a letter does, so the cache version
+        # plus the query makes a cheap validator
+        self.letters.refresh()
+        query_hash = hashlib.sha1(self.path.encode('utf-8')).hexdigest()[:12]
+        etag = f'"{self.letters.version}-{query_hash}"'
+        if etag in [t.strip() for t in self.headers.get('If-None-Match', '').split(',')]:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return True
+
+        try:
+            if match.group(1):
+                data = get_letter(self.letters, int(match.group(1)), url.query)
+            else:
+                data = list_letters(self.letters, url.query)
+        except KeyError:
+            self.send_error(404, "Letter not found")
+            return True
+        except ValueError as e:
+            self.send_error(400, f"Bad query: {e}")
+            return True
+
+        self.send_json(data, etag=etag, head_only=head_only)
+        return True
+
+    def save_letters(self, letters, note):
+        """
+        Write letters ({id: data}) and record them in the history as one
+        entry; returns {id: version hash}
+        Saves of the same letter wait for each other, others run in parallel
+        """
+        with contextlib.ExitStack() as locks:
+            # Always lock in id order, so overlapping batches can't deadlock
+            for letter_id in sorted(letters):
+                locks.enter_context(letter_lock(letter_id))
+
+            # Letters saved for the first time keep their pre-edit version
+            originals = {letter_id: self.store.get_raw(letter_id) for letter_id in letters
+                         if self.history.latest(letter_id) is None and letter_id in self.store}
+            if originals:
+                self.history.record(originals, note='original')
+
+            self.store.put_many([letters[letter_id] for letter_id in sorted(letters)])
+            self.history.record({letter_id: self.store.get_raw(letter_id) for letter_id in letters},
+                                note=note)
+            for letter_id in letters:
+                self.letters.update(letter_id)
+            return {letter_id: self.history.latest(letter_id) for letter_id in letters}
+
+    def save_letter(self, letter_id, letter_data, note):
+        """Write one letter; returns its version hash"""
+        return self.save_letters({letter_id: letter_data}, note)[letter_id]
 
-class LetterSplitterHandler(http.server.SimpleHTTPRequestHandler):
     def do_POST(self):
-        if self.path == '/save_letter.py':
+        restore = RESTORE_URL_RE.match(urlsplit(self.path).path)
+        if restore:
+            self.restore_version(int(restore.group(1)))
+        elif self.path == '/save_letters.py':
+            self.save_batch()
+        elif self.path == '/save_letter.py':
             content_length = int(self.headers['Content-Length'])
             post_data = self.rfile.read(content_length)
 
@@ -23,36 +223,16 @@ class LetterSplitterHandler(http.server.SimpleHTTPRequestHandler):
                 filename = data.get('filename')
                 letter_data = data.get('data')
 
-                if not filename or not letter_data:
+                if not filename or not isinstance(letter_data, dict) or not letter_data:
                     self.send_error(400, "Missing filename or data")
                     return
 
-                # Save to letters/ directory
-                filepath = os.path.join('letters', filename)
-
-                # Backup original file with modification timestamp
-                backup_filename = None
-                if os.path.exists(filepath):
-                    # Get modification time of existing file
-                    mod_time = os.path.getmtime(filepath)
-                    mod_datetime = datetime.fromtimestamp(mod_time)
-                    timestamp_str = mod_datetime.strftime('%Y%m%d_%H%M%S')
-
-                    # Create backup filename with timestamp
-                    base_name = os.path.splitext(filename)[0]
-                    ext = os.path.splitext(filename)[1]
-                    backup_filename = f"{base_name}.{timestamp_str}{ext}"
-                    backup_path = os.path.join('letters', backup_filename)
-
-                    # Save backup
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        original = f.read()
-                    with open(backup_path, 'w', encoding='utf-8') as f:
-                        f.write(original)
-
-                # Write new version
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    json.dump(letter_data, f, ensure_ascii=False, indent=2)
+                letter_id = letter_id_from_filename(filename)
+                if letter_id is None or str(letter_data.get('id')) != str(letter_id):
+                    self.send_error(400, "Filename must be XXXX.json matching the letter id")
+                    return
+
+                version = self.save_letter(letter_id, letter_data, note='save')
 
                 # Send success response
                 self.send_response(200)
@@ -63,13 +243,11 @@ class LetterSplitterHandler(http.server.SimpleHTTPRequestHandler):
                 response = json.dumps({
                     'success': True,
                     'filename': filename,
-                    'backup': backup_filename
+                    'version': version
                 })
                 self.wfile.write(response.encode())
 
-                print(f"✓ Saved: {filename}")
-                if backup_filename:
-                    print(f"  Backup: {backup_filename}")
+                print(f"✓ Saved: {filename} (version {version[:12]})")
 
             except Exception as e:
                 self.send_error(500, f"Error saving file: {str(e)}")
@@ -77,6 +255,87 @@ class LetterSplitterHandler(http.server.SimpleHTTPRequestHandler):
         else:
             self.send_error(404)
 
+    def save_batch(self):
+        """POST /save_letters.py: validate every letter, then save them all at once"""
+        try:
+            content_length = int(self.headers['Content-Length'])
+            items = json.loads(self.rfile.read(content_length).decode('utf-8')).get('letters')
+            if not isinstance(items, list) or not items:
+                self.send_json({'success': False, 'errors': ["Expected a non-empty 'letters' list"]},
+                               status=400)
+                return
+
+            letters = {}
+            errors = []
+            for index, item in enumerate(items):
+                filename = item.get('filename') if isinstance(item, dict) else None
+                letter_data = item.get('data') if isinstance(item, dict) else None
+                letter_id = letter_id_from_filename(filename or '')
+                if not filename or not isinstance(letter_data, dict):
+                    errors.append(f"{index}: missing filename or data")
+                elif letter_id is None or str(letter_data.get('id')) != str(letter_id):
+                    errors.append(f"{index}: filename must be XXXX.json matching the letter id")
+                elif letter_id in letters:
+                    errors.append(f"{index}: {filename} appears more than once")
+                else:
+                    letters[letter_id] = letter_data
+
+            # Nothing is written unless every letter is valid
+            if errors:
+                self.send_json({'success': False, 'errors': errors}, status=400)
+                return
+
+            versions = self.save_letters(letters, note=f'batch save of {len(letters)} letters')
+            self.send_json({
+                'success': True,
+                'saved': len(versions),
+                'versions': {f"{letter_id:04d}.json": version
+                             for letter_id, version in sorted(versions.items())}
+            })
+            print(f"✓ Saved batch of {len(versions)} letters")
+
+        except Exception as e:
+            self.send_error(500, f"Error saving letters: {str(e)}")
+            print(f"✗ Error: {str(e)}")
+
+    def read_json_object(self):
+        """The request body as a JSON object, or None after answering 400"""
+        try:
+            content_length = int(self.headers.get('Content-Length', ''))
+            if content_length < 0:
+                raise ValueError(content_length)
+            data = json.loads(self.rfile.read(content_length).decode('utf-8'))
+        except (ValueError, UnicodeDecodeError):
+            data = None
+        if not isinstance(data, dict):
+            self.send_error(400, "Expected a JSON object body")
+            return None
+        return data
+
+    def restore_version(self, letter_id):
+        """Make an earlier version of a letter current again"""
+        data = self.read_json_object()
+        if data is None:
+            return
+        digest = data.get('hash')
+        if not isinstance(digest, str):
+            self.send_error(400, "Missing version hash")
+            return
+
+        try:
+            if digest not in {v['hash'] for v in self.history.list(letter_id)}:
+                self.send_error(404, "Version not found")
+                return
+
+            letter_data = json.loads(self.history.read(digest))
+            version = self.save_letter(letter_id, letter_data, note=f'restore {digest[:12]}')
+            self.send_json({'success': True, 'id': letter_id, 'version': version})
+            print(f"✓ Restored: {letter_id:04d}.json to version {digest[:12]}")
+
+        except Exception as e:
+            self.send_error(500, f"Error restoring version: {str(e)}")
+            print(f"✗ Error: {str(e)}")
+
     def do_OPTIONS(self):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
@@ -92,15 +351,27 @@ class LetterSplitterHandler(http.server.SimpleHTTPRequestHandler):
 if __name__ == '__main__':
     os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
-    Handler = LetterSplitterHandler
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--store', default=LETTERS_DIR,
+                        help='letter directory or packed store (default: letters/)')
+    parser.add_argument('--history', default=HISTORY_DIR,
+                        help='version history directory (default: history/)')
+    parser.add_argument('--root', default='.',
+                        help='directory to serve static files from (default: this directory)')
+    args = parser.parse_args()
+
+    LetterSplitterHandler.store = open_store(args.store)
+    LetterSplitterHandler.history = LetterHistory(args.history)
+    LetterSplitterHandler.letters = LetterCache(LetterSplitterHandler.store)
+    Handler = functools.partial(LetterSplitterHandler, directory=os.path.abspath(args.root))
 
-    with socketserver.TCPServer(("", PORT), Handler) as httpd:
+    with LetterSplitterServer(("", PORT), Handler) as httpd:
         print(f"╔══════════════════════════════════════════════════════╗")
         print(f"║  Letter Splitter Server Running                      ║")
         print(f"╠══════════════════════════════════════════════════════╣")
         print(f"║  📝 Editor:  http://localhost:{PORT}/                       ║")
-        print(f"║  📂 Letters: {os.path.abspath('letters')}  ")
-        print(f"║  💾 Backups: Timestamped (YYYYMMDD_HHMMSS)           ║")
+        print(f"║  📂 Letters: {LetterSplitterHandler.store}  ")
+        print(f"║  💾 History: {LetterSplitterHandler.history}  ")
         print(f"╚══════════════════════════════════════════════════════╝")
         print(f"\nPress Ctrl+C to stop the server\n")
 
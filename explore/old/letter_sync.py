@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Incremental letter output shared by the extraction scripts
+Compares freshly extracted letters with the XXXX.json files already on disk
+and only rewrites letters that are new or whose Omeka `modified` timestamp
+changed. Items that disappeared from the dump are reported as deletions.
+"""
+
+import hashlib
+import json
+import re
+import threading
+from pathlib import Path
+
+# Fields produced by the extractors. Anything else in a letter file
+# (e.g. norwegian-tfidf / english-tfidf) is added later in the pipeline.
+EXTRACTED_FIELDS = ('id', 'added', 'modified', 'public', 'metadata', 'tags', 'files')
+
+# Letter files are XXXX.json; timestamped backups (XXXX.YYYYMMDD_HHMMSS.json) are ignored
+LETTER_FILE_RE = re.compile(r'^(\d+)\.json$')
+
+def add_sync_arguments(parser):
+    """Add the incremental-extraction options to an argparse parser"""
+    parser.add_argument('--full', action='store_true',
+                        help='rewrite every letter, ignoring modified timestamps')
+    parser.add_argument('--hash', action='store_true',
+                        help='also rewrite letters whose extracted content differs '
+                             '(overwrites local edits such as split markers)')
+    parser.add_argument('--prune', action='store_true',
+                        help='delete letter files for items no longer in the dump')
+    return parser
+
+def content_hash(letter):
+    """Hash of the extractor-owned fields of a letter"""
+    extracted = {field: letter.get(field) for field in EXTRACTED_FIELDS}
+    canonical = json.dumps(extracted, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+class LetterSync:
+    """Writes extracted letters into a directory, skipping unchanged ones"""
+
+    def __init__(self, out_dir, full=False, compare_hash=False, prune=False,
+                 track_deletions=True):
+        self.out_dir = Path(out_dir)
+        self.full = full
+        self.compare_hash = compare_hash
+        self.prune = prune
+        # Partial extractions (e.g. extract_missing_items.py) must not report
+        # every other letter as deleted
+        self.track_deletions = track_deletions
+
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.existing = self._scan()
+        self.seen = set()
+        self.new = []
+        self.changed = []
+        self.unchanged = 0
+        # write() may be called from several writer threads (fetch_and_save.py)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_args(cls, out_dir, args, **kwargs):
+        """Build a LetterSync from options added by add_sync_arguments()"""
+        return cls(out_dir, full=args.full, compare_hash=args.hash,
+                   prune=args.prune, **kwargs)
+
+    def _scan(self):
+        """Map item ID -> path for every letter file already on disk"""
+        existing = {}
+        for path in self.out_dir.iterdir():
+            match = LETTER_FILE_RE.match(path.name)
+            if match:
+                existing[int(match.group(1))] = path
+        return existing
+
+    def path_for(self, item_id):
+        return self.out_dir / f'{int(item_id):04d}.json'
+
+    def is_current(self, letter):
+        """True if the file on disk is up to date with this extracted letter"""
+        path = self.existing.get(int(letter['id']))
+        if self.full or path is None:
+            return False
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                on_disk = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return False
+
+        if on_disk.get('modified') != letter.get('modified'):
+            return False
+        if self.compare_hash and content_hash(on_disk) != content_hash(letter):
+            return False
+        return True
+
+    def write(self, letter):
+        """
+        Write a letter if it is new or changed
+        Returns 'new', 'changed' or 'unchanged'
+        """
+        item_id = int(letter['id'])
+        with self._lock:
+            self.seen.add(item_id)
+
+        if self.is_current(letter):
+            with self._lock:
+                self.unchanged += 1
+            return 'unchanged'
+
+        with open(self.path_for(item_id), 'w', encoding='utf-8') as f:
+            json.dump(letter, f, indent=2, ensure_ascii=False)
+
+        with self._lock:
+            if item_id in self.existing:
+                self.changed.append(item_id)
+                return 'changed'
+            self.new.append(item_id)
+            return 'new'
+
+    def deleted(self):
+        """Item IDs that have a letter file but were not in this extraction"""
+        if not self.track_deletions:
+            return []
+        return sorted(set(self.existing) - self.seen)
+
+    def finish(self):
+        """Report what changed and optionally prune deleted letters"""
+        deleted = self.deleted()
+
+        print(f"\n✓ {len(self.new)} new, {len(self.changed)} changed, "
+              f"{self.unchanged} unchanged letters in {self.out_dir}/")
+        if self.new:
+            print(f"  New: {', '.join(map(str, sorted(self.new)))}")
+        if self.changed:
+            print(f"  Changed: {', '.join(map(str, sorted(self.changed)))}")
+
+        if deleted:
+            action = 'Deleted' if self.prune else 'No longer in dump (use --prune to delete)'
+            print(f"  {action}: {', '.join(map(str, deleted))}")
+            if self.prune:
+                for item_id in deleted:
+                    self.existing[item_id].unlink()
+
+        return deleted
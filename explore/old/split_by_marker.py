@@ -1,16 +1,37 @@
 #!/usr/bin/env python3
 """
 Split letter JSON files into Norwegian and English versions based on <-SPLITTLETTER-> marker
+Descriptions are split on <-SPLITDESC-> in the same pass
+Letters are read from letters/ or from a packed store given with --store
+
+Letters are split across a pool of worker processes, and letters whose
+source is unchanged since the last run (tracked in .split-manifest.json)
+are skipped; use --force to split everything again. Each manifest entry
+also records a hash of this script, so changing the splitter re-splits
+every letter
 """
+import argparse
+import hashlib
 import json
 import os
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+# letter_store lives with the build scripts in new/
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'new'))
+from letter_store import open_store
+
 LETTERS_DIR = Path('letters')
 NORWEGIAN_DIR = Path('norwegian_letters')
 ENGLISH_DIR = Path('english_letters')
+MANIFEST_FILE = Path('.split-manifest.json')
 SPLIT_MARKER = '\n\n<-SPLITTLETTER->\n\n'
+DESCRIPTION_MARKER = '<-SPLITDESC->'
+
+# Output written by an older version of this script is out of date
+SPLITTER_HASH = hashlib.sha1(Path(__file__).read_bytes()).hexdigest()
 
 def clean_multiple_blank_lines(text):
     """Reduce multiple blank lines to single blank line between paragraphs"""
@@ -18,79 +39,132 @@ def clean_multiple_blank_lines(text):
     text = re.sub(r'\n{3,}', '\n\n', text)
     return text.strip()
 
+def split_on(text, marker):
+    """Split text on the first marker; the second part is '' if there is none"""
+    parts = text.split(marker, 1)  # Split only on first occurrence
+    return parts[0], parts[1] if len(parts) > 1 else ''
+
 def split_letter(letter_data, filename):
-    """Split a letter into Norwegian and English versions"""
-    # Get the text field
-    text = letter_data.get('metadata', {}).get('Text', [''])[0]
-
-    # Split on marker
-    if SPLIT_MARKER in text:
-        parts = text.split(SPLIT_MARKER, 1)  # Split only on first occurrence
-        norwegian_text = parts[0]
-        english_text = parts[1] if len(parts) > 1 else ''
-    else:
-        # No marker - try to detect language or put everything in both
-        norwegian_text = text
-        english_text = ''
+    """
+    Split a letter into Norwegian and English versions
+    Both versions share every unchanged part of the original letter; only
+    the Text, Language and (if it has a marker) Description fields differ
+    """
+    metadata = letter_data.get('metadata', {})
+
+    # Split the text on marker; with no marker everything stays Norwegian
+    text = metadata.get('Text', [''])[0]
+    norwegian_text, english_text = split_on(text, SPLIT_MARKER)
 
     # Clean up multiple blank lines
     norwegian_text = clean_multiple_blank_lines(norwegian_text)
     english_text = clean_multiple_blank_lines(english_text)
 
-    # Create Norwegian version
-    norwegian_data = json.loads(json.dumps(letter_data))  # Deep copy
-    norwegian_data['metadata']['Text'] = [norwegian_text]
-    norwegian_data['metadata']['Language'] = ['no']
+    norwegian_fields = {'Text': [norwegian_text], 'Language': ['no']}
+    english_fields = {'Text': [english_text], 'Language': ['en']}
+
+    # Descriptions without a marker are kept whole in both versions
+    description = (metadata.get('Description') or [''])[0]
+    if description and DESCRIPTION_MARKER in description:
+        norwegian_description, english_description = split_on(description, DESCRIPTION_MARKER)
+        norwegian_fields['Description'] = [clean_multiple_blank_lines(norwegian_description)]
+        english_fields['Description'] = [clean_multiple_blank_lines(english_description)]
 
-    # Create English version
-    english_data = json.loads(json.dumps(letter_data))  # Deep copy
-    english_data['metadata']['Text'] = [english_text]
-    english_data['metadata']['Language'] = ['en']
+    # Shallow copies: untouched fields are shared with the original letter
+    norwegian_data = {**letter_data, 'metadata': {**metadata, **norwegian_fields}}
+    english_data = {**letter_data, 'metadata': {**metadata, **english_fields}}
 
     return norwegian_data, english_data
 
+def source_hash(raw):
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+def load_manifest():
+    try:
+        with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_manifest(manifest):
+    with open(MANIFEST_FILE, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+def process_letter(filename, raw):
+    """Split one letter and write both versions (runs in a worker process)"""
+    letter_data = json.loads(raw)
+
+    # Split into Norwegian and English
+    norwegian_data, english_data = split_letter(letter_data, filename)
+
+    # Write Norwegian version
+    with open(NORWEGIAN_DIR / filename, 'w', encoding='utf-8') as f:
+        json.dump(norwegian_data, f, ensure_ascii=False, indent=2)
+
+    # Write English version
+    with open(ENGLISH_DIR / filename, 'w', encoding='utf-8') as f:
+        json.dump(english_data, f, ensure_ascii=False, indent=2)
+
+def manifest_entry(digest):
+    return {'source': digest, 'splitter': SPLITTER_HASH}
+
+def is_current(filename, digest, manifest):
+    return (manifest.get(filename) == manifest_entry(digest)
+            and (NORWEGIAN_DIR / filename).exists()
+            and (ENGLISH_DIR / filename).exists())
+
 def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--store', default=LETTERS_DIR,
+                        help='letter directory or packed store (default: letters/)')
+    parser.add_argument('--force', action='store_true',
+                        help='split every letter, even if unchanged since the last run')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='number of worker processes')
+    args = parser.parse_args()
+    if args.workers is not None and args.workers < 1:
+        parser.error('--workers must be at least 1')
+
     # Create output directories
     NORWEGIAN_DIR.mkdir(exist_ok=True)
     ENGLISH_DIR.mkdir(exist_ok=True)
 
-    # Process all JSON files in letters directory
-    letter_files = sorted(LETTERS_DIR.glob('*.json'))
+    manifest = {} if args.force else load_manifest()
 
-    print(f"Found {len(letter_files)} letter files to process")
+    store = open_store(args.store)
+    print(f"Found {len(store)} letters to process in {store}")
 
     processed = 0
+    skipped = 0
     errors = 0
 
-    for letter_file in letter_files:
-        try:
-            # Read original letter
-            with open(letter_file, 'r', encoding='utf-8') as f:
-                letter_data = json.load(f)
-
-            # Split into Norwegian and English
-            norwegian_data, english_data = split_letter(letter_data, letter_file.name)
-
-            # Write Norwegian version
-            norwegian_path = NORWEGIAN_DIR / letter_file.name
-            with open(norwegian_path, 'w', encoding='utf-8') as f:
-                json.dump(norwegian_data, f, ensure_ascii=False, indent=2)
-
-            # Write English version
-            english_path = ENGLISH_DIR / letter_file.name
-            with open(english_path, 'w', encoding='utf-8') as f:
-                json.dump(english_data, f, ensure_ascii=False, indent=2)
-
-            processed += 1
-            print(f"✓ {letter_file.name}")
-
-        except Exception as e:
-            errors += 1
-            print(f"✗ Error processing {letter_file.name}: {e}")
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        jobs = {}
+        for letter_id, raw in store.iter_raw():
+            filename = f"{letter_id:04d}.json"
+            digest = source_hash(raw)
+            if is_current(filename, digest, manifest):
+                skipped += 1
+                continue
+            jobs[pool.submit(process_letter, filename, raw)] = (filename, digest)
+
+        for future, (filename, digest) in jobs.items():
+            try:
+                future.result()
+                manifest[filename] = manifest_entry(digest)
+                processed += 1
+                print(f"✓ {filename}")
+            except Exception as e:
+                errors += 1
+                print(f"✗ Error processing {filename}: {e}")
+
+    store.close()
+    save_manifest(manifest)
 
     print(f"\n{'='*60}")
     print(f"Processing complete!")
     print(f"  Processed: {processed} letters")
+    print(f"  Unchanged: {skipped} letters")
     print(f"  Errors: {errors}")
     print(f"  Norwegian files: {NORWEGIAN_DIR}/")
     print(f"  English files: {ENGLISH_DIR}/")
@@ -9,36 +9,37 @@ import glob
 import re
 import os
 
-def detect_language_section(text):
-    """
-    Detect if text section is Norwegian or English
-    Returns 'norwegian', 'english', or 'mixed'
-    """
-    # Common Norwegian words/patterns
-    norwegian_indicators = [
-        'jeg', 'det', 'til', 'fra', 'og', 'med', 'når', 'være', 'ikke',
-        'har', 'som', 'de', 'på', 'brev', 'kj&aelig;re', 'tak', 'hilsen',
-        'så', 'får', 'å', 'æ', 'ø'
-    ]
-
-    # Common English words
-    english_indicators = [
-        'the', 'and', 'to', 'from', 'dear', 'letter', 'with', 'that',
-        'have', 'been', 'this', 'will', 'your', 'love'
-    ]
+import language_model
 
-    text_lower = text.lower()
+# Probability of Norwegian above/below which a section is no longer 'mixed'
+NORWEGIAN_THRESHOLD = 0.8
+ENGLISH_THRESHOLD = 0.2
 
-    norwegian_count = sum(1 for word in norwegian_indicators if word in text_lower)
-    english_count = sum(1 for word in english_indicators if word in text_lower)
-
-    if norwegian_count > english_count * 2:
+def classify_probability(p_norwegian):
+    if p_norwegian >= NORWEGIAN_THRESHOLD:
         return 'norwegian'
-    elif english_count > norwegian_count * 2:
+    elif p_norwegian <= ENGLISH_THRESHOLD:
         return 'english'
     else:
         return 'mixed'
 
+def detect_language_sections(texts):
+    """
+    Detect the language of several text sections in one batch
+    Uses the character n-gram model in language_model.py (trained on the letters
+    already split with <-SPLITTLETTER->)
+    Returns a list of 'norwegian', 'english', or 'mixed'
+    """
+    probabilities = language_model.predict_proba(texts)
+    return [classify_probability(p['norwegian']) for p in probabilities]
+
+def detect_language_section(text):
+    """
+    Detect if text section is Norwegian or English
+    Returns 'norwegian', 'english', or 'mixed'
+    """
+    return detect_language_sections([text])[0]
+
 def split_description(description):
     """
     Split description into Norwegian and English parts
@@ -52,8 +53,7 @@ def split_description(description):
 
     if len(parts) >= 2:
         # Check which is which
-        first_lang = detect_language_section(parts[0])
-        second_lang = detect_language_section(parts[1]) if len(parts) > 1 else 'unknown'
+        first_lang, second_lang = detect_language_sections(parts[:2])
 
         if first_lang == 'norwegian' and second_lang == 'english':
             return (parts[0].strip(), '\n\n'.join(parts[1:]).strip())
@@ -97,9 +97,10 @@ def split_text(text):
     english_paras = []
     found_split = False
 
-    for i, para in enumerate(paragraphs):
-        lang = detect_language_section(para)
+    # Score all paragraphs in one batch
+    languages = detect_language_sections(paragraphs)
 
+    for i, (para, lang) in enumerate(zip(paragraphs, languages)):
         if not found_split:
             # Still in first language section
             if lang == 'norwegian' or lang == 'mixed':
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Static file fast path for the local editing server
+Mixed into SimpleHTTPRequestHandler, it replaces send_head() for plain files:
+
+  - precompressed siblings (letters.json.br / letters.json.gz) are served
+    with Content-Encoding when the browser accepts them and they are not
+    older than the original; a .gz/.br requested by name is sent as-is
+  - ETag / Last-Modified validators, answering If-None-Match and
+    If-Modified-Since with 304 Not Modified
+  - single byte ranges (Range / If-Range) with 206 and 416, e.g. for PDFs
+  - small files are kept in an in-memory LRU, keyed by mtime and size so an
+    edited file is picked up on the next request
+
+Directories (index.html, listings) still go through SimpleHTTPRequestHandler.
+"""
+
+import io
+import os
+import posixpath
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import unquote, urlsplit
+
+CACHE_MAX_BYTES = 64 * 1024 * 1024  # total size of the in-memory LRU
+CACHE_MAX_FILE = 4 * 1024 * 1024    # larger files are streamed from disk
+
+# Accept-Encoding token -> file suffix, in order of preference
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+
+class FileCache:
+    """Thread-safe LRU of small file contents"""
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, max_file=CACHE_MAX_FILE):
+        self.max_bytes = max_bytes
+        self.max_file = max_file
+        self.size = 0
+        self._entries = OrderedDict()  # path -> (mtime_ns, size, bytes)
+        self._lock = threading.Lock()
+
+    def get(self, path, stat):
+        """Contents of path if it is small enough to cache, else None"""
+        if stat.st_size > self.max_file:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+                self._entries.move_to_end(path)
+                return entry[2]
+
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old:
+                self.size -= len(old[2])
+            self._entries[path] = (stat.st_mtime_ns, stat.st_size, data)
+            self.size += len(data)
+            while self.size > self.max_bytes and self._entries:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+        return data
+
+class RangeReader:
+    """File object that stops after `length` bytes (for copyfile())"""
+
+    def __init__(self, f, length):
+        self.f = f
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.f.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.f.close()
+
+def parse_range(header, size):
+    """
+    Parse a Range header for a file of `size` bytes
+    Returns (start, end) inclusive, None to ignore the header (missing,
+    malformed or multiple ranges), or 'unsatisfiable'
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    start, sep, end = header[6:].strip().partition('-')
+    if not sep:
+        return None
+    try:
+        if not start:
+            # Suffix range: the last N bytes
+            length = int(end)
+            if length <= 0:
+                return 'unsatisfiable'
+            return max(size - length, 0), size - 1
+        start = int(start)
+        end = int(end) if end else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return 'unsatisfiable'
+    return start, min(end, size - 1)
+
+class StaticFilesMixin:
+    """send_head() with precompression, validators, ranges and caching"""
+
+    cache = FileCache()
+    mounts = {}  # URL prefix -> directory served outside the server root
+
+    def translate_path(self, path):
+        url_path = unquote(urlsplit(path).path)
+        for prefix, directory in self.mounts.items():
+            if url_path.startswith(prefix):
+                parts = [p for p in posixpath.normpath(url_path[len(prefix):]).split('/')
+                         if p and p not in (os.curdir, os.pardir)]
+                return os.path.join(directory, *parts)
+        return super().translate_path(path)
+
+    def accepted_encodings(self):
+        encodings = set()
+        for item in self.headers.get('Accept-Encoding', '').split(','):
+            token, _, params = item.strip().partition(';')
+            if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+                continue
+            encodings.add(token.strip().lower())
+        return encodings
+
+    def choose_variant(self, path):
+        """Return (file to send, Content-Encoding or None)"""
+        if path.endswith(tuple(suffix for _, suffix in PRECOMPRESSED)):
+            return path, None  # asked for the compressed file itself
+
+        try:
+            original_mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            original_mtime = None
+
+        accepted = self.accepted_encodings()
+        for encoding, suffix in PRECOMPRESSED:
+            if encoding not in accepted:
+                continue
+            try:
+                variant_mtime = os.stat(path + suffix).st_mtime_ns
+            except OSError:
+                continue
+            # A stale sibling (original edited since) is ignored
+            if original_mtime is None or variant_mtime >= original_mtime:
+                return path + suffix, encoding
+        return path, None
+
+    def not_modified(self, etag, stat):
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match:
+            tags = [t.strip() for t in if_none_match.split(',')]
+            return '*' in tags or etag in tags or f"W/{etag}" in tags
+
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError, IndexError, OverflowError):
+                return False
+            return int(stat.st_mtime) <= since
+        return False
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) or path.endswith('/'):
+            return super().send_head()
+
+        file_path, encoding = self.choose_variant(path)
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            self.send_error(404, "File not found")
+            return None
+
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+        last_modified = formatdate(stat.st_mtime, usegmt=True)
+
+        def common_headers():
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', last_modified)
+            self.send_header('Cache-Control', 'no-cache')  # always revalidate
+            self.send_header('Vary', 'Accept-Encoding')
+
+        if self.not_modified(etag, stat):
+            self.send_response(304)
+            common_headers()
+            self.end_headers()
+            return None
+
+        size = stat.st_size
+        byte_range = parse_range(self.headers.get('Range'), size)
+        if_range = self.headers.get('If-Range')
+        if byte_range and if_range and if_range not in (etag, last_modified):
+            byte_range = None  # file changed since the client's partial copy
+
+        if byte_range == 'unsatisfiable':
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{size}')
+            self.send_header('Content-Length', '0')
+            common_headers()
+            self.end_headers()
+            return None
+
+        start, end = byte_range or (0, size - 1)
+        length = end - start + 1 if size else 0
+
+        data = self.cache.get(file_path, stat)
+        if data is not None:
+            body = io.BytesIO(data[start:start + length])
+        else:
+            f = open(file_path, 'rb')
+            f.seek(start)
+            body = RangeReader(f, length)
+
+        self.send_response(206 if byte_range else 200)
+        self.send_header('Content-type', self.guess_type(path))
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        if byte_range:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.send_header('Content-Length', str(length))
+        self.send_header('Accept-Ranges', 'bytes')
+        common_headers()
+        self.end_headers()
+        return body
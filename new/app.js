@@ -195,12 +195,82 @@ class LettersApp {
         destinations: this.metadata.destinations.length
       });
 
+      // Load parsed letter dates (optional; LetterDate is used without it)
+      const dateIndexResponse = await fetch('date-index.json').catch(() => null);
+      if (dateIndexResponse && dateIndexResponse.ok) {
+        this.setDateIndex(await dateIndexResponse.json());
+        console.log(`Date index loaded: ${this.dateIndex.letters.length} dated letters`);
+      }
+
     } catch (error) {
       console.error('Error loading data:', error);
       throw error;
     }
   }
 
+  /**
+   * Keep the date index written by build-data.py: letter date ranges
+   * sorted by start, so date-range filters can binary-search them
+   */
+  setDateIndex(index) {
+    this.dateIndex = index;
+    this.letterRanges = new Map(
+      index.letters.map(([start, end, precision, id]) => [String(id), { start, end, precision }])
+    );
+  }
+
+  /**
+   * Year of a letter, from the date index (which also parses metadata.Date
+   * for letters without a LetterDate), or from LetterDate
+   */
+  getLetterYear(letter) {
+    const range = this.letterRanges?.get(String(letter.id));
+    if (range) {
+      return range.start.substring(0, 4);
+    }
+    const letterDate = (letter.metadata.LetterDate?.[0] || '').trim();
+    return letterDate ? letterDate.substring(0, 4) : '';
+  }
+
+  /**
+   * Ids of the dated letters whose date range overlaps [after, before]
+   * (YYYY, YYYY-MM or YYYY-MM-DD; either may be empty). Only letters that
+   * start between after - max_span_days and before can overlap, and both
+   * ends of that slice are found by binary search.
+   */
+  lettersInDateRange(after, before) {
+    const entries = this.dateIndex.letters;
+    const pad = value => (value + '-01-01').substring(0, 10);
+    const firstStartAfter = (value, inclusive) => {
+      let low = 0, high = entries.length;
+      while (low < high) {
+        const mid = (low + high) >> 1;
+        if (entries[mid][0] < value || (inclusive && entries[mid][0] === value)) {
+          low = mid + 1;
+        } else {
+          high = mid;
+        }
+      }
+      return low;
+    };
+
+    let from = 0;
+    if (after) {
+      const earliest = new Date(pad(after));
+      earliest.setUTCDate(earliest.getUTCDate() - this.dateIndex.max_span_days);
+      from = firstStartAfter(earliest.toISOString().substring(0, 10), false);
+    }
+    const to = before ? firstStartAfter(pad(before), true) : entries.length;
+
+    const ids = new Set();
+    for (let i = from; i < to; i++) {
+      if (!after || entries[i][1] >= pad(after)) {
+        ids.add(String(entries[i][3]));
+      }
+    }
+    return ids;
+  }
+
   /**
    * Set up all event listeners
    */
@@ -511,8 +581,7 @@ class LettersApp {
     });
 
     this.letters.forEach(letter => {
-      const yearStr = (letter.metadata.LetterDate?.[0] || '').trim();
-      const year = yearStr ? yearStr.substring(0, 4) : '';
+      const year = this.getLetterYear(letter);
       if (year && yearCounts.hasOwnProperty(year)) {
         yearCounts[year]++;
       }
@@ -997,6 +1066,12 @@ class LettersApp {
       }
     }
 
+    // Letters in the date range, looked up once in the date index
+    const { after, before } = this.currentFilters.dateRange;
+    const lettersInRange = this.dateIndex && (after || before)
+      ? this.lettersInDateRange(after, before)
+      : null;
+
     this.filteredLetters = this.letters.filter(letter => {
       // Filter by specific letter IDs if set
       if (this.currentFilters.letterIds.size > 0) {
@@ -1078,8 +1153,7 @@ class LettersApp {
 
       // Filter by year
       if (this.currentFilters.years.size > 0) {
-        const letterDate = (letter.metadata.LetterDate?.[0] || '').trim();
-        const year = letterDate ? letterDate.substring(0, 4) : '';
+        const year = this.getLetterYear(letter);
         if (!this.currentFilters.years.has(year)) {
           return false;
         }
@@ -1119,8 +1193,12 @@ class LettersApp {
         }
       }
 
-      // Filter by date range
-      if (this.currentFilters.dateRange.before || this.currentFilters.dateRange.after) {
+      // Filter by date range (undated letters are kept)
+      if (lettersInRange) {
+        if (this.letterRanges.has(String(letter.id)) && !lettersInRange.has(String(letter.id))) {
+          return false;
+        }
+      } else if (this.currentFilters.dateRange.before || this.currentFilters.dateRange.after) {
         const letterDate = letter.metadata.LetterDate?.[0];
         if (letterDate) {
           const date = new Date(letterDate);
@@ -1175,8 +1253,7 @@ class LettersApp {
 
       // Negative years
       if (this.currentFilters.yearsNegative.size > 0) {
-        const letterDate = (letter.metadata.LetterDate?.[0] || '').trim();
-        const year = letterDate ? letterDate.substring(0, 4) : '';
+        const year = this.getLetterYear(letter);
         if (this.currentFilters.yearsNegative.has(year)) {
           return false;
         }
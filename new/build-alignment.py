@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Build paragraph and sentence alignments between the Norwegian and English
+halves of each letter, for side-by-side bilingual reading.
+
+Run after build-data.py. Reads letters.ndjson and writes alignment.json,
+which the viewer loads as-is: it only slices the two halves with the stored
+offsets and pairs them up, with no alignment work at view time.
+
+Segmentation
+------------
+The halves are the two sides of <-SPLITTLETTER->, trimmed, exactly as the
+viewer's getDisplayText() produces them. Letters without a marker are not
+aligned.
+
+  Paragraphs  text between blank lines (a line break followed by a line that
+              is empty or whitespace only)
+  Sentences   within a paragraph, a break after . ! or ? (plus any closing
+              quotes/brackets) followed by whitespace and an upper-case
+              letter, digit or opening quote; or a run of whitespace that
+              contains a non-breaking space followed by an upper-case letter
+              (the transcriptions often mark sentence ends that way).
+              No break after a known abbreviation (f.ex., No., Mr., ...),
+              a single letter (initials) or a number ("17. Mai").
+
+Alignment
+---------
+Gale–Church dynamic programming over character lengths: each bead costs
+-log(P(bead type) * P(length difference)), with the English/Norwegian length
+ratio and variance estimated from the corpus. Bead types are 1-1, 1-0, 0-1,
+2-1, 1-2 and 2-2. Shared anchors (numbers, month names, capitalized names
+that occur in both halves of the letter) lower the cost of a bead, anchors
+present on only one side raise it. Paragraphs are aligned first; sentences
+are then aligned inside each paragraph bead.
+
+Output (alignment.json)
+-----------------------
+  {
+    "version": 1,
+    "letters": {
+      "<id>": {
+        "no": [[start, end], ...],   sentence spans in the Norwegian half
+        "en": [[start, end], ...],   sentence spans in the English half
+        "np": [0, 4, ...],           first sentence of each Norwegian paragraph
+        "ep": [0, 3, ...],           first sentence of each English paragraph
+        "p":  [[no, n, en, m], ...], paragraph beads
+        "s":  [[no, n, en, m], ...]  sentence beads
+      }
+    }
+  }
+
+A bead [no, n, en, m] pairs n Norwegian units starting at index no with m
+English units starting at index en (n or m may be 0). Paragraph beads index
+paragraphs, sentence beads index sentences. Offsets are UTF-16 code units,
+so they can be used directly with String.prototype.slice() in the browser.
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+from collections import Counter
+from pathlib import Path
+
+from corpus import NDJSON_FILE, iter_letters, utf16_offsets
+
+OUTPUT_FILE = Path(__file__).parent / "alignment.json"
+SPLIT_MARKER = '<-SPLITTLETTER->'
+
+# Gale & Church (1993) bead priors
+BEAD_PRIORS = {
+    (1, 1): 0.89,
+    (1, 0): 0.0099 / 2,
+    (0, 1): 0.0099 / 2,
+    (2, 1): 0.089 / 2,
+    (1, 2): 0.089 / 2,
+    (2, 2): 0.011,
+}
+BEAD_COSTS = {bead: -math.log(p) for bead, p in BEAD_PRIORS.items()}
+
+ANCHOR_BONUS = 2.0    # cost removed per anchor shared by both sides of a bead
+ANCHOR_PENALTY = 0.5  # cost added per anchor found on one side only
+
+PARAGRAPH_RE = re.compile(r'\n[ \t\xa0]*\n\s*')
+SENTENCE_END_RE = re.compile(r'[.!?]+["”’»)\]]*(\s+)(?=["“‘«(]?[A-ZÆØÅÄÖÜ0-9])')
+NBSP_BREAK_RE = re.compile(r'[ \t]*\xa0\s*(?=[A-ZÆØÅÄÖÜ])')
+WORD_BEFORE_RE = re.compile(r'([\w.]+)[.!?]*["”’»)\]]*$')
+TOKEN_RE = re.compile(r'\w+')
+
+ABBREVIATIONS = {
+    # Norwegian / Dano-Norwegian
+    'f.ex', 'f.eks', 'ex', 'eks', 'bl.a', 'dvs', 'osv', 'o.s.v', 'ca', 'kl',
+    'nr', 'no', 'st', 'sml', 'jfr', 'hr', 'fr', 'frk', 'pr', 'ang', 'adr',
+    # English
+    'mr', 'mrs', 'ms', 'dr', 'rev', 'e.g', 'i.e', 'etc', 'vs', 'jr', 'sr', 'co',
+    # Months
+    'jan', 'feb', 'mar', 'apr', 'jun', 'jul', 'aug', 'sep', 'sept', 'okt',
+    'oct', 'nov', 'des', 'dec',
+}
+
+MONTHS = {
+    'januar': 1, 'january': 1, 'februar': 2, 'february': 2, 'mars': 3,
+    'march': 3, 'april': 4, 'mai': 5, 'may': 5, 'juni': 6, 'june': 6,
+    'juli': 7, 'july': 7, 'august': 8, 'september': 9, 'oktober': 10,
+    'october': 10, 'november': 11, 'desember': 12, 'december': 12,
+}
+
+def split_halves(text):
+    """Norwegian and English halves as the viewer shows them, or None"""
+    if not text or SPLIT_MARKER not in text:
+        return None
+    parts = text.split(SPLIT_MARKER)
+    norwegian, english = parts[0].strip(), parts[1].strip()
+    if not norwegian or not english:
+        return None
+    return norwegian, english
+
+def is_abbreviation(before):
+    """True if the text before a full stop ends in an abbreviation or number"""
+    match = WORD_BEFORE_RE.search(before)
+    if not match:
+        return False
+    word = match.group(1).rstrip('.').lower()
+    return len(word) == 1 or word.isdigit() or word in ABBREVIATIONS
+
+def sentence_breaks(paragraph):
+    """Offsets within a paragraph where new sentences start"""
+    breaks = set()
+    for match in SENTENCE_END_RE.finditer(paragraph):
+        if paragraph[match.start()] == '.' and is_abbreviation(paragraph[:match.start()]):
+            continue
+        breaks.add(match.end())
+    for match in NBSP_BREAK_RE.finditer(paragraph):
+        breaks.add(match.end())
+    return sorted(breaks)
+
+def segment(text):
+    """
+    Split a half into paragraphs of sentences
+    Returns (sentence spans, index of the first sentence of each paragraph),
+    spans as (start, end) code point offsets into text
+    """
+    sentences = []
+    paragraph_starts = []
+
+    start = 0
+    paragraph_bounds = []
+    for match in PARAGRAPH_RE.finditer(text):
+        paragraph_bounds.append((start, match.start()))
+        start = match.end()
+    paragraph_bounds.append((start, len(text)))
+
+    for p_start, p_end in paragraph_bounds:
+        paragraph = text[p_start:p_end].rstrip()
+        if not paragraph.strip():
+            continue
+        paragraph_starts.append(len(sentences))
+        cuts = [0] + sentence_breaks(paragraph) + [len(paragraph)]
+        for a, b in zip(cuts, cuts[1:]):
+            sentence = paragraph[a:b].rstrip()
+            if sentence:
+                sentences.append((p_start + a, p_start + a + len(sentence)))
+
+    return sentences, paragraph_starts
+
+def anchors(text, shared_names):
+    """Numbers, months and names in a segment that can anchor an alignment"""
+    found = Counter()
+    for token in TOKEN_RE.findall(text):
+        lower = token.lower()
+        if token.isdigit():
+            found[token.lstrip('0') or '0'] += 1
+        elif lower in MONTHS:
+            found[f"month:{MONTHS[lower]}"] += 1
+        elif token in shared_names:
+            found[token] += 1
+    return found
+
+def capitalized_words(text):
+    return {token for token in TOKEN_RE.findall(text)
+            if token[0].isupper() and not token.isupper() and len(token) > 1}
+
+class Aligner:
+    """Gale–Church length-based aligner with anchor adjustments"""
+
+    def __init__(self, ratio, variance):
+        self.ratio = ratio        # English characters per Norwegian character
+        self.variance = variance  # variance of the length difference per character
+
+    def length_cost(self, no_length, en_length):
+        if no_length == 0 and en_length == 0:
+            return 0.0
+        mean = (no_length + en_length / self.ratio) / 2
+        delta = (en_length - no_length * self.ratio) / math.sqrt(max(mean, 1) * self.variance)
+        # Two-tailed probability of a difference at least this large
+        p = math.erfc(abs(delta) / math.sqrt(2))
+        return -math.log(max(p, 1e-300))
+
+    def anchor_cost(self, no_anchors, en_anchors):
+        if not no_anchors and not en_anchors:
+            return 0.0
+        shared = sum((no_anchors & en_anchors).values())
+        unmatched = sum((no_anchors - en_anchors).values()) + sum((en_anchors - no_anchors).values())
+        return ANCHOR_PENALTY * unmatched - ANCHOR_BONUS * shared
+
+    def align(self, no_lengths, en_lengths, no_anchors, en_anchors):
+        """
+        Align two sequences of segments
+        Returns beads as (no_start, no_count, en_start, en_count)
+        """
+        n, m = len(no_lengths), len(en_lengths)
+        no_prefix = [0]
+        for length in no_lengths:
+            no_prefix.append(no_prefix[-1] + length)
+        en_prefix = [0]
+        for length in en_lengths:
+            en_prefix.append(en_prefix[-1] + length)
+
+        # Anchors of every one- and two-segment run, looked up per bead
+        def runs(items):
+            summed = {}
+            for start in range(len(items) + 1):
+                summed[start, 0] = Counter()
+                summed[start, 1] = items[start] if start < len(items) else Counter()
+                summed[start, 2] = (items[start] + items[start + 1]
+                                    if start + 1 < len(items) else Counter())
+            return summed
+
+        no_runs, en_runs = runs(no_anchors), runs(en_anchors)
+
+        infinity = float('inf')
+        cost = [[infinity] * (m + 1) for _ in range(n + 1)]
+        back = [[None] * (m + 1) for _ in range(n + 1)]
+        cost[0][0] = 0.0
+
+        for i in range(n + 1):
+            for j in range(m + 1):
+                if cost[i][j] == infinity:
+                    continue
+                for (di, dj), bead_cost in BEAD_COSTS.items():
+                    ni, nj = i + di, j + dj
+                    if ni > n or nj > m:
+                        continue
+                    total = (cost[i][j] + bead_cost
+                             + self.length_cost(no_prefix[ni] - no_prefix[i],
+                                                en_prefix[nj] - en_prefix[j])
+                             + self.anchor_cost(no_runs[i, di], en_runs[j, dj]))
+                    if total < cost[ni][nj]:
+                        cost[ni][nj] = total
+                        back[ni][nj] = (di, dj)
+
+        beads = []
+        i, j = n, m
+        while i or j:
+            di, dj = back[i][j]
+            i, j = i - di, j - dj
+            beads.append((i, di, j, dj))
+        beads.reverse()
+        return beads
+
+def to_utf16(spans, text):
+    offsets = utf16_offsets(text)
+    if offsets is None:
+        return [[a, b] for a, b in spans]
+    return [[offsets[a], offsets[b]] for a, b in spans]
+
+def text_length(text):
+    """Length used for alignment: characters, ignoring runs of whitespace"""
+    return len(re.sub(r'\s+', ' ', text).strip())
+
+def estimate_length_model(halves):
+    """
+    English/Norwegian character ratio and variance
+    Estimated from paragraph pairs of letters whose halves have the same
+    number of paragraphs, which are nearly always translated one to one
+    """
+    pairs = []
+    for norwegian, english in halves:
+        no_paragraphs = [p for p in PARAGRAPH_RE.split(norwegian) if p.strip()]
+        en_paragraphs = [p for p in PARAGRAPH_RE.split(english) if p.strip()]
+        if len(no_paragraphs) == len(en_paragraphs):
+            pairs.extend(zip(map(text_length, no_paragraphs), map(text_length, en_paragraphs)))
+    pairs = [(no, en) for no, en in pairs if no and en]
+    if not pairs:
+        return 1.0, 6.8
+
+    ratio = sum(en for _, en in pairs) / sum(no for no, _ in pairs)
+    # Variance of (en - no * ratio) per character, as in Gale & Church
+    variance = sum((en - no * ratio) ** 2 for no, en in pairs) / sum(no for no, _ in pairs)
+    return ratio, max(variance, 1.0)
+
+def align_letter(aligner, norwegian, english):
+    """Paragraph and sentence alignment for one letter"""
+    no_spans, no_paragraphs = segment(norwegian)
+    en_spans, en_paragraphs = segment(english)
+
+    shared_names = capitalized_words(norwegian) & capitalized_words(english)
+    no_anchors = [anchors(norwegian[a:b], shared_names) for a, b in no_spans]
+    en_anchors = [anchors(english[a:b], shared_names) for a, b in en_spans]
+    no_lengths = [text_length(norwegian[a:b]) for a, b in no_spans]
+    en_lengths = [text_length(english[a:b]) for a, b in en_spans]
+
+    def paragraph_ranges(starts, total):
+        return list(zip(starts, starts[1:] + [total]))
+
+    no_ranges = paragraph_ranges(no_paragraphs, len(no_spans))
+    en_ranges = paragraph_ranges(en_paragraphs, len(en_spans))
+
+    def paragraph_totals(ranges, lengths, anchor_list):
+        totals, anchor_totals = [], []
+        for a, b in ranges:
+            totals.append(sum(lengths[a:b]))
+            merged = Counter()
+            for item in anchor_list[a:b]:
+                merged.update(item)
+            anchor_totals.append(merged)
+        return totals, anchor_totals
+
+    no_p_lengths, no_p_anchors = paragraph_totals(no_ranges, no_lengths, no_anchors)
+    en_p_lengths, en_p_anchors = paragraph_totals(en_ranges, en_lengths, en_anchors)
+    paragraph_beads = aligner.align(no_p_lengths, en_p_lengths, no_p_anchors, en_p_anchors)
+
+    # Sentences are aligned inside each paragraph bead
+    sentence_beads = []
+    for no_p, no_n, en_p, en_n in paragraph_beads:
+        no_first = no_ranges[no_p][0] if no_n else None
+        no_last = no_ranges[no_p + no_n - 1][1] if no_n else None
+        en_first = en_ranges[en_p][0] if en_n else None
+        en_last = en_ranges[en_p + en_n - 1][1] if en_n else None
+
+        if not no_n:
+            sentence_beads.append((no_ranges[no_p][0] if no_p < len(no_ranges) else len(no_spans),
+                                   0, en_first, en_last - en_first))
+            continue
+        if not en_n:
+            sentence_beads.append((no_first, no_last - no_first,
+                                   en_ranges[en_p][0] if en_p < len(en_ranges) else len(en_spans), 0))
+            continue
+
+        for s_no, s_n, s_en, s_m in aligner.align(no_lengths[no_first:no_last],
+                                                  en_lengths[en_first:en_last],
+                                                  no_anchors[no_first:no_last],
+                                                  en_anchors[en_first:en_last]):
+            sentence_beads.append((no_first + s_no, s_n, en_first + s_en, s_m))
+
+    return {
+        'no': to_utf16(no_spans, norwegian),
+        'en': to_utf16(en_spans, english),
+        'np': no_paragraphs,
+        'ep': en_paragraphs,
+        'p': [list(bead) for bead in paragraph_beads],
+        's': [list(bead) for bead in sentence_beads],
+    }
+
+def letter_halves(corpus_path):
+    """Yield (id, norwegian, english) for every letter with both halves"""
+    for letter in iter_letters(corpus_path):
+        text = (letter.get('metadata', {}).get('Text') or [''])[0]
+        halves = split_halves(text)
+        if halves:
+            yield letter['id'], *halves
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', default=NDJSON_FILE,
+                        help='letters.ndjson built by build-data.py')
+    parser.add_argument('--output', default=OUTPUT_FILE,
+                        help='where to write the alignment (default: alignment.json)')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Bilingual Alignment")
+    print("=" * 60)
+
+    # First pass: corpus-wide length model
+    ratio, variance = estimate_length_model(
+        (no, en) for _, no, en in letter_halves(args.corpus))
+    print(f"\nLength model: {ratio:.3f} English characters per Norwegian, "
+          f"variance {variance:.2f}")
+    aligner = Aligner(ratio, variance)
+
+    # Second pass: align each letter
+    letters = {}
+    paragraph_types = Counter()
+    sentence_types = Counter()
+    for letter_id, norwegian, english in letter_halves(args.corpus):
+        alignment = align_letter(aligner, norwegian, english)
+        letters[str(letter_id)] = alignment
+        paragraph_types.update(f"{n}-{m}" for _, n, _, m in alignment['p'])
+        sentence_types.update(f"{n}-{m}" for _, n, _, m in alignment['s'])
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'version': 1, 'letters': letters}, f, separators=(',', ':'))
+
+    def describe(types):
+        return ', '.join(f"{bead}: {count}" for bead, count in types.most_common())
+
+    print(f"\nAligned {len(letters)} letters")
+    print(f"  Paragraph beads: {describe(paragraph_types)}")
+    print(f"  Sentence beads: {describe(sentence_types)}")
+    print(f"\nSaved {args.output} ({os.path.getsize(args.output):,} bytes)")
+
+if __name__ == "__main__":
+    main()
@@ -3,105 +3,160 @@
 Build script for Norwegian Letters Browser
 Combines individual letter JSON files into a single compressed file
 and generates metadata index for filtering.
+
+Letter dates are parsed once (letter_dates.py: LetterDate, or Date when it
+is missing, as a start..end range with its precision) into date-index.json:
+
+  {
+    "version": 1,
+    "max_span_days": 365,                longest range, for range queries
+    "letters": [[start, end, precision, id], ...],   sorted by start, then id
+    "undated": [id, ...],
+    "years": {"1946": 40, ...},          letters per year
+    "months": {"1946-12": 6, ...}        letters known to the month
+  }
+
+A date-range filter only has to binary-search "letters" for the starts in
+[from - max_span_days, to] and check their ends. The year facet in
+metadata-index.json comes from the same parsed dates.
+
+Letters are read from letters-raw/ by default; pass --store letters.db to
+build from a packed letter store instead (see letter_store.py).
+
+Letters are streamed: one pass collects the sort keys, a second pass reads
+each letter by id in date order and writes it straight to letters.json,
+letters.json.gz and letters.ndjson (see corpus.py).
+
+With --watch the script keeps running after the build: it waits for letters
+to change (inotify via the optional inotify_simple package, or by polling
+the store), collects changes over a short window, patches its in-memory
+corpus and facet counts, and re-writes the letter files, plus
+metadata-index.json when the filter values changed and date-index.json when
+the parsed letter dates changed.
 """
 
+import argparse
 import json
-import gzip
 import os
+import time
 from pathlib import Path
-from collections import defaultdict
+from collections import Counter, defaultdict
+
+from corpus import CorpusWriter, letter_creators, serialize
+from letter_dates import letter_range
+from letter_store import DirectoryStore, atomic_write, letter_id_from_filename, open_store
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
 
 # Directories
 LETTERS_RAW_DIR = Path(__file__).parent / "letters-raw"
 OUTPUT_DIR = Path(__file__).parent
 
-def load_all_letters():
-    """Load all letter JSON files from letters-raw directory."""
-    letters = []
-    json_files = sorted(LETTERS_RAW_DIR.glob("*.json"))
+def sort_key(letter):
+    """Build order: by LetterDate, ties broken by id."""
+    return (letter.get('metadata', {}).get('LetterDate', [''])[0] or '', int(letter['id']))
 
-    print(f"Found {len(json_files)} JSON files in {LETTERS_RAW_DIR}")
+def collect_sort_keys(store):
+    """First pass: read every letter once, keeping only its sort key."""
+    keys = []
 
-    for json_file in json_files:
+    print(f"Reading letters from {store}")
+
+    for letter_id, raw in store.iter_raw():
         try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                letter = json.load(f)
-                letters.append(letter)
+            keys.append(sort_key(json.loads(raw)))
         except Exception as e:
-            print(f"Error loading {json_file}: {e}")
+            print(f"Error loading letter {letter_id}: {e}")
 
-    print(f"Successfully loaded {len(letters)} letters")
-    return letters
+    print(f"Successfully loaded {len(keys)} letters")
+    keys.sort()
+    return keys
 
-def extract_metadata(letters):
-    """Extract unique metadata for filters."""
-    metadata = {
-        'tags': set(),
-        'creators': set(),
-        'years': set(),
-        'locations': set(),
-        'destinations': set()
-    }
+FACETS = ('tags', 'creators', 'years', 'locations', 'destinations')
+
+def new_metadata():
+    return {facet: set() for facet in FACETS}
+
+def letter_facets(letter):
+    """One letter's filter values, as {facet: set of values}."""
+    facets = new_metadata()
+
+    # Extract tags
+    if letter.get('tags'):
+        for tag in letter['tags']:
+            if tag:  # Skip empty tags
+                facets['tags'].add(tag.strip())
+
+    # Extract creators (excluding the translator entry, see corpus.py)
+    facets['creators'].update(letter_creators(letter))
+
+    # Extract year from LetterDate (or Date, see letter_dates.py)
+    date_range = letter_range(letter)
+    if date_range:
+        facets['years'].add(str(date_range.start.year))
+
+    # Extract locations
+    if letter.get('metadata', {}).get('Location'):
+        location = letter['metadata']['Location'][0]
+        if location:
+            facets['locations'].add(location.strip())
+
+    # Extract destinations
+    if letter.get('metadata', {}).get('Destination'):
+        destination = letter['metadata']['Destination'][0]
+        if destination:
+            facets['destinations'].add(destination.strip())
+
+    return facets
+
+def add_letter_metadata(metadata, letter):
+    """Add one letter's filter values to the metadata sets."""
+    for facet, values in letter_facets(letter).items():
+        metadata[facet].update(values)
+
+def finalize_metadata(metadata):
+    """Convert sets (or value counts) to sorted lists for JSON serialization."""
+    return {facet: sorted(value for value in metadata[facet]) for facet in FACETS}
+
+def date_index(ranges):
+    """date-index.json contents for {letter id: DateRange or None}."""
+    dated = sorted((r.start, letter_id, r) for letter_id, r in ranges.items() if r)
+    years, months = Counter(), Counter()
+    for start, _, date_range in dated:
+        years[str(start.year)] += 1
+        if date_range.precision in ('month', 'day'):
+            months[start.strftime('%Y-%m')] += 1
 
-    for letter in letters:
-        # Extract tags
-        if letter.get('tags'):
-            for tag in letter['tags']:
-                if tag:  # Skip empty tags
-                    metadata['tags'].add(tag.strip())
-
-        # Extract creators (excluding translator and other non-author entries)
-        if letter.get('metadata', {}).get('Creator'):
-            for creator in letter['metadata']['Creator']:
-                # Skip translator and empty strings
-                creator_clean = creator.strip() if creator else ''
-                # Skip any variation of "Siri Lawson" with "trans"
-                import re
-                if creator_clean and not re.search(r'Siri Lawson.*trans', creator_clean, re.IGNORECASE):
-                    metadata['creators'].add(creator_clean)
-
-        # Extract year from LetterDate
-        if letter.get('metadata', {}).get('LetterDate'):
-            letter_date = letter['metadata']['LetterDate'][0]
-            if letter_date:
-                year = letter_date[:4]  # Extract YYYY
-                metadata['years'].add(year.strip())
-
-        # Extract locations
-        if letter.get('metadata', {}).get('Location'):
-            location = letter['metadata']['Location'][0]
-            if location:
-                metadata['locations'].add(location.strip())
-
-        # Extract destinations
-        if letter.get('metadata', {}).get('Destination'):
-            destination = letter['metadata']['Destination'][0]
-            if destination:
-                metadata['destinations'].add(destination.strip())
-
-    # Convert sets to sorted lists for JSON serialization
     return {
-        'tags': sorted(list(metadata['tags'])),
-        'creators': sorted(list(metadata['creators'])),
-        'years': sorted(list(metadata['years'])),
-        'locations': sorted(list(metadata['locations'])),
-        'destinations': sorted(list(metadata['destinations']))
+        'version': 1,
+        'max_span_days': max(((r.end - r.start).days for _, _, r in dated), default=0),
+        'letters': [[r.start.isoformat(), r.end.isoformat(), r.precision, letter_id]
+                    for _, letter_id, r in dated],
+        'undated': sorted(letter_id for letter_id, r in ranges.items() if not r),
+        'years': dict(sorted(years.items())),
+        'months': dict(sorted(months.items())),
     }
 
+def save_date_index(index, filepath):
+    atomic_write(filepath, json.dumps(index, ensure_ascii=False, separators=(',', ':')))
+
 def save_json(data, filepath):
     """Save data as JSON file."""
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    atomic_write(filepath, json.dumps(data, ensure_ascii=False, indent=2))
     print(f"Saved {filepath} ({os.path.getsize(filepath):,} bytes)")
 
-def save_gzipped_json(data, filepath):
-    """Save data as gzipped JSON file."""
-    json_bytes = json.dumps(data, ensure_ascii=False).encode('utf-8')
-
-    with gzip.open(filepath, 'wb') as f:
-        f.write(json_bytes)
+def extract_metadata(letters):
+    """Extract unique metadata for filters."""
+    metadata = new_metadata()
+    for letter in letters:
+        add_letter_metadata(metadata, letter)
+    return finalize_metadata(metadata)
 
-    original_size = len(json_bytes)
+def report_gzip(filepath, original_size):
+    """Print size stats for a gzipped file."""
     compressed_size = os.path.getsize(filepath)
     ratio = (1 - compressed_size / original_size) * 100
 
@@ -110,36 +165,209 @@ def save_gzipped_json(data, filepath):
     print(f"  Compressed: {compressed_size:,} bytes")
     print(f"  Compression: {ratio:.1f}%")
 
+class LiveCorpus:
+    """In-memory corpus for --watch: serialized letters and facet value counts."""
+
+    def __init__(self):
+        self.entries = {}  # id -> (sort key, compact JSON, pretty JSON, facets, date range)
+        self.facet_counts = {facet: Counter() for facet in FACETS}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def put(self, letter):
+        letter_id = int(letter['id'])
+        self.remove(letter_id)
+        facets = letter_facets(letter)
+        for facet, values in facets.items():
+            self.facet_counts[facet].update(values)
+        self.entries[letter_id] = (sort_key(letter), *serialize(letter), facets, letter_range(letter))
+
+    def remove(self, letter_id):
+        entry = self.entries.pop(letter_id, None)
+        if entry is None:
+            return
+        for facet, values in entry[3].items():
+            counts = self.facet_counts[facet]
+            for value in values:
+                counts[value] -= 1
+                if counts[value] <= 0:
+                    del counts[value]
+
+    def metadata(self):
+        return finalize_metadata(self.facet_counts)
+
+    def date_index(self):
+        return date_index({letter_id: entry[4] for letter_id, entry in self.entries.items()})
+
+    def write(self, output_dir):
+        """Re-emit the letter files from the cached serializations."""
+        with CorpusWriter(output_dir) as writer:
+            for _, compact, pretty, _, _ in sorted(self.entries.values(), key=lambda e: e[0]):
+                writer.write_serialized(compact, pretty)
+        return writer
+
+class PollingWatcher:
+    """Finds changed letters by comparing the store's stamps."""
+
+    def __init__(self, store, interval):
+        self.store = store
+        self.interval = interval
+        self.stamps = store.stamps()
+
+    def __str__(self):
+        return f"polling every {self.interval}s"
+
+    def changes(self, timeout):
+        time.sleep(timeout)
+        stamps = self.store.stamps()
+        changed = {letter_id for letter_id in stamps.keys() | self.stamps.keys()
+                   if stamps.get(letter_id) != self.stamps.get(letter_id)}
+        self.stamps = stamps
+        return changed
+
+class InotifyWatcher:
+    """Finds changed letters from inotify events on a letter directory."""
+
+    def __init__(self, store):
+        self.inotify = INotify()
+        self.inotify.add_watch(str(store.path), flags.CLOSE_WRITE | flags.MOVED_TO |
+                               flags.DELETE | flags.MOVED_FROM)
+
+    def __str__(self):
+        return "inotify"
+
+    def changes(self, timeout):
+        changed = set()
+        for event in self.inotify.read(timeout=int(timeout * 1000)):
+            letter_id = letter_id_from_filename(event.name)
+            if letter_id is not None:
+                changed.add(letter_id)
+        return changed
+
+def make_watcher(store, interval):
+    if INotify is not None and isinstance(store, DirectoryStore):
+        return InotifyWatcher(store)
+    return PollingWatcher(store, interval)
+
+def watch(store, interval, debounce):
+    """Build once, then patch the outputs whenever letters change."""
+    # Start watching before the initial load so no change is missed
+    watcher = make_watcher(store, interval)
+
+    corpus = LiveCorpus()
+    for letter_id, raw in store.iter_raw():
+        try:
+            corpus.put(json.loads(raw))
+        except Exception as e:
+            print(f"Error loading letter {letter_id}: {e}")
+
+    corpus.write(OUTPUT_DIR)
+    metadata = corpus.metadata()
+    save_json(metadata, OUTPUT_DIR / "metadata-index.json")
+    dates = corpus.date_index()
+    save_date_index(dates, OUTPUT_DIR / "date-index.json")
+    print(f"\nBuilt {len(corpus)} letters; watching {store} ({watcher})")
+    print("Press Ctrl+C to stop\n")
+
+    while True:
+        changed = watcher.changes(interval)
+        if not changed:
+            continue
+
+        # Collect the rest of a burst of saves (e.g. a batch edit)
+        while True:
+            more = watcher.changes(debounce)
+            if not more:
+                break
+            changed |= more
+
+        started = time.monotonic()
+        for letter_id in sorted(changed):
+            try:
+                corpus.put(store.get(letter_id))
+            except KeyError:
+                corpus.remove(letter_id)
+            except json.JSONDecodeError as e:
+                print(f"Error loading letter {letter_id}: {e} (keeping previous version)")
+
+        corpus.write(OUTPUT_DIR)
+        outputs = ["letters.json", "letters.json.gz", "letters.ndjson"]
+
+        new_metadata = corpus.metadata()
+        if new_metadata != metadata:
+            metadata = new_metadata
+            atomic_write(OUTPUT_DIR / "metadata-index.json",
+                         json.dumps(metadata, ensure_ascii=False, indent=2))
+            outputs.append("metadata-index.json")
+
+        new_dates = corpus.date_index()
+        if new_dates != dates:
+            dates = new_dates
+            save_date_index(dates, OUTPUT_DIR / "date-index.json")
+            outputs.append("date-index.json")
+
+        print(f"[{time.strftime('%H:%M:%S')}] {len(changed)} changed "
+              f"({', '.join(map(str, sorted(changed)))}); "
+              f"wrote {', '.join(outputs)} in {time.monotonic() - started:.2f}s")
+
 def main():
     """Main build process."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--store', default=LETTERS_RAW_DIR,
+                        help='letter directory or packed store (default: letters-raw/)')
+    parser.add_argument('--watch', action='store_true',
+                        help='keep running and update the outputs when letters change')
+    parser.add_argument('--interval', type=float, default=0.5,
+                        help='seconds between checks for changes in --watch mode')
+    parser.add_argument('--debounce', type=float, default=0.3,
+                        help='quiet period that ends a burst of changes in --watch mode')
+    args = parser.parse_args()
+
     print("=" * 60)
     print("Norwegian Letters Browser - Build Script")
     print("=" * 60)
 
-    # Load all letters
-    letters = load_all_letters()
-
-    if not letters:
-        print("ERROR: No letters found!")
+    if args.watch:
+        with open_store(args.store) as store:
+            try:
+                watch(store, args.interval, args.debounce)
+            except KeyboardInterrupt:
+                print("\n✓ Stopped watching")
         return
 
-    # Sort letters by date for consistent ordering
-    letters_sorted = sorted(letters, key=lambda x: x.get('metadata', {}).get('LetterDate', [''])[0] or '')
+    with open_store(args.store) as store:
+        # Sort letters by date for consistent ordering
+        keys = collect_sort_keys(store)
 
-    print(f"\nDate range: {letters_sorted[0].get('metadata', {}).get('LetterDate', ['Unknown'])[0]} to "
-          f"{letters_sorted[-1].get('metadata', {}).get('LetterDate', ['Unknown'])[0]}")
+        if not keys:
+            print("ERROR: No letters found!")
+            return
 
-    # Save uncompressed JSON (temporary, for debugging)
-    letters_json = OUTPUT_DIR / "letters.json"
-    save_json(letters_sorted, letters_json)
+        print(f"\nDate range: {keys[0][0] or 'Unknown'} to {keys[-1][0] or 'Unknown'}")
 
-    # Save compressed JSON (this is what the browser will load)
-    letters_gz = OUTPUT_DIR / "letters.json.gz"
-    save_gzipped_json(letters_sorted, letters_gz)
+        # Stream letters in date order into every output, collecting
+        # metadata on the way
+        metadata = new_metadata()
+        ranges = {}
+        with CorpusWriter(OUTPUT_DIR) as writer:
+            for _, letter_id in keys:
+                letter = store.get(letter_id)
+                writer.write(letter)
+                add_letter_metadata(metadata, letter)
+                ranges[letter_id] = letter_range(letter)
 
-    # Extract and save metadata
+    # Uncompressed JSON (temporary, for debugging) and NDJSON (for analysis scripts)
+    print(f"Saved {writer.json_path} ({os.path.getsize(writer.json_path):,} bytes)")
+    print(f"Saved {writer.ndjson_path} ({os.path.getsize(writer.ndjson_path):,} bytes)")
+
+    # Compressed JSON (this is what the browser will load)
+    report_gzip(writer.gz_path, writer.gz_uncompressed_size)
+
+    # Save metadata
     print("\nExtracting metadata...")
-    metadata = extract_metadata(letters_sorted)
+    metadata = finalize_metadata(metadata)
     print(f"  Tags: {len(metadata['tags'])}")
     print(f"  Creators: {len(metadata['creators'])}")
     print(f"  Years: {len(metadata['years'])}")
@@ -149,13 +377,25 @@ def main():
     metadata_json = OUTPUT_DIR / "metadata-index.json"
     save_json(metadata, metadata_json)
 
+    # Save date index
+    dates = date_index(ranges)
+    precisions = Counter(precision for _, _, precision, _ in dates['letters'])
+    print(f"\nDates: {len(dates['letters'])} letters "
+          f"({', '.join(f'{count} to the {p}' for p, count in precisions.most_common())}), "
+          f"{len(dates['undated'])} undated")
+    date_json = OUTPUT_DIR / "date-index.json"
+    save_date_index(dates, date_json)
+    print(f"Saved {date_json} ({os.path.getsize(date_json):,} bytes)")
+
     print("\n" + "=" * 60)
     print("Build complete!")
     print("=" * 60)
     print("\nGenerated files:")
     print(f"  - letters.json (uncompressed, for reference)")
     print(f"  - letters.json.gz (compressed, loaded by browser)")
+    print(f"  - letters.ndjson (one letter per line, for analysis scripts)")
     print(f"  - metadata-index.json (filter options)")
+    print(f"  - date-index.json (parsed letter dates and year/month counts)")
     print("\nNext step: Open index.html in a web browser")
 
 if __name__ == "__main__":
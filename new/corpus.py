@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Streaming access to the built letters corpus
+
+build-data.py writes letters.ndjson (one letter per line, in the same
+LetterDate order as letters.json) next to letters.json and letters.json.gz.
+Analysis scripts iterate it with iter_letters() in constant memory instead
+of json.load()-ing the whole letters.json array.
+"""
+
+import gzip
+import io
+import json
+import os
+import re
+import textwrap
+from pathlib import Path
+
+NEW_DIR = Path(__file__).parent
+NDJSON_FILE = NEW_DIR / "letters.ndjson"
+SPLIT_MARKER = '<-SPLITTLETTER->'
+
+# Creator entries for the translation ("Siri Lawson, trans." and variants)
+TRANSLATOR_RE = re.compile(r'Siri Lawson.*trans', re.IGNORECASE)
+
+def _open_text(path, mode='r'):
+    path = Path(path)
+    if path.suffix == '.gz':
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+def iter_letters(path=NDJSON_FILE):
+    """
+    Yield letters one at a time from a corpus file
+    Accepts letters.ndjson (optionally .gz). A plain letters.json array is
+    still accepted for older builds, but has to be loaded whole.
+    """
+    path = Path(path)
+    name = path.name[:-3] if path.suffix == '.gz' else path.name
+
+    with _open_text(path) as f:
+        if name.endswith('.ndjson'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from json.load(f)
+
+def is_translator(creator):
+    return bool(TRANSLATOR_RE.search(creator))
+
+def first_value(letter, field):
+    """First value of a metadata field, stripped; '' if there is none"""
+    values = letter.get('metadata', {}).get(field) or ['']
+    return (values[0] or '').strip()
+
+def letter_creators(letter):
+    """Creators of a letter, stripped, without the translator entry"""
+    return [c.strip() for c in letter.get('metadata', {}).get('Creator') or []
+            if c and c.strip() and not is_translator(c.strip())]
+
+def text_halves(letter):
+    """
+    [(lang, text), ...]: the Norwegian ('no') and English ('en') halves of a
+    letter's Text as the viewer shows them (split on <-SPLITTLETTER-> and
+    trimmed); empty halves are left out
+    """
+    text = (letter.get('metadata', {}).get('Text') or [''])[0] or ''
+    parts = text.split(SPLIT_MARKER)
+    halves = [('no', parts[0].strip())]
+    if len(parts) > 1:
+        halves.append(('en', parts[1].strip()))
+    return [(lang, half) for lang, half in halves if half]
+
+def utf16_offsets(text):
+    """
+    Map code point offsets to UTF-16 offsets, for spans the browser slices
+    with String.prototype.slice(); None if text is BMP-only (no change)
+    """
+    if all(ord(c) < 0x10000 for c in text):
+        return None
+    offsets = [0]
+    for c in text:
+        offsets.append(offsets[-1] + (2 if ord(c) >= 0x10000 else 1))
+    return offsets
+
+def serialize(letter):
+    """
+    (compact, pretty) forms of a letter as they appear in the corpus files
+    Callers that rewrite the corpus often can keep these and pass them to
+    CorpusWriter.write_serialized() instead of re-encoding every letter.
+    """
+    compact = json.dumps(letter, ensure_ascii=False)
+    pretty = textwrap.indent(json.dumps(letter, ensure_ascii=False, indent=2), '  ')
+    return compact, pretty
+
+def _temp_path(path):
+    return path.with_name(f".{path.name}.tmp")
+
+class CorpusWriter:
+    """
+    Writes letters.json, letters.json.gz and letters.ndjson in a single pass
+    Letters are serialized one at a time, so the full corpus is never held
+    in memory as one serialized string.
+
+    Each file is written under a temporary name and renamed into place on
+    close, so the browser never loads a half-written corpus.
+    """
+
+    def __init__(self, output_dir=NEW_DIR):
+        output_dir = Path(output_dir)
+        self.json_path = output_dir / "letters.json"
+        self.gz_path = output_dir / "letters.json.gz"
+        self.ndjson_path = output_dir / "letters.ndjson"
+        self._paths = (self.json_path, self.gz_path, self.ndjson_path)
+
+        self._json = open(_temp_path(self.json_path), 'w', encoding='utf-8')
+        # The gzip header records the final name, not the temporary one
+        self._gz_raw = open(_temp_path(self.gz_path), 'wb')
+        self._gz = io.TextIOWrapper(
+            gzip.GzipFile(filename=self.gz_path.name, mode='wb', fileobj=self._gz_raw),
+            encoding='utf-8')
+        self._ndjson = open(_temp_path(self.ndjson_path), 'w', encoding='utf-8')
+        self.count = 0
+        self.gz_uncompressed_size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, letter):
+        self.write_serialized(*serialize(letter))
+
+    def write_serialized(self, compact, pretty):
+        # Same layout json.dump(letters, indent=2) / json.dumps(letters) produce
+        json_sep, gz_sep = ('[\n', '[') if self.count == 0 else (',\n', ', ')
+        self._json.write(json_sep + pretty)
+        self._gz.write(gz_sep + compact)
+        self._ndjson.write(compact + '\n')
+
+        self.gz_uncompressed_size += len((gz_sep + compact).encode('utf-8'))
+        self.count += 1
+
+    def close(self):
+        if self._json.closed:
+            return
+        self._json.write('\n]' if self.count else '[]')
+        self._gz.write(']' if self.count else '[]')
+        self.gz_uncompressed_size += len(']' if self.count else '[]')
+        for f in (self._json, self._gz, self._gz_raw, self._ndjson):
+            f.close()
+        for path in self._paths:
+            os.replace(_temp_path(path), path)
+
+    def abort(self):
+        """Close and discard the partly written files, leaving the old corpus"""
+        for f in (self._json, self._gz, self._gz_raw, self._ndjson):
+            f.close()
+        for path in self._paths:
+            try:
+                os.unlink(_temp_path(path))
+            except FileNotFoundError:
+                pass
+
+class JsonObjectWriter:
+    """Streams a JSON object to disk one key at a time (indent=2 layout)"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._f = _open_text(self.path, 'w')
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, key, value):
+        entry = json.dumps({str(key): value}, ensure_ascii=False, indent=2)[2:-2]
+        self._f.write(('{\n' if self.count == 0 else ',\n') + entry)
+        self.count += 1
+
+    def close(self):
+        if self._f.closed:
+            return
+        self._f.write('\n}' if self.count else '{}')
+        self._f.close()
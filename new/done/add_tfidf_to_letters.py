@@ -2,10 +2,12 @@
 """
 Add TF-IDF data to individual letter JSON files.
 Reads tfidf_norwegian.json and tfidf_english.json and adds the data
-to each letter's JSON file in letters-raw/.
+to each letter's JSON file in letters-raw/ (or a packed store via --store).
 """
 
+import argparse
 import json
+import sys
 from pathlib import Path
 
 # Paths
@@ -14,6 +16,12 @@ LETTERS_RAW_DIR = TOOLS_DIR.parent / "letters-raw"
 NORWEGIAN_TFIDF = TOOLS_DIR / "tfidf_norwegian.json"
 ENGLISH_TFIDF = TOOLS_DIR / "tfidf_english.json"
 
+sys.path.insert(0, str(TOOLS_DIR.parent))
+from letter_store import open_store
+
+# Letters are written back in batches (one transaction each for packed stores)
+BATCH_SIZE = 200
+
 def load_tfidf_data():
     """Load TF-IDF data from JSON files."""
     print("Loading TF-IDF data...")
@@ -28,46 +36,62 @@ def load_tfidf_data():
 
     return norwegian_data, english_data
 
-def update_letter_files(norwegian_data, english_data):
-    """Update each letter JSON file with TF-IDF data."""
-    json_files = sorted(LETTERS_RAW_DIR.glob("*.json"))
-
-    print(f"\nUpdating {len(json_files)} letter files...")
+def update_letter_files(store, norwegian_data, english_data):
+    """Update each letter in the store with TF-IDF data."""
+    print(f"\nUpdating letters in {store}...")
 
     updated_count = 0
+    unchanged_count = 0
+    batch = []
 
-    for json_file in json_files:
+    def flush():
+        nonlocal updated_count
         try:
-            # Load the letter
-            with open(json_file, 'r', encoding='utf-8') as f:
-                letter = json.load(f)
+            store.put_many(batch)
+            updated_count += len(batch)
+        except Exception as e:
+            print(f"  Error saving {len(batch)} letters: {e}")
+        batch.clear()
 
-            letter_id = str(letter.get('id', ''))
+    for letter_id, raw in store.iter_raw():
+        try:
+            letter = json.loads(raw)
+        except Exception as e:
+            print(f"  Error reading letter {letter_id}: {e}")
+            continue
 
-            # Add Norwegian TF-IDF if available
-            if letter_id in norwegian_data:
-                letter['norwegian-tfidf'] = norwegian_data[letter_id]['top_tfidf_terms']
+        key = str(letter.get('id', ''))
+        before = (letter.get('norwegian-tfidf'), letter.get('english-tfidf'))
 
-            # Add English TF-IDF if available
-            if letter_id in english_data:
-                letter['english-tfidf'] = english_data[letter_id]['top_tfidf_terms']
+        # Add Norwegian TF-IDF if available
+        if key in norwegian_data:
+            letter['norwegian-tfidf'] = norwegian_data[key]['top_tfidf_terms']
 
-            # Save the updated letter
-            with open(json_file, 'w', encoding='utf-8') as f:
-                json.dump(letter, f, ensure_ascii=False, indent=2)
+        # Add English TF-IDF if available
+        if key in english_data:
+            letter['english-tfidf'] = english_data[key]['top_tfidf_terms']
 
-            updated_count += 1
+        # Only rewrite letters whose TF-IDF data actually changed
+        if (letter.get('norwegian-tfidf'), letter.get('english-tfidf')) == before:
+            unchanged_count += 1
+            continue
 
-            # Print progress every 50 files
-            if updated_count % 50 == 0:
-                print(f"  Updated {updated_count} files...")
+        batch.append(letter)
+        if len(batch) >= BATCH_SIZE:
+            flush()
+            print(f"  Updated {updated_count} letters...")
 
-        except Exception as e:
-            print(f"  Error updating {json_file}: {e}")
+    if batch:
+        flush()
 
-    print(f"\n✓ Successfully updated {updated_count} letter files")
+    print(f"\n✓ Successfully updated {updated_count} letters ({unchanged_count} unchanged)")
 
 def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--store', default=LETTERS_RAW_DIR,
+                        help='letter directory or packed store (default: ../letters-raw/)')
+    args = parser.parse_args()
+
     print("=" * 60)
     print("Add TF-IDF Data to Letter Files")
     print("=" * 60)
@@ -76,7 +100,8 @@ def main():
     norwegian_data, english_data = load_tfidf_data()
 
     # Update letter files
-    update_letter_files(norwegian_data, english_data)
+    with open_store(args.store) as store:
+        update_letter_files(store, norwegian_data, english_data)
 
     print("\n" + "=" * 60)
     print("Done! Now run build-data.py to rebuild letters.json")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Aho–Corasick multi-pattern matcher
+Compiles a list of phrases into one automaton so a text is scanned once,
+whatever the number of phrases: matching costs O(len(text) + matches)
+instead of O(len(text) * phrases) for one regex per phrase.
+
+Matches are whole words only (the characters on either side of a match must
+not be letters or digits) and case-sensitive, which suits proper names.
+find() returns every match; find_longest() keeps the leftmost-longest
+non-overlapping ones, so "Oslo Lufthavn" is not also counted as "Oslo".
+
+Usage:
+  python3 aho_corasick.py "Oslo" "Oslo Lufthavn" -- "Fra Oslo Lufthavn til Oslo."
+"""
+
+import sys
+from collections import deque
+
+def is_word_char(c):
+    return c.isalnum()
+
+class AhoCorasick:
+    """Automaton over a fixed list of patterns"""
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self.goto = [{}]     # state -> {char: state}
+        self.fail = [0]      # state -> longest proper suffix state
+        self.output = [()]   # state -> ids of patterns ending here
+
+        for pattern_id, pattern in enumerate(self.patterns):
+            if not pattern:
+                raise ValueError("patterns must not be empty")
+            state = 0
+            for c in pattern:
+                next_state = self.goto[state].get(c)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][c] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                state = next_state
+            self.output[state] += (pattern_id,)
+
+        # Breadth-first, so a state's failure target is finished before it
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for c, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and c not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(c, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.output[next_state] += self.output[self.fail[next_state]]
+
+    def __len__(self):
+        return len(self.goto)
+
+    def find(self, text):
+        """Yield (start, end, pattern id) for every whole-word match"""
+        goto, fail, output, patterns = self.goto, self.fail, self.output, self.patterns
+        length = len(text)
+        state = 0
+        for i, c in enumerate(text):
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            if not output[state]:
+                continue
+            end = i + 1
+            if end < length and is_word_char(text[end]):
+                continue
+            for pattern_id in output[state]:
+                start = end - len(patterns[pattern_id])
+                if start == 0 or not is_word_char(text[start - 1]):
+                    yield start, end, pattern_id
+
+    def find_longest(self, text):
+        """Leftmost-longest non-overlapping matches, in text order"""
+        matches = sorted(self.find(text), key=lambda m: (m[0], -m[1]))
+        result = []
+        covered = 0
+        for start, end, pattern_id in matches:
+            if start >= covered:
+                result.append((start, end, pattern_id))
+                covered = end
+        return result
+
+def main():
+    if '--' not in sys.argv[1:]:
+        print(__doc__.strip().splitlines()[-1].strip())
+        return
+    split = sys.argv.index('--')
+    automaton = AhoCorasick(sys.argv[1:split])
+    for text in sys.argv[split + 1:]:
+        for start, end, pattern_id in automaton.find_longest(text):
+            print(f"{start:6d} {end:6d}  {automaton.patterns[pattern_id]}")
+
+if __name__ == '__main__':
+    main()
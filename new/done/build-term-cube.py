@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Build term-cube.json: term counts summed over groups of letters
+A word cloud for a filtered set of letters ("letters from Stjørdal in the
+1940s") otherwise needs the text of every matching letter. The cube stores
+the summed term counts of every year, decade, creator, location and tag, and
+of the pairs below, so such a cloud is one lookup or the sum of a few cells.
+
+Cuboids
+-------
+The finest cuboids, (year, creator), (year, location) and (year, tag), are
+counted from the letters (term_counts.py). All others are roll-ups of
+these, summing full counts before any pruning:
+
+  (decade, X)  <- (year, X)        for X in creator, location, tag
+  (X)          <- (decade, X)
+  (year)       <- (year, location)
+  (decade)     <- (year)
+  all          <- (decade)
+
+Year and location have one value per letter, so these sums count every
+letter once. A letter has any number of creators and tags, though, so
+summing cells across creators or tags counts a letter once for each.
+Letters without a year or location only reach the roll-ups that leave out
+that dimension.
+
+Output (term-cube.json)
+-----------------------
+  {
+    "top_k": 50,
+    "terms": [term, ...],             by corpus frequency
+    "all": cell,
+    "cuboids": {
+      "decade": {"1940": cell, ...},
+      "decade,location": {"1940": {"Stjørdal": cell, ...}, ...},
+      ...
+    }
+  }
+
+where a cell is {"letters": n, "tokens": {"no": n, "en": n},
+"no": [[term, count], ...], "en": [...]}: the top_k terms of each language,
+by index into "terms". "tokens" counts every term, including those pruned.
+
+Usage:
+  python3 build-term-cube.py
+  python3 build-term-cube.py --top-k 50
+"""
+
+import argparse
+import heapq
+import json
+import os
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+NEW_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(NEW_DIR))
+from corpus import NDJSON_FILE, iter_letters, letter_creators
+from letter_dates import letter_range
+from term_counts import LANGUAGES, TermCounts
+
+TERM_CUBE_JSON = NEW_DIR / 'term-cube.json'
+
+TOP_K = 50
+MISSING = ''  # value of a dimension a letter has none of; counted, never written
+
+BASE_CUBOIDS = [('year', 'creator'), ('year', 'location'), ('year', 'tag')]
+
+def decade(year):
+    return year if year == MISSING else str(int(year) - int(year) % 10)
+
+# (cuboid, from cuboid, dimension, new value or None to drop the dimension)
+ROLL_UPS = [
+    (('decade', 'creator'), ('year', 'creator'), 'year', decade),
+    (('decade', 'location'), ('year', 'location'), 'year', decade),
+    (('decade', 'tag'), ('year', 'tag'), 'year', decade),
+    (('creator',), ('decade', 'creator'), 'decade', None),
+    (('location',), ('decade', 'location'), 'decade', None),
+    (('tag',), ('decade', 'tag'), 'decade', None),
+    (('year',), ('year', 'location'), 'location', None),
+    (('decade',), ('year',), 'year', decade),
+    ((), ('decade',), 'decade', None),
+]
+
+class Cell:
+    """Letter count and summed term counts of a group of letters"""
+
+    def __init__(self):
+        self.letters = 0
+        self.counts = {lang: Counter() for lang in LANGUAGES}
+
+    def add_letter(self, counts):
+        self.letters += 1
+        for lang, terms in counts.items():
+            self.counts[lang].update(terms)
+
+    def add(self, other):
+        self.letters += other.letters
+        for lang, terms in other.counts.items():
+            self.counts[lang].update(terms)
+
+    def pruned(self, term_ids, top_k):
+        """JSON form, keeping the top_k terms of each language"""
+        cell = {'letters': self.letters,
+                'tokens': {lang: sum(terms.values()) for lang, terms in self.counts.items()}}
+        for lang, terms in self.counts.items():
+            top = heapq.nsmallest(top_k, terms.items(),
+                                  key=lambda item: (-item[1], term_ids[item[0]]))
+            cell[lang] = [[term_ids[term], count] for term, count in top]
+        return cell
+
+def letter_dimensions(letter):
+    """{dimension: values} of one letter; MISSING where it has none"""
+    metadata = letter.get('metadata', {})
+    date_range = letter_range(letter)
+    location = ((metadata.get('Location') or [''])[0] or '').strip()
+    tags = {tag.strip() for tag in letter.get('tags') or [] if tag and tag.strip()}
+    return {
+        'year': [str(date_range.start.year) if date_range else MISSING],
+        'creator': sorted(set(letter_creators(letter))) or [MISSING],
+        'location': [location or MISSING],
+        'tag': sorted(tags) or [MISSING],
+    }
+
+def base_cuboids(letters, term_counts):
+    """{cuboid: {key tuple: Cell}} for BASE_CUBOIDS, counted from the letters"""
+    cuboids = {dims: {} for dims in BASE_CUBOIDS}
+    for letter in letters:
+        counts = term_counts.counts(letter)
+        values = letter_dimensions(letter)
+        for (first, second), cells in cuboids.items():
+            for a in values[first]:
+                for b in values[second]:
+                    cells.setdefault((a, b), Cell()).add_letter(counts)
+    return cuboids
+
+def roll_up(cells, position, parent):
+    """Sum cells along one dimension: map its values with parent, or drop it"""
+    rolled = {}
+    for key, cell in cells.items():
+        if parent is None:
+            new_key = key[:position] + key[position + 1:]
+        else:
+            new_key = key[:position] + (parent(key[position]),) + key[position + 1:]
+        rolled.setdefault(new_key, Cell()).add(cell)
+    return rolled
+
+def build_cube(letters, term_counts):
+    cuboids = base_cuboids(letters, term_counts)
+    for dims, source, dim, parent in ROLL_UPS:
+        cuboids[dims] = roll_up(cuboids[source], source.index(dim), parent)
+    return cuboids
+
+def cube_json(cuboids, top_k):
+    apex = cuboids[()][()]
+    term_totals = Counter()
+    for terms in apex.counts.values():
+        term_totals.update(terms)
+    terms = [term for term, _ in sorted(term_totals.items(), key=lambda item: (-item[1], item[0]))]
+    term_ids = {term: i for i, term in enumerate(terms)}
+
+    written = {}
+    for dims, cells in cuboids.items():
+        if not dims:
+            continue
+        nested = {}
+        for key in sorted(cells):
+            if MISSING in key:
+                continue
+            level = nested
+            for value in key[:-1]:
+                level = level.setdefault(value, {})
+            level[key[-1]] = cells[key].pruned(term_ids, top_k)
+        written[','.join(dims)] = nested
+
+    return {'top_k': top_k, 'terms': terms,
+            'all': apex.pruned(term_ids, top_k), 'cuboids': written}
+
+def count_cells(level):
+    if 'letters' in level:
+        return 1
+    return sum(count_cells(value) for value in level.values())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--top-k', type=int, default=TOP_K,
+                        help=f'terms kept per cell and language (default: {TOP_K})')
+    parser.add_argument('--corpus', default=NDJSON_FILE,
+                        help='letters.ndjson built by build-data.py')
+    parser.add_argument('--output', default=TERM_CUBE_JSON,
+                        help='where to write the cube (default: term-cube.json)')
+    args = parser.parse_args()
+    if args.top_k < 1:
+        parser.error('--top-k must be at least 1')
+
+    print("=" * 60)
+    print("Term Cube")
+    print("=" * 60)
+
+    started = time.monotonic()
+    term_counts = TermCounts()
+    cuboids = build_cube(iter_letters(args.corpus), term_counts)
+    term_counts.save_cache()
+    print(f"Term counts: {term_counts.counted} letters counted, "
+          f"{term_counts.reused} from cache")
+
+    data = cube_json(cuboids, args.top_k)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+    print(f"Built in {time.monotonic() - started:.2f}s")
+    print(f"Saved {args.output} ({os.path.getsize(args.output):,} bytes)")
+
+    apex = data['all']
+    print(f"\n{apex['letters']} letters, {len(data['terms']):,} terms "
+          f"({apex['tokens']['no']:,} Norwegian, {apex['tokens']['en']:,} English tokens)")
+    for name, cells in data['cuboids'].items():
+        print(f"  {name:16s} {count_cells(cells):5d} cells")
+
+if __name__ == '__main__':
+    main()
@@ -9,12 +9,54 @@ TF-IDF Formula:
   Where:
   - TF = (count of term in document) / (total terms in document)
   - IDF = log(total documents / documents containing term)
+
+Letters are streamed from letters.ndjson (built by build-data.py) in two
+passes, one for document frequencies and one for the scores, so memory use
+does not grow with the size of the corpus.
 """
 
-import json
 import re
 import math
+import sys
 from collections import defaultdict, Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from corpus import NDJSON_FILE, JsonObjectWriter, iter_letters
+
+TOP_TERMS = 15
+
+# Stopword files, read from the working directory
+STOPWORD_FILES = {'norwegian': 'stop.txt', 'english': 'stop_en.txt'}
+
+# Stopwords always left out, in addition to the stopword files
+BASE_STOPWORDS = {
+    'norwegian': {
+        'og', 'i', 'jeg', 'det', 'at', 'en', 'et', 'den', 'til', 'er', 'som', 'på',
+        'de', 'med', 'han', 'av', 'ikke', 'der', 'så', 'var', 'meg', 'seg', 'men',
+        'ett', 'har', 'om', 'vi', 'min', 'mitt', 'ha', 'hadde', 'hun', 'nå', 'over',
+        'da', 'ved', 'fra', 'du', 'ut', 'sin', 'dem', 'oss', 'opp', 'man', 'kan',
+        'hans', 'hvor', 'eller', 'hva', 'skal', 'selv', 'sjøl', 'her', 'alle', 'vil',
+        'bli', 'ble', 'blitt', 'kunne', 'inn', 'når', 'være', 'kom', 'noen', 'noe',
+        'ville', 'dere', 'deres', 'kun', 'ja', 'etter', 'ned', 'skulle',
+        'denne', 'for', 'deg', 'si', 'sine', 'sitt', 'mot', 'å', 'meget', 'hvordan',
+        'hennes', 'dette', 'bare', 'også', 'mer', 'enn', 'før', 'mellom', 'under',
+        'både', 'samme', 'siden'
+    },
+    'english': {
+        'the', 'be', 'to', 'of', 'and', 'a', 'in', 'that', 'have', 'i', 'it', 'for',
+        'not', 'on', 'with', 'he', 'as', 'you', 'do', 'at', 'this', 'but', 'his',
+        'by', 'from', 'they', 'we', 'say', 'her', 'she', 'or', 'an', 'will', 'my',
+        'one', 'all', 'would', 'there', 'their', 'what', 'so', 'up', 'out', 'if',
+        'about', 'who', 'get', 'which', 'go', 'me', 'when', 'make', 'can', 'like',
+        'time', 'no', 'just', 'him', 'know', 'take', 'people', 'into', 'year', 'your',
+        'good', 'some', 'could', 'them', 'see', 'other', 'than', 'then', 'now', 'look',
+        'only', 'come', 'its', 'over', 'think', 'also', 'back', 'after', 'use', 'two',
+        'how', 'our', 'work', 'first', 'well', 'way', 'even', 'new', 'want', 'because',
+        'any', 'these', 'give', 'day', 'most', 'us', 'is', 'was', 'are', 'been', 'has',
+        'had', 'were', 'said', 'did', 'having', 'may', 'should', 'am', 'being'
+    },
+}
 
 def load_stopwords(filepath):
     """Load stopwords from a text file."""
@@ -61,53 +103,55 @@ def calculate_idf(term, doc_count, total_docs):
         return 0
     return math.log(total_docs / doc_count)
 
-def calculate_tfidf_scores(letters_data, language='norwegian', stopwords=None):
+def document_terms(letter, language, stopwords):
+    """Tokenized, stopword-filtered terms of one letter in one language."""
+    text = extract_text(letter, language)
+    if not text:
+        return []
+    return [term for term in tokenize(text) if term not in stopwords]
+
+def calculate_tfidf_scores(corpus_path=NDJSON_FILE, language='norwegian', stopwords=None,
+                           top_n=None):
     """
-    Calculate TF-IDF scores for all letters.
+    Calculate TF-IDF scores for all letters, streaming the corpus twice.
 
     Args:
-        letters_data: Dictionary of letter data
+        corpus_path: letters.ndjson file to read
         language: 'norwegian' or 'english'
         stopwords: Set of stopwords to exclude
+        top_n: Keep only this many top terms per letter (all if None)
 
-    Returns:
-        Dictionary mapping letter IDs to list of (term, tfidf_score) tuples
+    Yields:
+        (letter, list of (term, tfidf_score) tuples) for each letter with text
     """
     if stopwords is None:
         stopwords = set()
 
-    # Step 1: Process all documents and build document frequency counts
-    documents = {}  # letter_id -> list of terms
+    # Step 1: Stream all documents and build document frequency counts
     document_frequency = defaultdict(int)  # term -> number of documents containing it
+    total_docs = 0
 
     print(f"  Processing documents for {language}...")
-    for letter in letters_data:
-        letter_id = str(letter.get('id', ''))
-        text = extract_text(letter, language)
-        if not text:
-            continue
-
-        # Tokenize and filter stopwords
-        terms = [term for term in tokenize(text) if term not in stopwords]
-
+    for letter in iter_letters(corpus_path):
+        terms = document_terms(letter, language, stopwords)
         if not terms:
             continue
 
-        documents[letter_id] = terms
+        total_docs += 1
 
         # Count unique terms for document frequency
-        unique_terms = set(terms)
-        for term in unique_terms:
+        for term in set(terms):
             document_frequency[term] += 1
 
-    total_docs = len(documents)
     print(f"  Found {total_docs} documents with text")
     print(f"  Unique terms: {len(document_frequency)}")
 
-    # Step 2: Calculate TF-IDF for each document
-    results = {}
+    # Step 2: Stream again and calculate TF-IDF for each document
+    for letter in iter_letters(corpus_path):
+        terms = document_terms(letter, language, stopwords)
+        if not terms:
+            continue
 
-    for letter_id, terms in documents.items():
         # Calculate term frequencies for this document
         term_counts = Counter(terms)
         total_terms = len(terms)
@@ -121,195 +165,124 @@ def calculate_tfidf_scores(letters_data, language='norwegian', stopwords=None):
 
         # Sort by TF-IDF score (descending)
         sorted_terms = sorted(tfidf_scores.items(), key=lambda x: x[1], reverse=True)
-        results[letter_id] = sorted_terms
+        yield letter, sorted_terms[:top_n]
+
+def write_tfidf_outputs(results, json_file, csv_file):
+    """
+    Stream TF-IDF results to the JSON and summary CSV files.
+
+    Returns (number of letters written, total top terms, entry for letter 1).
+    """
+    count = 0
+    total_terms = 0
+    example = None
+
+    with JsonObjectWriter(json_file) as json_out, \
+            open(csv_file, 'w', encoding='utf-8') as csv_out:
+        csv_out.write('Letter ID,Title,Date,Creator,Top Terms (comma-separated)\n')
+
+        for letter, top_terms in results:
+            letter_id = str(letter.get('id', ''))
+            # Get letter metadata
+            metadata = letter.get('metadata', {})
+            entry = {
+                'title': metadata.get('Title', ['Unknown'])[0],
+                'date': metadata.get('Date', ['Unknown'])[0],
+                'creator': metadata.get('Creator', ['Unknown'])[0],
+                'top_tfidf_terms': [
+                    {'term': term, 'score': float(score)}
+                    for term, score in top_terms
+                ]
+            }
+            json_out.write(letter_id, entry)
 
-    return results
+            top_terms_str = ', '.join([
+                f"{item['term']}({item['score']:.3f})"
+                for item in entry['top_tfidf_terms'][:10]
+            ])
+            title = entry['title'].replace('"', '""')
+            creator = entry['creator'].replace('"', '""')
+            csv_out.write(f'{letter_id},"{title}",{entry["date"]},"{creator}","{top_terms_str}"\n')
+
+            count += 1
+            total_terms += len(entry['top_tfidf_terms'])
+            if letter_id == '1':
+                example = entry
+
+    return count, total_terms, example
+
+def print_example(label, example):
+    print(f"\n=== Example: Letter 1 ({label}) ===")
+    if example:
+        print(f"Title: {example['title']}")
+        print(f"Date: {example['date']}")
+        print(f"Creator: {example['creator']}")
+        print(f"\nTop 15 TF-IDF terms:")
+        for i, item in enumerate(example['top_tfidf_terms'], 1):
+            print(f"  {i:2d}. {item['term']:20s} (score: {item['score']:.4f})")
 
 def main():
     print("=== TF-IDF Calculator for Norwegian Letters ===")
     print("Using pure Python implementation (no dependencies)\n")
 
-    # Load letters data
-    print("Loading letters.json...")
-    with open('../letters.json', 'r', encoding='utf-8') as f:
-        letters_data = json.load(f)
-
-    print(f"Loaded {len(letters_data)} letters\n")
+    corpus_path = Path(sys.argv[1]) if len(sys.argv) > 1 else NDJSON_FILE
+    print(f"Streaming letters from {corpus_path}\n")
 
     # Load stopwords
     print("Loading stopwords...")
-    norwegian_stopwords = load_stopwords('stop.txt')
+    norwegian_stopwords = load_stopwords(STOPWORD_FILES['norwegian'])
     print(f"Loaded {len(norwegian_stopwords)} Norwegian stopwords from stop.txt")
 
-    english_stopwords = load_stopwords('stop_en.txt')
+    english_stopwords = load_stopwords(STOPWORD_FILES['english'])
     print(f"Loaded {len(english_stopwords)} English stopwords from stop_en.txt")
 
-    # Additional base Norwegian stopwords
-    base_norwegian_stopwords = {
-        'og', 'i', 'jeg', 'det', 'at', 'en', 'et', 'den', 'til', 'er', 'som', 'på',
-        'de', 'med', 'han', 'av', 'ikke', 'der', 'så', 'var', 'meg', 'seg', 'men',
-        'ett', 'har', 'om', 'vi', 'min', 'mitt', 'ha', 'hadde', 'hun', 'nå', 'over',
-        'da', 'ved', 'fra', 'du', 'ut', 'sin', 'dem', 'oss', 'opp', 'man', 'kan',
-        'hans', 'hvor', 'eller', 'hva', 'skal', 'selv', 'sjøl', 'her', 'alle', 'vil',
-        'bli', 'ble', 'blitt', 'kunne', 'inn', 'når', 'være', 'kom', 'noen', 'noe',
-        'ville', 'dere', 'deres', 'kun', 'ja', 'etter', 'ned', 'skulle',
-        'denne', 'for', 'deg', 'si', 'sine', 'sitt', 'mot', 'å', 'meget', 'hvordan',
-        'hennes', 'dette', 'bare', 'også', 'mer', 'enn', 'før', 'mellom', 'under',
-        'både', 'samme', 'siden'
-    }
-
-    # Additional base English stopwords
-    base_english_stopwords = {
-        'the', 'be', 'to', 'of', 'and', 'a', 'in', 'that', 'have', 'i', 'it', 'for',
-        'not', 'on', 'with', 'he', 'as', 'you', 'do', 'at', 'this', 'but', 'his',
-        'by', 'from', 'they', 'we', 'say', 'her', 'she', 'or', 'an', 'will', 'my',
-        'one', 'all', 'would', 'there', 'their', 'what', 'so', 'up', 'out', 'if',
-        'about', 'who', 'get', 'which', 'go', 'me', 'when', 'make', 'can', 'like',
-        'time', 'no', 'just', 'him', 'know', 'take', 'people', 'into', 'year', 'your',
-        'good', 'some', 'could', 'them', 'see', 'other', 'than', 'then', 'now', 'look',
-        'only', 'come', 'its', 'over', 'think', 'also', 'back', 'after', 'use', 'two',
-        'how', 'our', 'work', 'first', 'well', 'way', 'even', 'new', 'want', 'because',
-        'any', 'these', 'give', 'day', 'most', 'us', 'is', 'was', 'are', 'been', 'has',
-        'had', 'were', 'said', 'did', 'having', 'may', 'should', 'am', 'being'
-    }
-
-    all_norwegian_stopwords = norwegian_stopwords | base_norwegian_stopwords
-    all_english_stopwords = english_stopwords | base_english_stopwords
+    all_norwegian_stopwords = norwegian_stopwords | BASE_STOPWORDS['norwegian']
+    all_english_stopwords = english_stopwords | BASE_STOPWORDS['english']
 
     print(f"Total Norwegian stopwords: {len(all_norwegian_stopwords)}")
     print(f"Total English stopwords: {len(all_english_stopwords)}\n")
 
-    # Calculate TF-IDF for Norwegian text
+    # Calculate TF-IDF for Norwegian text and stream it to disk
     print("Calculating TF-IDF for Norwegian text...")
     norwegian_results = calculate_tfidf_scores(
-        letters_data,
+        corpus_path,
         language='norwegian',
-        stopwords=all_norwegian_stopwords
+        stopwords=all_norwegian_stopwords,
+        top_n=TOP_TERMS
     )
-    print(f"Completed Norwegian analysis\n")
+    no_count, no_terms, no_example = write_tfidf_outputs(
+        norwegian_results, 'tfidf_norwegian.json', 'tfidf_norwegian.csv')
+    print(f"Completed Norwegian analysis")
+    print(f"✓ Norwegian results saved to tfidf_norwegian.json")
+    print(f"✓ Norwegian summary saved to tfidf_norwegian.csv\n")
 
-    # Calculate TF-IDF for English text
+    # Calculate TF-IDF for English text and stream it to disk
     print("Calculating TF-IDF for English text...")
     english_results = calculate_tfidf_scores(
-        letters_data,
+        corpus_path,
         language='english',
-        stopwords=all_english_stopwords
+        stopwords=all_english_stopwords,
+        top_n=TOP_TERMS
     )
-    print(f"Completed English analysis\n")
-
-    # Prepare output data for both languages
-    print("Preparing output files...")
-    norwegian_output = {}
-    english_output = {}
-
-    for letter in letters_data:
-        letter_id = str(letter.get('id', ''))
-        # Get letter metadata
-        metadata = letter.get('metadata', {})
-        title = metadata.get('Title', ['Unknown'])[0]
-        date = metadata.get('Date', ['Unknown'])[0]
-        creator = metadata.get('Creator', ['Unknown'])[0]
-
-        # Norwegian results
-        if letter_id in norwegian_results:
-            top_terms_no = norwegian_results[letter_id][:15]
-            norwegian_output[letter_id] = {
-                'title': title,
-                'date': date,
-                'creator': creator,
-                'top_tfidf_terms': [
-                    {'term': term, 'score': float(score)}
-                    for term, score in top_terms_no
-                ]
-            }
-
-        # English results
-        if letter_id in english_results:
-            top_terms_en = english_results[letter_id][:15]
-            english_output[letter_id] = {
-                'title': title,
-                'date': date,
-                'creator': creator,
-                'top_tfidf_terms': [
-                    {'term': term, 'score': float(score)}
-                    for term, score in top_terms_en
-                ]
-            }
-
-    # Save Norwegian results to JSON
-    no_output_file = 'tfidf_norwegian.json'
-    with open(no_output_file, 'w', encoding='utf-8') as f:
-        json.dump(norwegian_output, f, ensure_ascii=False, indent=2)
-    print(f"✓ Norwegian results saved to {no_output_file}")
-
-    # Save English results to JSON
-    en_output_file = 'tfidf_english.json'
-    with open(en_output_file, 'w', encoding='utf-8') as f:
-        json.dump(english_output, f, ensure_ascii=False, indent=2)
-    print(f"✓ English results saved to {en_output_file}")
-
-    # Create Norwegian summary CSV
-    no_csv_file = 'tfidf_norwegian.csv'
-    with open(no_csv_file, 'w', encoding='utf-8') as f:
-        f.write('Letter ID,Title,Date,Creator,Top Terms (comma-separated)\n')
-        for letter_id in sorted(norwegian_output.keys(), key=lambda x: int(x)):
-            data = norwegian_output[letter_id]
-            top_terms_str = ', '.join([
-                f"{item['term']}({item['score']:.3f})"
-                for item in data['top_tfidf_terms'][:10]
-            ])
-            title = data['title'].replace('"', '""')
-            creator = data['creator'].replace('"', '""')
-            f.write(f'{letter_id},"{title}",{data["date"]},"{creator}","{top_terms_str}"\n')
-    print(f"✓ Norwegian summary saved to {no_csv_file}")
-
-    # Create English summary CSV
-    en_csv_file = 'tfidf_english.csv'
-    with open(en_csv_file, 'w', encoding='utf-8') as f:
-        f.write('Letter ID,Title,Date,Creator,Top Terms (comma-separated)\n')
-        for letter_id in sorted(english_output.keys(), key=lambda x: int(x)):
-            data = english_output[letter_id]
-            top_terms_str = ', '.join([
-                f"{item['term']}({item['score']:.3f})"
-                for item in data['top_tfidf_terms'][:10]
-            ])
-            title = data['title'].replace('"', '""')
-            creator = data['creator'].replace('"', '""')
-            f.write(f'{letter_id},"{title}",{data["date"]},"{creator}","{top_terms_str}"\n')
-    print(f"✓ English summary saved to {en_csv_file}")
+    en_count, en_terms, en_example = write_tfidf_outputs(
+        english_results, 'tfidf_english.json', 'tfidf_english.csv')
+    print(f"Completed English analysis")
+    print(f"✓ English results saved to tfidf_english.json")
+    print(f"✓ English summary saved to tfidf_english.csv")
 
     # Print examples
-    print("\n=== Example: Letter 1 (Norwegian) ===")
-    if '1' in norwegian_output:
-        example = norwegian_output['1']
-        print(f"Title: {example['title']}")
-        print(f"Date: {example['date']}")
-        print(f"Creator: {example['creator']}")
-        print(f"\nTop 15 TF-IDF terms:")
-        for i, item in enumerate(example['top_tfidf_terms'], 1):
-            print(f"  {i:2d}. {item['term']:20s} (score: {item['score']:.4f})")
-
-    print("\n=== Example: Letter 1 (English) ===")
-    if '1' in english_output:
-        example = english_output['1']
-        print(f"Title: {example['title']}")
-        print(f"Date: {example['date']}")
-        print(f"Creator: {example['creator']}")
-        print(f"\nTop 15 TF-IDF terms:")
-        for i, item in enumerate(example['top_tfidf_terms'], 1):
-            print(f"  {i:2d}. {item['term']:20s} (score: {item['score']:.4f})")
+    print_example('Norwegian', no_example)
+    print_example('English', en_example)
 
     print("\n=== Statistics ===")
-    print(f"Norwegian letters analyzed: {len(norwegian_output)}")
-    print(f"English letters analyzed: {len(english_output)}")
+    print(f"Norwegian letters analyzed: {no_count}")
+    print(f"English letters analyzed: {en_count}")
 
-    if norwegian_output:
-        avg_no = sum(len(data['top_tfidf_terms']) for data in norwegian_output.values()) / len(norwegian_output)
-        print(f"Average unique terms per Norwegian letter: {avg_no:.1f}")
+    if no_count:
+        print(f"Average unique terms per Norwegian letter: {no_terms / no_count:.1f}")
 
-    if english_output:
-        avg_en = sum(len(data['top_tfidf_terms']) for data in english_output.values()) / len(english_output)
-        print(f"Average unique terms per English letter: {avg_en:.1f}")
+    if en_count:
+        print(f"Average unique terms per English letter: {en_terms / en_count:.1f}")
 
     print("\n✓ Done!")
 
@@ -4,8 +4,15 @@ Extract items 105 and 194 from SQL database
 Based on extract_simple.py but modified to extract non-letter items
 """
 
-import json
+import argparse
 import re
+import sys
+from pathlib import Path
+
+# dump_reader and letter_sync live with the other extractors in explore/old/
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'explore' / 'old'))
+from dump_reader import open_dump
+from letter_sync import LetterSync, add_sync_arguments
 
 def unescape_sql_string(s):
     """Unescape SQL string escapes"""
@@ -90,8 +97,14 @@ def parse_insert_values(values_str):
 
     return rows
 
+parser = add_sync_arguments(argparse.ArgumentParser(description=__doc__))
+parser.add_argument('sql_file', nargs='?',
+                    default='/Users/kml8/shell/shoebox/backups/huginn_shoebox.sql',
+                    help='SQL dump to read (.sql, .sql.gz, .sql.bz2, .sql.xz or .sql.zst)')
+args = parser.parse_args()
+
 print("Reading SQL file...")
-sql_file = '/Users/kml8/shell/shoebox/backups/huginn_shoebox.sql'
+sql_file = args.sql_file
 
 # Read the SQL file and extract INSERT statements
 items_data = []
@@ -101,7 +114,7 @@ tags_data = []
 taggings_data = []
 files_data = []
 
-with open(sql_file, 'r', encoding='utf-8') as f:
+with open_dump(sql_file) as f:
     current_table = None
     collecting_insert = False
     insert_buffer = []
@@ -177,6 +190,9 @@ for tag in tags_data:
 
 print("Processing items 105 and 194...")
 
+# Only these two items are extracted, so nothing else counts as deleted
+sync = LetterSync.from_args('letters-raw', args, track_deletions=False)
+
 # Process items 105 and 194 only
 for item in items_data:
     item_id = int(item[0])
@@ -229,14 +245,14 @@ for item in items_data:
             })
     letter['files'] = letter_files
 
-    # Write to JSON file
-    filename = f'letters-raw/{item_id:04d}.json'
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(letter, f, indent=2, ensure_ascii=False)
+    # Write to JSON file (skipped if unchanged since the last extraction)
+    status = sync.write(letter)
+    filename = sync.path_for(item_id)
 
-    print(f"✓ Extracted item {item_id} to {filename}")
+    print(f"✓ Extracted item {item_id} to {filename} ({status})")
     print(f"  Type: {item_type_id}")
     print(f"  Title: {letter['metadata'].get('Title', ['Unknown'])[0]}")
     print()
 
+sync.finish()
 print("Done!")
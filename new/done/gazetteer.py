@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Place-name gazetteer with normalized and fuzzy lookup
+Resolves Location/Destination strings from the letters to the canonical
+names in locations.csv, so spelling variants still reach the map.
+
+Lookup order for a name:
+
+  exact       the name is a gazetteer entry
+  normalized  equal after normalize(): case folding, æ/ø/å/aa and accent
+              folding, punctuation removed, anything after a comma or in
+              parentheses (county, state, country) dropped
+  fuzzy       within a small edit distance of a normalized entry
+              ("Trondhjem" -> Trondheim); candidates come from a trigram
+              inverted index, probing only the rarest trigrams of the name
+              (prefix filtering), and are verified with a banded Levenshtein,
+              so lookups stay fast with hundreds of thousands of places
+  compound    a long entry followed by a short Norwegian compound ending
+              ("Stjørdalshalsen" -> Stjørdal)
+
+Resolutions, including failures, are cached in gazetteer-cache.json and
+reused until locations.csv changes. Names that could not be resolved are
+counted so scripts can report them.
+
+Usage:
+  python3 gazetteer.py Trondhjem "Dell Rapids, South Dakota"
+  python3 gazetteer.py --report      # resolve every Location/Destination
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import re
+import sys
+import unicodedata
+from collections import Counter, defaultdict
+from pathlib import Path
+
+NEW_DIR = Path(__file__).resolve().parent.parent
+LOCATIONS_CSV = NEW_DIR / 'locations.csv'
+PLACE_NAMES = NEW_DIR / 'place-names.txt'
+CACHE_FILE = NEW_DIR / 'gazetteer-cache.json'
+
+MIN_COMPOUND_STEM = 6     # shortest entry accepted as the start of a compound
+MAX_COMPOUND_ENDING = 8   # longest ending accepted after it
+
+FOLDS = (('æ', 'ae'), ('ø', 'o'), ('å', 'a'), ('aa', 'a'), ('ß', 'ss'))
+
+def normalize(name):
+    """Comparison key for a place name"""
+    name = re.split(r'[,(]', name, 1)[0].casefold()
+    for source, target in FOLDS:
+        name = name.replace(source, target)
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    name = re.sub(r'[^\w\s]', ' ', name).replace('_', ' ')
+    return ' '.join(name.split())
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def max_distance(key):
+    """Edits allowed for a fuzzy match: none for very short names"""
+    if len(key) <= 3:
+        return 0
+    return max(1, len(key) // 4)
+
+def bounded_levenshtein(a, b, limit):
+    """Edit distance between a and b, or None if it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return None
+    if len(a) > len(b):
+        a, b = b, a
+
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        # Only cells within `limit` of the diagonal can stay under the limit
+        low, high = max(1, i - limit), min(len(b), i + limit)
+        current = [i] + [limit + 1] * len(b)
+        for j in range(low, high + 1):
+            cost = 0 if ca == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+        if min(current[low - 1:high + 1]) > limit:
+            return None
+        previous = current
+    return previous[len(b)] if previous[len(b)] <= limit else None
+
+def load_locations(path=LOCATIONS_CSV):
+    """Map location name -> (lat, lon, country) from locations.csv"""
+    locations = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader)  # Skip header
+
+        for row in reader:
+            if len(row) < 3:
+                continue
+
+            # Rows are Name, Country, Lat, Lon or Name, Lat, Lon
+            if len(row) == 4:
+                country, lat, lon = row[1].strip(), float(row[2]), float(row[3])
+            else:
+                country, lat, lon = '', float(row[1]), float(row[2])
+            locations[row[0].strip()] = (lat, lon, country)
+    return locations
+
+def load_place_names(path=PLACE_NAMES, locations_path=LOCATIONS_CSV):
+    """place-names.txt and locations.csv names, without duplicates"""
+    names = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                names.append(line)
+    names.extend(load_locations(locations_path))
+    return list(dict.fromkeys(names))
+
+class Gazetteer:
+    """Index over canonical place names"""
+
+    def __init__(self, locations, cache_path=None, source_hash=''):
+        self.locations = locations                  # name -> (lat, lon, country)
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.source_hash = source_hash
+        self.unmatched = Counter()
+
+        self.keys = []                              # key id -> normalized key
+        self.names_by_key = defaultdict(list)       # normalized key -> names
+        self.postings = defaultdict(list)           # trigram -> key ids
+        for name in sorted(locations):
+            key = normalize(name)
+            if key not in self.names_by_key:
+                key_id = len(self.keys)
+                self.keys.append(key)
+                for gram in trigrams(key):
+                    self.postings[gram].append(key_id)
+            self.names_by_key[key].append(name)
+
+        self.cache = self._load_cache()
+        self._cache_dirty = False
+
+    @classmethod
+    def from_csv(cls, path=LOCATIONS_CSV, cache_path=CACHE_FILE):
+        with open(path, 'rb') as f:
+            source_hash = hashlib.sha1(f.read()).hexdigest()
+        return cls(load_locations(path), cache_path, source_hash)
+
+    def __len__(self):
+        return len(self.locations)
+
+    def _load_cache(self):
+        if self.cache_path is None:
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        # Resolutions are only valid for the gazetteer they were made with
+        if data.get('gazetteer') != self.source_hash:
+            return {}
+        return data.get('resolutions', {})
+
+    def save_cache(self):
+        if self.cache_path is None or not self._cache_dirty:
+            return
+        with open(self.cache_path, 'w', encoding='utf-8') as f:
+            json.dump({'gazetteer': self.source_hash, 'resolutions': self.cache},
+                      f, ensure_ascii=False, indent=2, sort_keys=True)
+        self._cache_dirty = False
+
+    def _fuzzy(self, key):
+        """Closest normalized key within max_distance(key), as (key, distance)"""
+        limit = max_distance(key)
+        if limit == 0:
+            return None
+
+        grams = sorted(trigrams(key), key=lambda g: len(self.postings.get(g, ())))
+        # A key within `limit` edits shares all but at most 3 * limit of the
+        # query's trigrams, so it must contain one of the 3 * limit + 1 rarest
+        candidates = set()
+        for gram in grams[:3 * limit + 1]:
+            candidates.update(self.postings.get(gram, ()))
+
+        best = None
+        for key_id in candidates:
+            candidate = self.keys[key_id]
+            distance = bounded_levenshtein(key, candidate, limit)
+            if distance is not None and (best is None or (distance, candidate) < best[::-1]):
+                best = (candidate, distance)
+        return best
+
+    def _compound(self, key):
+        """Longest entry that key starts with, followed by a short ending"""
+        if ' ' in key:
+            return None
+        for end in range(len(key) - 1, MIN_COMPOUND_STEM - 1, -1):
+            stem = key[:end]
+            if stem in self.names_by_key and len(key) - end <= MAX_COMPOUND_ENDING:
+                return stem
+        return None
+
+    def lookup(self, name):
+        """
+        Resolve a name without the cache
+        Returns {'name', 'method', 'distance'}; name is None if unresolved
+        """
+        name = name.strip()
+        if name in self.locations:
+            return {'name': name, 'method': 'exact', 'distance': 0}
+
+        key = normalize(name)
+        if key in self.names_by_key:
+            return {'name': self.names_by_key[key][0], 'method': 'normalized', 'distance': 0}
+
+        match = self._fuzzy(key)
+        if match:
+            return {'name': self.names_by_key[match[0]][0], 'method': 'fuzzy', 'distance': match[1]}
+
+        stem = self._compound(key)
+        if stem:
+            return {'name': self.names_by_key[stem][0], 'method': 'compound',
+                    'distance': len(key) - len(stem)}
+
+        return {'name': None, 'method': 'none', 'distance': None}
+
+    def resolve(self, name):
+        """Canonical name for a place string, or None (counted as unmatched)"""
+        name = (name or '').strip()
+        if not name:
+            return None
+
+        resolution = self.cache.get(name)
+        if resolution is None:
+            resolution = self.lookup(name)
+            self.cache[name] = resolution
+            self._cache_dirty = True
+
+        if resolution['name'] is None:
+            self.unmatched[name] += 1
+        return resolution['name']
+
+    def print_unmatched(self):
+        """Report names that did not resolve, most frequent first"""
+        if not self.unmatched:
+            return
+        print(f"Unmatched place names ({len(self.unmatched)}):")
+        for name, count in self.unmatched.most_common():
+            print(f"  {count:4d}  {name}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('names', nargs='*', help='place names to resolve')
+    parser.add_argument('--report', action='store_true',
+                        help='resolve every Location/Destination in letters.ndjson')
+    args = parser.parse_args()
+
+    gazetteer = Gazetteer.from_csv()
+    print(f"Gazetteer: {len(gazetteer)} places")
+
+    for name in args.names:
+        result = gazetteer.lookup(name)
+        print(f"  {name!r} -> {result['name']!r} ({result['method']}, distance {result['distance']})")
+
+    if args.report:
+        sys.path.insert(0, str(NEW_DIR))
+        from corpus import iter_letters
+
+        methods = Counter()
+        for letter in iter_letters():
+            for field in ('Location', 'Destination'):
+                value = ((letter.get('metadata', {}).get(field) or [''])[0] or '').strip()
+                if value and gazetteer.resolve(value):
+                    methods[gazetteer.cache[value]['method']] += 1
+        print("Resolved: " + ', '.join(f"{method} {count}" for method, count in methods.most_common()))
+        gazetteer.print_unmatched()
+        gazetteer.save_cache()
+
+if __name__ == '__main__':
+    main()
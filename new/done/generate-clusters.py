@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Generate map/clusters.json: place markers grouped for every zoom level
+Lets the map draw one marker per cluster of nearby places instead of one per
+place, so it stays usable with thousands of places.
+
+Places are the Location and Destination of each letter, resolved against
+locations.csv with the gazetteer (gazetteer.py); --mentions also adds the
+places each letter mentions (place-mentions.json, from generate-places.py)
+where they resolve.
+
+Clusters are built bottom-up on a grid in Web Mercator pixels: at zoom z the
+world is 256 * 2^z pixels wide, and clusters of zoom z + 1 whose centres fall
+in the same CELL_PIXELS square at zoom z are merged. From MAX_ZOOM on every
+place is its own cluster. Consecutive zooms with the same clusters are stored once
+as a level.
+
+  {
+    "cell_pixels": 64,
+    "places": [[name, lat, lon], ...],
+    "cluster_fields": ["lat", "lon", "letters", "places", "letter_ids"],
+    "levels": [
+      {"min_zoom": 0, "max_zoom": 2,
+       "clusters": [[lat, lon, letters, [place, ...], [letter id, ...]], ...]},
+      ...                                   the last level has "max_zoom": null
+    ]
+  }
+
+A cluster's position is the centre of its places weighted by their letters;
+"letters" counts distinct letters (a letter sent between two places in the
+same cluster counts once). Places are referred to by their index in
+"places".
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+NEW_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(NEW_DIR))
+from corpus import NDJSON_FILE, first_value, iter_letters
+from gazetteer import Gazetteer
+
+CLUSTERS_JSON = NEW_DIR / 'map' / 'clusters.json'
+MENTIONS_JSON = NEW_DIR / 'place-mentions.json'
+
+CELL_PIXELS = 64   # grid cell size, in screen pixels
+MAX_ZOOM = 14      # every place is its own cluster from here on
+TILE_SIZE = 256
+
+CLUSTER_FIELDS = ['lat', 'lon', 'letters', 'places', 'letter_ids']
+
+def collect_places(corpus_path, gazetteer, mentions=None):
+    """{canonical place name: set of letter ids}"""
+    places = defaultdict(set)
+    for letter in iter_letters(corpus_path):
+        for field in ('Location', 'Destination'):
+            name = gazetteer.resolve(first_value(letter, field))
+            if name:
+                places[name].add(letter['id'])
+
+    if mentions:
+        names = mentions['places']
+        for letter_id, found in mentions['letters'].items():
+            for place in {place for place, _, _, _ in found}:
+                name = gazetteer.resolve(names[place])
+                if name:
+                    places[name].add(int(letter_id))
+    return places
+
+def mercator(lat, lon):
+    """World coordinates in [0, 1) at zoom 0 (Web Mercator, as Leaflet uses)"""
+    lat = max(-85.05112878, min(85.05112878, lat))
+    x = (lon + 180) / 360
+    y = (1 - math.log(math.tan(math.radians(lat)) + 1 / math.cos(math.radians(lat))) / math.pi) / 2
+    return x, y
+
+class Cluster:
+    def __init__(self, places, letters, x, y, lat, lon):
+        self.places = places      # sorted place indexes
+        self.letters = letters    # set of letter ids
+        self.x, self.y = x, y
+        self.lat, self.lon = lat, lon
+
+    @classmethod
+    def merge(cls, clusters):
+        if len(clusters) == 1:
+            return clusters[0]
+        # Weight by letters at each member, not distinct letters overall, so
+        # merging is associative across levels
+        weights = [len(c.letters) or 1 for c in clusters]
+        total = sum(weights)
+        centre = lambda attr: sum(getattr(c, attr) * w for c, w in zip(clusters, weights)) / total
+        return cls(sorted(p for c in clusters for p in c.places),
+                   set().union(*(c.letters for c in clusters)),
+                   centre('x'), centre('y'), centre('lat'), centre('lon'))
+
+    def row(self):
+        return [round(self.lat, 5), round(self.lon, 5), len(self.letters),
+                self.places, sorted(self.letters)]
+
+def cluster_levels(places, coordinates):
+    """[[min zoom, max zoom, clusters], ...] from zoom 0 up to MAX_ZOOM"""
+    clusters = []
+    for index, (name, letters) in enumerate(places):
+        lat, lon = coordinates[name]
+        clusters.append(Cluster([index], set(letters), *mercator(lat, lon), lat, lon))
+
+    levels = [[MAX_ZOOM, MAX_ZOOM, clusters]]
+    for zoom in range(MAX_ZOOM - 1, -1, -1):
+        cells = defaultdict(list)
+        scale = TILE_SIZE * 2 ** zoom / CELL_PIXELS
+        for cluster in clusters:
+            cells[int(cluster.x * scale), int(cluster.y * scale)].append(cluster)
+        merged = [Cluster.merge(members) for _, members in sorted(cells.items())]
+
+        if len(merged) == len(clusters):
+            levels[-1][0] = zoom  # nothing merged: extend the level below
+        else:
+            levels.append([zoom, zoom, merged])
+        clusters = merged
+    levels.reverse()
+    return levels
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mentions', action='store_true',
+                        help='also place letters at the places they mention')
+    parser.add_argument('--corpus', default=NDJSON_FILE,
+                        help='letters.ndjson built by build-data.py')
+    parser.add_argument('--output', default=CLUSTERS_JSON,
+                        help='where to write the clusters (default: map/clusters.json)')
+    args = parser.parse_args()
+
+    print("Reading locations.csv...")
+    gazetteer = Gazetteer.from_csv()
+    print(f"Found {len(gazetteer)} valid locations")
+
+    mentions = None
+    if args.mentions:
+        with open(MENTIONS_JSON, 'r', encoding='utf-8') as f:
+            mentions = json.load(f)
+
+    print(f"Reading {Path(args.corpus).name}...")
+    places = sorted(collect_places(args.corpus, gazetteer, mentions).items())
+    gazetteer.save_cache()
+    gazetteer.print_unmatched()
+    if not places:
+        print("ERROR: No places found!")
+        return
+
+    coordinates = {name: gazetteer.locations[name][:2] for name, _ in places}
+    levels = cluster_levels(places, coordinates)
+
+    data = {
+        'cell_pixels': CELL_PIXELS,
+        'places': [[name, *coordinates[name]] for name, _ in places],
+        'cluster_fields': CLUSTER_FIELDS,
+        'levels': [{'min_zoom': low, 'max_zoom': high,
+                    'clusters': [cluster.row() for cluster in clusters]}
+                   for low, high, clusters in levels],
+    }
+    # The most detailed level also covers every zoom beyond MAX_ZOOM
+    data['levels'][-1]['max_zoom'] = None
+
+    print(f"Writing {args.output}...")
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+
+    print(f"Done! {len(places)} places in {len(levels)} levels")
+    for low, high, clusters in levels:
+        zooms = f"{low}-{high}" if high != low else f"{low}"
+        print(f"  zoom {zooms:>5}: {len(clusters)} clusters")
+    print(f"Size: {os.path.getsize(args.output):,} bytes")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Generate creator-profiles.json: the words that set each correspondent apart
+For the "Topic by Correspondent" view: per Creator, the terms of their
+letters that are most distinctive against the rest of the corpus, with
+their letter count and the dates they were active.
+
+Creators are grouped as in generate-people.py (person_names.py: spellings
+that differ only by initials and small variations are one person, named by
+the most used spelling; the translator entry is left out).
+
+Scoring
+-------
+Term counts come from term_counts.py and are summed per person as groups of
+rows of the sparse letter x term matrices of keyness.py. For a person i and
+the rest of the corpus j, each term w gets the weighted log odds ratio with
+an informative Dirichlet prior (Monroe, Colaresi and Quinn 2008):
+
+  a_w    = PRIOR * (corpus count of w) / (corpus tokens)      prior counts
+  delta  = log((y_iw + a_w) / (n_i + a_0 - y_iw - a_w))
+         - log((y_jw + a_w) / (n_j + a_0 - y_jw - a_w))
+  z      = delta / sqrt(1 / (y_iw + a_w) + 1 / (y_jw + a_w))
+
+where y are term counts, n token totals and a_0 = PRIOR. The prior shrinks
+terms seen only a few times towards the corpus rate, so a person's top
+terms are the ones they use often and others rarely, not one-off words.
+Terms used fewer than MIN_COUNT times by the person are left out.
+
+Only letters whose text changed since the last run are tokenized again
+(term_counts.py keeps the counts in term-counts.json), so the profiles are
+cheap to rebuild after an edit.
+
+Output (creator-profiles.json)
+------------------------------
+  {
+    "prior": 1000,
+    "profiles": [
+      {"name": "Axel Holm", "spellings": [...], "letters": 38, "undated": 0,
+       "first": "1917-01-30", "last": "1952-03-01",
+       "no": [[term, z, count], ...], "en": [[term, z, count], ...]},
+      ...                                        most letters first
+    ]
+  }
+
+"first" and "last" span the dates of their letters (letter_dates.py), and
+are null if none are dated.
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+NEW_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(NEW_DIR))
+from corpus import NDJSON_FILE, iter_letters, letter_creators
+from keyness import SparseCounts
+from letter_dates import letter_range
+from person_names import NameIndex, group_names
+from term_counts import LANGUAGES, TermCounts
+
+PROFILES_JSON = NEW_DIR / 'creator-profiles.json'
+
+PRIOR = 1000      # a_0: total weight of the corpus-wide prior, in tokens
+TOP_TERMS = 25    # terms kept per person and language
+MIN_COUNT = 2     # a term must occur this often in the person's letters
+
+def collect(corpus_path, term_counts):
+    """Return ([(creators, DateRange or None)], {lang: [term counts]}) in row order"""
+    letters = []
+    rows = {lang: [] for lang in LANGUAGES}
+    for letter in iter_letters(corpus_path):
+        counts = term_counts.counts(letter)
+        for lang in LANGUAGES:
+            rows[lang].append(counts[lang])
+        letters.append((letter_creators(letter), letter_range(letter)))
+    return letters, rows
+
+def weighted_log_odds(counts, totals, prior, min_count):
+    """[(z, term id, count)] for the terms of one group against the rest"""
+    n_all = sum(totals)
+    n_i = sum(counts)
+    n_j = n_all - n_i
+    scored = []
+    for term_id, y_i in enumerate(counts):
+        if y_i < min_count:
+            continue
+        y_j = totals[term_id] - y_i
+        a_w = prior * totals[term_id] / n_all
+        delta = (math.log((y_i + a_w) / (n_i + prior - y_i - a_w))
+                 - math.log((y_j + a_w) / (n_j + prior - y_j - a_w)))
+        z = delta / math.sqrt(1 / (y_i + a_w) + 1 / (y_j + a_w))
+        scored.append((z, term_id, y_i))
+    return scored
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--prior', type=float, default=PRIOR,
+                        help=f'weight of the corpus-wide prior, in tokens (default: {PRIOR})')
+    parser.add_argument('--top', type=int, default=TOP_TERMS,
+                        help=f'terms per person and language (default: {TOP_TERMS})')
+    parser.add_argument('--corpus', default=NDJSON_FILE,
+                        help='letters.ndjson built by build-data.py')
+    parser.add_argument('--output', default=PROFILES_JSON,
+                        help='where to write the profiles (default: creator-profiles.json)')
+    args = parser.parse_args()
+    if args.prior <= 0:
+        parser.error('--prior must be positive')
+
+    print("=" * 60)
+    print("Creator Profiles")
+    print("=" * 60)
+
+    started = time.monotonic()
+    term_counts = TermCounts()
+    letters, rows = collect(args.corpus, term_counts)
+    term_counts.save_cache()
+    print(f"Term counts: {term_counts.counted} letters counted, "
+          f"{term_counts.reused} from cache")
+
+    creator_counts = Counter(name for creators, _ in letters for name in set(creators))
+    groups = group_names(creator_counts)
+    index = NameIndex(groups)
+    person_rows = defaultdict(set)
+    for row, (creators, _) in enumerate(letters):
+        for name in creators:
+            person_rows[index.resolve(name)].add(row)
+    print(f"Found {len(creator_counts)} creator names, {len(groups)} people")
+
+    matrices = {lang: SparseCounts(lang_rows) for lang, lang_rows in rows.items()}
+    profiles = []
+    for name, spellings in groups:
+        person = sorted(person_rows[name])
+        ranges = [letters[row][1] for row in person if letters[row][1]]
+        profile = {
+            'name': name,
+            'spellings': spellings,
+            'letters': len(person),
+            'undated': len(person) - len(ranges),
+            'first': min(r.start for r in ranges).isoformat() if ranges else None,
+            'last': max(r.end for r in ranges).isoformat() if ranges else None,
+        }
+        for lang, matrix in matrices.items():
+            scored = weighted_log_odds(matrix.sum_rows(person), matrix.totals,
+                                       args.prior, MIN_COUNT)
+            scored.sort(key=lambda s: (-s[0], s[1]))
+            profile[lang] = [[matrix.terms[term_id], round(z, 2), count]
+                             for z, term_id, count in scored[:args.top] if z > 0]
+        profiles.append(profile)
+    profiles.sort(key=lambda p: (-p['letters'], p['name']))
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'prior': args.prior, 'profiles': profiles},
+                  f, ensure_ascii=False, separators=(',', ':'))
+    print(f"Built in {time.monotonic() - started:.2f}s")
+    print(f"Saved {args.output} ({os.path.getsize(args.output):,} bytes)")
+
+    print("\nMost letters:")
+    for profile in profiles[:10]:
+        dates = f"{profile['first']} .. {profile['last']}" if profile['first'] else 'undated'
+        terms = ', '.join(term for term, _, _ in profile['no'][:6])
+        print(f"  {profile['letters']:3d}  {profile['name']} ({dates}): {terms}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Generate map/network.json: the correspondence network sliced by time
+Unlike pairs.csv (undirected pairs over the whole collection), edges here are
+directed (Location -> Destination) and bucketed by year, or by a window of
+several years (--window 5), with running cumulative counts.
+
+For every slice the network statistics are precomputed so the map can scrub
+through time without doing graph work in the browser:
+
+  in/out degree     number of distinct places letters came from / went to
+  in/out strength   number of letters received / sent
+  betweenness       Brandes betweenness centrality on the directed slice
+                    graph, normalized by (n-1)(n-2) for the n active places
+
+Output layout (places are referred to by their index in "nodes"):
+
+  {
+    "window": 1,
+    "nodes": [[name, lat, lon, country], ...],
+    "node_fields": ["node", "in_degree", "out_degree", "in_strength",
+                    "out_strength", "betweenness"],
+    "slices": [
+      {
+        "start": 1911, "end": 1911, "letters": 3,
+        "edges": [[from, to, count, cumulative], ...],   every edge seen so far
+        "nodes": [[node, in_deg, out_deg, in_str, out_str, betweenness], ...],
+        "cumulative_nodes": [...]   same statistics for all letters up to "end"
+      }
+    ]
+  }
+
+Letters are streamed from letters.ndjson (built by build-data.py), and place
+names are resolved against locations.csv with the gazetteer (gazetteer.py).
+A letter's year is the start of its LetterDate, or of its Date if it has no
+LetterDate (letter_dates.py), the same year the metadata index, app.js and
+the map's year filter use.
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import Counter, defaultdict, deque
+from pathlib import Path
+
+NEW_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(NEW_DIR))
+from corpus import NDJSON_FILE, first_value, iter_letters
+from gazetteer import Gazetteer
+from letter_dates import letter_range
+
+NETWORK_JSON = NEW_DIR / 'map' / 'network.json'
+
+NODE_FIELDS = ['node', 'in_degree', 'out_degree', 'in_strength', 'out_strength', 'betweenness']
+
+def letter_year(letter):
+    """Start year of the letter's date, as build-data.py and app.js count it"""
+    date_range = letter_range(letter)
+    return date_range.start.year if date_range else None
+
+def collect_edges(corpus_path, gazetteer):
+    """Return ({(year, from, to): count}, skipped counts)"""
+    edges = Counter()
+    skipped = Counter()
+
+    for letter in iter_letters(corpus_path):
+        location = first_value(letter, 'Location')
+        destination = first_value(letter, 'Destination')
+        year = letter_year(letter)
+
+        if not location or not destination:
+            skipped['missing location or destination'] += 1
+            continue
+
+        location = gazetteer.resolve(location)
+        destination = gazetteer.resolve(destination)
+        if not location or not destination:
+            skipped['location not in locations.csv'] += 1
+        elif year is None:
+            skipped['no LetterDate or Date'] += 1
+        else:
+            edges[year, location, destination] += 1
+
+    return edges, skipped
+
+def betweenness(nodes, adjacency):
+    """Brandes betweenness centrality for an unweighted directed graph"""
+    centrality = dict.fromkeys(nodes, 0.0)
+
+    for source in nodes:
+        stack = []
+        predecessors = defaultdict(list)
+        paths = dict.fromkeys(nodes, 0)
+        paths[source] = 1
+        distance = {source: 0}
+        queue = deque([source])
+
+        while queue:
+            v = queue.popleft()
+            stack.append(v)
+            for w in adjacency.get(v, ()):
+                if w not in distance:
+                    distance[w] = distance[v] + 1
+                    queue.append(w)
+                if distance[w] == distance[v] + 1:
+                    paths[w] += paths[v]
+                    predecessors[w].append(v)
+
+        dependency = dict.fromkeys(nodes, 0.0)
+        while stack:
+            w = stack.pop()
+            for v in predecessors[w]:
+                dependency[v] += paths[v] / paths[w] * (1 + dependency[w])
+            if w != source:
+                centrality[w] += dependency[w]
+
+    n = len(nodes)
+    scale = 1 / ((n - 1) * (n - 2)) if n > 2 else 0
+    return {node: value * scale for node, value in centrality.items()}
+
+def node_statistics(edge_counts):
+    """Per-node rows (see NODE_FIELDS) for a {(from, to): count} graph"""
+    in_degree, out_degree = Counter(), Counter()
+    in_strength, out_strength = Counter(), Counter()
+    adjacency = defaultdict(list)
+
+    for (source, target), count in edge_counts.items():
+        out_degree[source] += 1
+        in_degree[target] += 1
+        out_strength[source] += count
+        in_strength[target] += count
+        adjacency[source].append(target)
+
+    nodes = sorted(set(in_degree) | set(out_degree))
+    centrality = betweenness(nodes, adjacency)
+    return [[node, in_degree[node], out_degree[node], in_strength[node],
+             out_strength[node], round(centrality[node], 4)]
+            for node in nodes]
+
+def build_slices(edges, node_index, window):
+    """Bucket (year, from, to) counts into slices of `window` years"""
+    by_bucket = defaultdict(Counter)
+    years = sorted({year for year, _, _ in edges})
+    first_year = years[0]
+
+    for (year, location, destination), count in edges.items():
+        bucket = first_year + (year - first_year) // window * window
+        by_bucket[bucket][node_index[location], node_index[destination]] += count
+
+    slices = []
+    cumulative = Counter()
+    last_bucket = first_year + (years[-1] - first_year) // window * window
+    for start in range(first_year, last_bucket + 1, window):
+        counts = by_bucket.get(start, Counter())
+        cumulative.update(counts)
+        slices.append({
+            'start': start,
+            'end': start + window - 1,
+            'letters': sum(counts.values()),
+            'edges': [[source, target, counts.get((source, target), 0), total]
+                      for (source, target), total in sorted(cumulative.items())],
+            'nodes': node_statistics(counts),
+            'cumulative_nodes': node_statistics(cumulative),
+        })
+    return slices
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--window', type=int, default=1,
+                        help='years per slice (default: 1)')
+    parser.add_argument('--corpus', default=NDJSON_FILE,
+                        help='letters.ndjson built by build-data.py')
+    parser.add_argument('--output', default=NETWORK_JSON,
+                        help='where to write the network (default: map/network.json)')
+    args = parser.parse_args()
+    if args.window < 1:
+        parser.error('--window must be at least 1')
+
+    print("Reading locations.csv...")
+    gazetteer = Gazetteer.from_csv()
+    print(f"Found {len(gazetteer)} valid locations")
+
+    print(f"Reading {Path(args.corpus).name}...")
+    edges, skipped = collect_edges(args.corpus, gazetteer)
+    gazetteer.save_cache()
+    print(f"Found {sum(edges.values())} letters with a dated, known route")
+    for reason, count in skipped.most_common():
+        print(f"  Skipped {count}: {reason}")
+    gazetteer.print_unmatched()
+    if not edges:
+        print("ERROR: No routes found!")
+        return
+
+    # Only places that appear in some edge become nodes
+    names = sorted({name for _, location, destination in edges
+                    for name in (location, destination)})
+    node_index = {name: i for i, name in enumerate(names)}
+    slices = build_slices(edges, node_index, args.window)
+
+    network = {
+        'window': args.window,
+        'nodes': [[name, *gazetteer.locations[name]] for name in names],
+        'node_fields': NODE_FIELDS,
+        'slices': slices,
+    }
+
+    print(f"Writing {args.output}...")
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(network, f, ensure_ascii=False, separators=(',', ':'))
+
+    print(f"Done! {len(slices)} slices of {args.window} year(s), "
+          f"{slices[0]['start']}-{slices[-1]['end']}")
+    print(f"Places: {len(names)}, directed routes: {len(slices[-1]['edges'])}")
+    print(f"Size: {os.path.getsize(args.output):,} bytes")
+
+if __name__ == '__main__':
+    main()
@@ -2,60 +2,147 @@
 """
 Generate pairs.csv from letters data and locations.csv
 Creates a CSV of location-destination pairs with counts and letter IDs
+Letters are streamed from letters.ndjson (built by build-data.py)
+Location/Destination spellings are resolved with the gazetteer (gazetteer.py),
+so variants like "Trondhjem" or "Dell Rapids, South Dakota" are still paired
+
+Also writes map/routes.json, the line geometry the map draws for each pair,
+so the browser does no curve work on load:
+
+  - the great-circle path between the two places, bent sideways by the
+    pair's curvature (alternating direction and size, as the map always did,
+    so lines sharing a place do not lie on top of each other)
+  - simplified with Douglas-Peucker (SIMPLIFY_TOLERANCE degrees)
+  - quantized and delta-encoded TopoJSON-style: every arc is a list of
+    integer [dx, dy] steps, decoded as lon = x * scale[0] + translate[0],
+    lat = y * scale[1] + translate[1]
+
+  {
+    "transform": {"scale": [sx, sy], "translate": [lon0, lat0]},
+    "fields": ["location1", "location2", "count", "distance_km", "curvature", "arc"],
+    "routes": [[loc1, loc2, count, km, curvature, arc index], ...],  pairs.csv order
+    "arcs": [[[x, y], [dx, dy], ...], ...]
+  }
 """
 
 import json
 import csv
+import math
+import sys
 from collections import defaultdict
-
-# Load valid locations from locations.csv
-valid_locations = set()
-location_coords = {}
-
-print("Reading locations.csv...")
-with open('locations.csv', 'r', encoding='utf-8') as f:
-    reader = csv.reader(f)
-    header = next(reader)  # Skip header
-
-    for row in reader:
-        if len(row) < 3:
+from pathlib import Path
+
+NEW_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(NEW_DIR))
+from corpus import NDJSON_FILE, iter_letters
+from gazetteer import Gazetteer
+
+LOCATIONS_CSV = NEW_DIR / 'locations.csv'
+PAIRS_CSV = NEW_DIR / 'map' / 'pairs.csv'
+ROUTES_JSON = NEW_DIR / 'map' / 'routes.json'
+
+EARTH_RADIUS_KM = 6371.0
+ROUTE_POINTS = 64            # samples along each route before simplification
+SIMPLIFY_TOLERANCE = 0.05    # degrees (a few km, below a pixel at country zoom)
+QUANTIZATION = 1e-4          # degrees per integer step in routes.json
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points"""
+    phi1, lam1, phi2, lam2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    h = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin((lam2 - lam1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+def great_circle(lat1, lon1, lat2, lon2, points):
+    """[(lat, lon), ...] along the great circle, longitudes kept continuous"""
+    phi1, lam1, phi2, lam2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.cos(phi1) * math.cos(lam1), math.cos(phi1) * math.sin(lam1), math.sin(phi1))
+    b = (math.cos(phi2) * math.cos(lam2), math.cos(phi2) * math.sin(lam2), math.sin(phi2))
+    omega = math.acos(max(-1.0, min(1.0, sum(x * y for x, y in zip(a, b)))))
+
+    path = []
+    for i in range(points + 1):
+        t = i / points
+        if omega < 1e-9:
+            x, y, z = a
+        else:
+            wa, wb = math.sin((1 - t) * omega), math.sin(t * omega)
+            x, y, z = ((wa * p + wb * q) / math.sin(omega) for p, q in zip(a, b))
+        lat, lon = math.degrees(math.atan2(z, math.hypot(x, y))), math.degrees(math.atan2(y, x))
+        if path:
+            lon += 360 * round((path[-1][1] - lon) / 360)
+        path.append((lat, lon))
+    return path
+
+def curvature_for(index):
+    """Sideways bend of the index-th line (1-based), as a fraction of its length"""
+    direction = 1 if index % 2 == 0 else -1
+    return round((0.1 + index % 5 * 0.08) * direction, 2)
+
+def curved_route(lat1, lon1, lat2, lon2, curvature):
+    """Great-circle path displaced like a quadratic Bezier with its control
+    point moved off the chord by curvature * chord length (in degrees)"""
+    path = great_circle(lat1, lon1, lat2, lon2, ROUTE_POINTS)
+    lat_diff, lon_diff = lat2 - lat1, path[-1][1] - lon1
+    offset_lat, offset_lon = -lon_diff * curvature, lat_diff * curvature
+    route = []
+    for i, (lat, lon) in enumerate(path):
+        t = i / ROUTE_POINTS
+        bend = 2 * t * (1 - t)
+        route.append((lat + bend * offset_lat, lon + bend * offset_lon))
+    return route
+
+def douglas_peucker(points, tolerance):
+    """Simplify a polyline, keeping points further than tolerance from the chord"""
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        (y1, x1), (y2, x2) = points[first], points[last]
+        dx, dy = x2 - x1, y2 - y1
+        norm = math.hypot(dx, dy)
+        best, best_distance = None, tolerance
+        for i in range(first + 1, last):
+            y, x = points[i]
+            if norm:
+                distance = abs(dy * (x - x1) - dx * (y - y1)) / norm
+            else:
+                distance = math.hypot(x - x1, y - y1)
+            if distance > best_distance:
+                best, best_distance = i, distance
+        if best is not None:
+            keep[best] = True
+            stack.extend([(first, best), (best, last)])
+    return [point for point, kept in zip(points, keep) if kept]
+
+def encode_arc(points, translate):
+    """Quantize (lat, lon) points to integer [x, y] and delta-encode them"""
+    arc, previous = [], (0, 0)
+    for lat, lon in points:
+        x = round((lon - translate[0]) / QUANTIZATION)
+        y = round((lat - translate[1]) / QUANTIZATION)
+        if arc and (x, y) == previous:
             continue
+        arc.append([x - previous[0], y - previous[1]])
+        previous = (x, y)
+    return arc
 
-        name = row[0].strip()
-
-        # Check if row has 4 columns (Name, Country, Lat, Lon) or 3 (Name, Lat, Lon)
-        if len(row) == 4:
-            country = row[1].strip()
-            lat = float(row[2].strip())
-            lon = float(row[3].strip())
-        else:  # 3 columns
-            country = ''
-            lat = float(row[1].strip())
-            lon = float(row[2].strip())
-
-        valid_locations.add(name)
-        location_coords[name] = {
-            'lat': lat,
-            'lon': lon,
-            'country': country
-        }
-
-print(f"Found {len(valid_locations)} valid locations")
-
-# Load letters data
-print("Reading letters.json...")
-with open('letters.json', 'r', encoding='utf-8') as f:
-    letters = json.load(f)
-
-print(f"Found {len(letters)} letters")
+print("Reading locations.csv...")
+gazetteer = Gazetteer.from_csv(LOCATIONS_CSV)
+location_coords = gazetteer.locations  # name -> (lat, lon, country)
+print(f"Found {len(location_coords)} valid locations")
 
 # Track pairs and their letter IDs
 # Key: (location, destination) tuple
 # Value: list of letter IDs
 pairs_dict = defaultdict(list)
 
-# Find all valid pairs
-for letter in letters:
+# Find all valid pairs, streaming the letters
+print(f"Reading {NDJSON_FILE.name}...")
+letter_count = 0
+for letter in iter_letters(NDJSON_FILE):
+    letter_count += 1
     letter_id = letter.get('id')
     location_array = letter.get('metadata', {}).get('Location', [''])
     destination_array = letter.get('metadata', {}).get('Destination', [''])
@@ -63,18 +150,25 @@ for letter in letters:
     location = location_array[0].strip() if location_array else ''
     destination = destination_array[0].strip() if destination_array else ''
 
+    # Resolve spelling variants to locations.csv names
+    location = gazetteer.resolve(location)
+    destination = gazetteer.resolve(destination)
+
     # Check if both exist and are in valid locations
     if location and destination:
-        if location in valid_locations and destination in valid_locations:
+        if location in location_coords and destination in location_coords:
             # Normalize pair (always store alphabetically to treat bidirectional as same)
             pair_key = tuple(sorted([location, destination]))
             pairs_dict[pair_key].append(letter_id)
 
+gazetteer.save_cache()
+
+print(f"Found {letter_count} letters")
 print(f"Found {len(pairs_dict)} unique location pairs")
 
 # Write pairs.csv
-print("Writing pairs.csv...")
-with open('pairs.csv', 'w', newline='', encoding='utf-8') as f:
+print(f"Writing {PAIRS_CSV}...")
+with open(PAIRS_CSV, 'w', newline='', encoding='utf-8') as f:
     writer = csv.writer(f)
     writer.writerow(['Location1', 'Lat1', 'Lon1', 'Country1',
                      'Location2', 'Lat2', 'Lon2', 'Country2',
@@ -83,16 +177,43 @@ with open('pairs.csv', 'w', newline='', encoding='utf-8') as f:
     for (loc1, loc2), letter_ids in sorted(pairs_dict.items(),
                                             key=lambda x: len(x[1]),
                                             reverse=True):
-        coords1 = location_coords[loc1]
-        coords2 = location_coords[loc2]
+        lat1, lon1, country1 = location_coords[loc1]
+        lat2, lon2, country2 = location_coords[loc2]
 
         writer.writerow([
-            loc1, coords1['lat'], coords1['lon'], coords1['country'],
-            loc2, coords2['lat'], coords2['lon'], coords2['country'],
+            loc1, lat1, lon1, country1,
+            loc2, lat2, lon2, country2,
             len(letter_ids),
             ';'.join(map(str, sorted(letter_ids)))  # Use semicolon to avoid CSV quoting issues
         ])
 
+# Route geometry for the map, in the same order as pairs.csv
+pairs = sorted(pairs_dict.items(), key=lambda x: len(x[1]), reverse=True)
+routes, paths = [], []
+for index, ((loc1, loc2), letter_ids) in enumerate(pairs, 1):
+    lat1, lon1, _ = location_coords[loc1]
+    lat2, lon2, _ = location_coords[loc2]
+    distance = haversine_km(lat1, lon1, lat2, lon2)
+    curvature = curvature_for(index)
+    path = douglas_peucker(curved_route(lat1, lon1, lat2, lon2, curvature),
+                           SIMPLIFY_TOLERANCE)
+    routes.append([loc1, loc2, len(letter_ids), round(distance, 1), curvature, len(paths)])
+    paths.append(path)
+
+translate = [min((lon for path in paths for _, lon in path), default=0),
+             min((lat for path in paths for lat, _ in path), default=0)]
+translate = [math.floor(v) for v in translate]
+with open(ROUTES_JSON, 'w', encoding='utf-8') as f:
+    json.dump({
+        'transform': {'scale': [QUANTIZATION, QUANTIZATION], 'translate': translate},
+        'fields': ['location1', 'location2', 'count', 'distance_km', 'curvature', 'arc'],
+        'routes': routes,
+        'arcs': [encode_arc(path, translate) for path in paths],
+    }, f, ensure_ascii=False, separators=(',', ':'))
+print(f"Writing {ROUTES_JSON}: {len(routes)} routes, "
+      f"{sum(len(path) for path in paths)} points after simplification")
+
 print("Done! pairs.csv has been created.")
 print(f"Total pairs with letters: {len(pairs_dict)}")
 print(f"Total letter connections: {sum(len(ids) for ids in pairs_dict.values())}")
+gazetteer.print_unmatched()
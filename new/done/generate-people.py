@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Generate people.json: which letters mention which correspondents
+Links names in the letter texts to the people in metadata.Creator, so the
+browser can list "letters mentioning X" with an index lookup instead of
+scanning every text.
+
+Name variants
+-------------
+Every Creator except the translator entry (see corpus.letter_creators) is a
+candidate person, unless it names an organisation ("Stjørdalens Sparebank":
+a bank or council, or a name in place-names.txt or locations.csv). Creators
+whose names differ only by initials and small
+spelling variations (person_names.py: "Klara Korgstad" / "Klara Krogstad",
+"Ågot" / "Ågoth Søberg") are one person, named by their most used spelling.
+Each person is then looked for as:
+
+  every spelling of the full name
+  the full name without middle initials ("Alma Wilson")
+  the first name alone, unless another person shares it ("Axel", not "Sonja")
+  the surname alone, unless another person shares it ("Krogstad", not "Holm")
+
+plus the Norwegian genitive of each (an added -s: "Axels", "Holms"; names
+already ending in s have none). A first name or surname that is also a place
+name (place-names.txt, locations.csv) is not looked for alone, so the
+place is not counted as the person.
+
+All variants are compiled into one Aho–Corasick automaton (aho_corasick.py)
+and the Norwegian and English halves of every letter are scanned once.
+
+Output (people.json)
+--------------------
+  {
+    "people": [{"name", "variants", "letters_written"}, ...],
+    "index": [[[letter id, mentions], ...], ...]   per person, by letter id
+    "letters": {"<id>": [[person, lang, start, end], ...]}
+    "edges": [[a, b, letters], ...]   co-mentions: people mentioned in the
+                                      same letter, with the number of letters
+  }
+
+People are referred to by their index in "people". Offsets are UTF-16 code
+units into the half of the text named by lang ("no" or "en").
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from itertools import combinations
+from pathlib import Path
+
+NEW_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(NEW_DIR))
+from corpus import NDJSON_FILE, iter_letters, letter_creators, text_halves, utf16_offsets
+from aho_corasick import AhoCorasick
+from gazetteer import load_place_names, normalize
+from person_names import group_names, without_initials
+
+PEOPLE_JSON = NEW_DIR / 'people.json'
+
+# Creators that are businesses or institutions rather than people
+ORGANISATION_RE = re.compile(r'(?:bank|kommune|forening)\b|\b(?:company|co|inc|ltd|a/s)\b',
+                             re.IGNORECASE)
+
+def is_person(name, place_keys):
+    """False for organisations and for creators that are place names"""
+    return not ORGANISATION_RE.search(name) and normalize(name) not in place_keys
+
+def name_variants(groups, place_keys=frozenset()):
+    """
+    {variant: person index}, leaving out first and last names that are
+    shared or are place names (place_keys: normalized, see gazetteer.py)
+    """
+    first_names, surnames = defaultdict(set), defaultdict(set)
+    for person, (_, spellings) in enumerate(groups):
+        for spelling in spellings:
+            words = without_initials(spelling).split()
+            if len(words) > 1:
+                first_names[words[0]].add(person)
+                surnames[words[-1]].add(person)
+
+    variants = {}
+    for person, (_, spellings) in enumerate(groups):
+        names = set()
+        for spelling in spellings:
+            names.add(spelling)
+            short = without_initials(spelling)
+            names.add(short)
+            words = short.split()
+            if len(words) > 1:
+                if first_names[words[0]] == {person} and normalize(words[0]) not in place_keys:
+                    names.add(words[0])
+                if surnames[words[-1]] == {person} and normalize(words[-1]) not in place_keys:
+                    names.add(words[-1])
+        for name in names:
+            if name:
+                variants[name] = person
+                if not name.endswith('s'):
+                    variants.setdefault(name + 's', person)
+    return variants
+
+def collect_creators(corpus_path):
+    creator_counts = Counter()
+    for letter in iter_letters(corpus_path):
+        creator_counts.update(set(letter_creators(letter)))
+    return creator_counts
+
+def scan(corpus_path, automaton, pattern_people):
+    """Return ({id: mention list}, letters scanned)"""
+    by_letter = {}
+    scanned = 0
+    for letter in iter_letters(corpus_path):
+        scanned += 1
+        found = []
+        for lang, text in text_halves(letter):
+            offsets = utf16_offsets(text)
+            for start, end, pattern_id in automaton.find_longest(text):
+                if offsets:
+                    start, end = offsets[start], offsets[end]
+                found.append([pattern_people[pattern_id], lang, start, end])
+        if found:
+            by_letter[str(letter['id'])] = found
+    return by_letter, scanned
+
+def build_index(by_letter, people_count):
+    """Per-person [[letter id, mentions], ...] and co-mention edges"""
+    index = [[] for _ in range(people_count)]
+    pairs = Counter()
+    for letter_id in sorted(by_letter, key=int):
+        counts = Counter(person for person, _, _, _ in by_letter[letter_id])
+        for person, count in sorted(counts.items()):
+            index[person].append([int(letter_id), count])
+        pairs.update(combinations(sorted(counts), 2))
+    edges = [[a, b, count] for (a, b), count in sorted(pairs.items())]
+    return index, edges
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', default=NDJSON_FILE,
+                        help='letters.ndjson built by build-data.py')
+    parser.add_argument('--output', default=PEOPLE_JSON,
+                        help='where to write the index (default: people.json)')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Person Mentions")
+    print("=" * 60)
+
+    place_keys = {normalize(name) for name in load_place_names()}
+    creator_counts = collect_creators(args.corpus)
+    organisations = sorted(name for name in creator_counts if not is_person(name, place_keys))
+    for name in organisations:
+        del creator_counts[name]
+    groups = group_names(creator_counts)
+    print(f"Found {len(creator_counts)} creator names, {len(groups)} people")
+    if organisations:
+        print(f"  Not people: {', '.join(organisations)}")
+    for name, spellings in groups:
+        if len(spellings) > 1:
+            print(f"  {name}: {', '.join(spellings[1:])}")
+
+    variants = name_variants(groups, place_keys)
+    patterns = sorted(variants)
+    automaton = AhoCorasick(patterns)
+    print(f"Compiled {len(patterns)} name variants into {len(automaton):,} states")
+
+    started = time.monotonic()
+    by_letter, scanned = scan(args.corpus, automaton, [variants[p] for p in patterns])
+    print(f"Scanned {scanned} letters in {time.monotonic() - started:.2f}s")
+
+    index, edges = build_index(by_letter, len(groups))
+    people = [{'name': name,
+               'variants': sorted(v for v, person in variants.items() if person == i),
+               'letters_written': sum(creator_counts[s] for s in spellings)}
+              for i, (name, spellings) in enumerate(groups)]
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'people': people, 'index': index, 'letters': by_letter, 'edges': edges},
+                  f, ensure_ascii=False, separators=(',', ':'))
+    print(f"Saved {args.output} ({os.path.getsize(args.output):,} bytes)")
+
+    print(f"\n{len(by_letter)} letters mention someone; {len(edges)} co-mention pairs")
+    print("Most mentioned:")
+    ranked = sorted(range(len(groups)), key=lambda i: -len(index[i]))
+    for person in ranked[:10]:
+        mentions = sum(count for _, count in index[person])
+        print(f"  {len(index[person]):4d} letters  {mentions:4d} mentions  {groups[person][0]}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Generate places.csv: how often each known place is mentioned in the letters
+Used by the Places word cloud in tools/ (stats.js).
+
+The place list is place-names.txt (names as they are spelled in the letters)
+plus every name in locations.csv. All of them are compiled into a single
+Aho–Corasick automaton (aho_corasick.py), and the Norwegian and English
+halves of each letter are scanned once, so the cost grows with the length of
+the corpus rather than with the number of places. Matches are case-sensitive
+whole words; where names overlap the longest wins ("Oslo Lufthavn" is not
+also an "Oslo").
+
+Outputs:
+
+  places.csv           Rank,"Location",Mentions,Letter Count, most mentioned
+                       first; places that are never mentioned are left out
+  place-mentions.json  per-letter mention offsets, for highlighting:
+                       {"places": [name, ...],
+                        "letters": {"<id>": [[place, lang, start, end], ...]}}
+                       place indexes "places", lang is "no" or "en", and
+                       start/end are UTF-16 offsets into that half of the
+                       text as the viewer shows it (split on <-SPLITTLETTER->
+                       and trimmed)
+
+Letters are streamed from letters.ndjson (built by build-data.py).
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+NEW_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(NEW_DIR))
+from corpus import NDJSON_FILE, iter_letters, text_halves, utf16_offsets
+from aho_corasick import AhoCorasick
+from gazetteer import PLACE_NAMES, load_place_names
+
+PLACES_CSV = NEW_DIR / 'places.csv'
+MENTIONS_JSON = NEW_DIR / 'place-mentions.json'
+
+def scan(corpus_path, automaton, langs):
+    """Return (mentions, letter counts, {id: mention list}, letters scanned)"""
+    mentions = Counter()
+    letter_counts = Counter()
+    by_letter = {}
+    scanned = 0
+
+    for letter in iter_letters(corpus_path):
+        scanned += 1
+        found = []
+        for lang, text in text_halves(letter):
+            if lang not in langs:
+                continue
+            offsets = utf16_offsets(text)
+            for start, end, place in automaton.find_longest(text):
+                if offsets:
+                    start, end = offsets[start], offsets[end]
+                found.append([place, lang, start, end])
+
+        if found:
+            places = [place for place, _, _, _ in found]
+            mentions.update(places)
+            letter_counts.update(set(places))
+            by_letter[str(letter['id'])] = found
+
+    return mentions, letter_counts, by_letter, scanned
+
+def write_places_csv(path, names, mentions, letter_counts):
+    ranked = sorted(mentions, key=lambda p: (-mentions[p], -letter_counts[p], names[p]))
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        # Location is always quoted: stats.js matches Rank,"Location",N,N
+        f.write('Rank,Location,Mentions,Letter Count\n')
+        writer = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC, lineterminator='\n')
+        for rank, place in enumerate(ranked, 1):
+            writer.writerow([rank, names[place], mentions[place], letter_counts[place]])
+    return ranked
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lang', choices=['no', 'en', 'both'], default='both',
+                        help='which half of the letters to count (default: both)')
+    parser.add_argument('--corpus', default=NDJSON_FILE,
+                        help='letters.ndjson built by build-data.py')
+    parser.add_argument('--names', default=PLACE_NAMES,
+                        help='place names to look for (default: place-names.txt)')
+    args = parser.parse_args()
+    langs = {'no', 'en'} if args.lang == 'both' else {args.lang}
+
+    print("=" * 60)
+    print("Place Mentions")
+    print("=" * 60)
+
+    names = load_place_names(args.names)
+    automaton = AhoCorasick(names)
+    print(f"Compiled {len(names)} place names into {len(automaton):,} states")
+
+    started = time.monotonic()
+    mentions, letter_counts, by_letter, scanned = scan(args.corpus, automaton, langs)
+    print(f"Scanned {scanned} letters in {time.monotonic() - started:.2f}s")
+    print(f"Found {sum(mentions.values())} mentions of {len(mentions)} places "
+          f"in {len(by_letter)} letters")
+
+    ranked = write_places_csv(PLACES_CSV, names, mentions, letter_counts)
+    print(f"Saved {PLACES_CSV} ({len(ranked)} places)")
+
+    with open(MENTIONS_JSON, 'w', encoding='utf-8') as f:
+        json.dump({'places': names, 'letters': by_letter}, f,
+                  ensure_ascii=False, separators=(',', ':'))
+    print(f"Saved {MENTIONS_JSON} ({os.path.getsize(MENTIONS_JSON):,} bytes)")
+
+    print("\nMost mentioned:")
+    for place in ranked[:10]:
+        print(f"  {mentions[place]:5d}  {names[place]} ({letter_counts[place]} letters)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Generate replies.json: how long correspondents took to answer each other
+Pairs each letter A -> B with B's next letter back to A and summarizes the
+reply times per correspondent and per period, for the timeline view.
+
+Correspondents
+--------------
+By default the sides are people: the sender is the letter's Creator (without
+the translator entry) and the recipients are read from the Title
+("Axel Holm to John Holm 1946.12.11", "... to Edvard and Hanna Eidum ...").
+Spellings are merged with person_names.py ("Alma Vilson" is Alma C. Wilson).
+With --by place the sides are the letter's Location and Destination,
+resolved with the gazetteer.
+
+Matching
+--------
+Only letters whose LetterDate names a day are used (letter_dates.py). The
+letters of each pair of correspondents are sorted by date once and walked in
+a single merge pass, so no letter is compared with every other:
+
+  - a letter from B to A answers the most recent letter from A to B that is
+    still unanswered and was written at least --min-days (MIN_REPLY_DAYS)
+    and at most MAX_REPLY_DAYS before
+  - letters from A written fewer than --min-days before it crossed B's
+    letter in the mail: they are not answered by it and stay unanswered
+    until B writes again, so same-day letters in opposite directions are
+    never a 0-day reply
+  - earlier unanswered letters from A count as followed up (A wrote again
+    before hearing back) and get no reply time
+
+Output (replies.json)
+---------------------
+  {
+    "by": "person",
+    "min_reply_days": 7,
+    "max_reply_days": 365,
+    "period_years": 10,
+    "histogram_days": [14, 30, 60, 90, 180, 365],   upper bin edges
+    "replies": [[letter, reply, days], ...],
+    "overall": stats,
+    "correspondents": [{"from": A, "to": B, ...stats}, ...],   B answering A
+    "periods": [{"start": 1940, "end": 1949, ...stats}, ...]   by letter date
+  }
+
+where stats are {"replies", "unanswered", "followed_up", "min", "p25",
+"median", "p75", "max", "mean", "histogram"} in days.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+from pathlib import Path
+
+NEW_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(NEW_DIR))
+from corpus import NDJSON_FILE, first_value, iter_letters, letter_creators
+from gazetteer import Gazetteer
+from letter_dates import letter_date
+from person_names import NameIndex, group_names
+
+REPLIES_JSON = NEW_DIR / 'replies.json'
+
+# A reply can only be written once the letter has arrived: about a week by
+# air mail between Norway and America, which most of these letters crossed
+MIN_REPLY_DAYS = 7
+MAX_REPLY_DAYS = 365
+HISTOGRAM_DAYS = [14, 30, 60, 90, 180, 365]
+
+# "Sender to Recipient[ and Recipient] [Card|Stamped] 1946.12.11 [Partial Letter]";
+# everything from the first annotation word or the date on is left out
+RECIPIENTS_RE = re.compile(
+    r'\bto\s+(?:to\s+)?(.+?)'
+    r'(?:\s+(?:Card|Postcard|Envelope|Stamped|Postmarked|Partial|Undated|\d{4}\b).*)?$')
+
+# Placeholders for a recipient nobody knows
+UNKNOWN_RECIPIENTS = {'unknown', 'ukjent'}
+
+def title_recipients(title):
+    """Recipients named in an "X to Y" title; "Edvard and Hanna Eidum" is two people"""
+    match = RECIPIENTS_RE.search(title or '')
+    if not match:
+        return []
+    names = [n.strip() for n in re.split(r'\s+(?:and|og|&)\s+|,\s*', match.group(1))
+             if n.strip() and n.strip().casefold() not in UNKNOWN_RECIPIENTS]
+    if len(names) > 1:
+        surname = names[-1].split()[-1]
+        names = [n if ' ' in n else f"{n} {surname}" for n in names]
+    return names
+
+def person_sides(letter):
+    title = first_value(letter, 'Title')
+    return letter_creators(letter), title_recipients(title)
+
+def collect_letters(corpus_path, by):
+    """Return ([(date, id, senders, recipients)], skipped counts)"""
+    letters, skipped = [], Counter()
+    raw = []
+    for letter in iter_letters(corpus_path):
+        day = letter_date(letter)
+        if by == 'place':
+            senders, recipients = [first_value(letter, 'Location')], [first_value(letter, 'Destination')]
+        else:
+            senders, recipients = person_sides(letter)
+        senders, recipients = [s for s in senders if s], [r for r in recipients if r]
+        if day is None:
+            skipped['no full LetterDate'] += 1
+        elif not senders or not recipients:
+            skipped['sender or recipient unknown'] += 1
+        else:
+            raw.append((day, letter['id'], senders, recipients))
+
+    if by == 'place':
+        gazetteer = Gazetteer.from_csv()
+        resolve = lambda name: gazetteer.resolve(name) or name
+    else:
+        names = Counter(name for _, _, senders, _ in raw for name in senders)
+        index = NameIndex(group_names(names))
+        resolve = index.resolve
+
+    for day, letter_id, senders, recipients in raw:
+        senders = sorted({resolve(s) for s in senders})
+        recipients = sorted({resolve(r) for r in recipients} - set(senders))
+        if recipients:
+            letters.append((day, letter_id, senders, recipients))
+        else:
+            skipped['sender or recipient unknown'] += 1
+
+    if by == 'place':
+        gazetteer.save_cache()
+    return letters, skipped
+
+def match_replies(letters, min_days=MIN_REPLY_DAYS):
+    """
+    Sort-merge matching per pair of correspondents
+    Returns ([(a, b, letter, reply, days)], unanswered Counter, followed-up
+    Counter), the counters keyed by (a, b) for letters from a to b.
+    """
+    streams = defaultdict(list)  # (a, b) with a < b -> [(date, id, from a?)]
+    for day, letter_id, senders, recipients in letters:
+        for sender in senders:
+            for recipient in recipients:
+                pair = tuple(sorted((sender, recipient)))
+                streams[pair].append((day, letter_id, sender == pair[0]))
+
+    replies = []
+    unanswered, followed_up = Counter(), Counter()
+    for (first, second), stream in streams.items():
+        stream.sort()
+        pending = {True: [], False: []}  # unanswered letters from each side
+        for day, letter_id, from_first in stream:
+            waiting = pending[not from_first]
+            crossed = []
+            while waiting and (day - waiting[-1][0]).days < min_days:
+                crossed.append(waiting.pop())
+            if waiting:
+                sent_day, sent_id = waiting.pop()
+                direction = (second, first) if from_first else (first, second)
+                days = (day - sent_day).days
+                if days <= MAX_REPLY_DAYS:
+                    replies.append((*direction, sent_id, letter_id, days))
+                else:
+                    unanswered[direction] += 1
+                followed_up[direction] += len(waiting)
+                waiting.clear()
+            waiting.extend(reversed(crossed))
+            pending[from_first].append((day, letter_id))
+
+        unanswered[first, second] += len(pending[True])
+        unanswered[second, first] += len(pending[False])
+    return replies, unanswered, followed_up
+
+def percentile(values, fraction):
+    """Linear-interpolated percentile of sorted values"""
+    position = (len(values) - 1) * fraction
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return round(values[low] + (values[high] - values[low]) * (position - low), 1)
+
+def summarize(days, unanswered=0, followed_up=0):
+    days = sorted(days)
+    stats = {'replies': len(days), 'unanswered': unanswered, 'followed_up': followed_up}
+    if days:
+        histogram = [0] * len(HISTOGRAM_DAYS)
+        for value in days:
+            histogram[next(i for i, edge in enumerate(HISTOGRAM_DAYS) if value <= edge)] += 1
+        stats.update({
+            'min': days[0], 'p25': percentile(days, 0.25), 'median': percentile(days, 0.5),
+            'p75': percentile(days, 0.75), 'max': days[-1],
+            'mean': round(sum(days) / len(days), 1), 'histogram': histogram,
+        })
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--by', choices=['person', 'place'], default='person',
+                        help='correspondents are people (Creator/Title) or places')
+    parser.add_argument('--min-days', type=int, default=MIN_REPLY_DAYS,
+                        help='shortest time between a letter and its reply, in days '
+                             f'(default: {MIN_REPLY_DAYS})')
+    parser.add_argument('--period', type=int, default=10,
+                        help='years per period in the summary (default: 10)')
+    parser.add_argument('--corpus', default=NDJSON_FILE,
+                        help='letters.ndjson built by build-data.py')
+    parser.add_argument('--output', default=REPLIES_JSON,
+                        help='where to write the results (default: replies.json)')
+    args = parser.parse_args()
+    if args.period < 1:
+        parser.error('--period must be at least 1')
+    if not 0 <= args.min_days <= MAX_REPLY_DAYS:
+        parser.error(f'--min-days must be between 0 and {MAX_REPLY_DAYS}')
+
+    print("=" * 60)
+    print(f"Reply Times (by {args.by})")
+    print("=" * 60)
+
+    letters, skipped = collect_letters(args.corpus, args.by)
+    print(f"Found {len(letters)} dated letters with known correspondents")
+    for reason, count in skipped.most_common():
+        print(f"  Skipped {count}: {reason}")
+
+    replies, unanswered, followed_up = match_replies(letters, args.min_days)
+    dates = {letter_id: day for day, letter_id, _, _ in letters}
+
+    by_direction = defaultdict(list)
+    by_period = defaultdict(list)
+    for a, b, letter_id, reply_id, days in replies:
+        by_direction[a, b].append(days)
+        year = dates[letter_id].year
+        by_period[year - year % args.period].append(days)
+
+    directions = sorted(set(by_direction) | set(unanswered) | set(followed_up))
+    result = {
+        'by': args.by,
+        'min_reply_days': args.min_days,
+        'max_reply_days': MAX_REPLY_DAYS,
+        'period_years': args.period,
+        'histogram_days': HISTOGRAM_DAYS,
+        'replies': [[letter_id, reply_id, days]
+                    for _, _, letter_id, reply_id, days in sorted(replies, key=lambda r: r[2])],
+        'overall': summarize([r[4] for r in replies], sum(unanswered.values()),
+                             sum(followed_up.values())),
+        'correspondents': [{'from': a, 'to': b, **summarize(by_direction[a, b],
+                                                             unanswered[a, b], followed_up[a, b])}
+                           for a, b in directions],
+        'periods': [{'start': start, 'end': start + args.period - 1, **summarize(by_period[start])}
+                    for start in sorted(by_period)],
+    }
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"Saved {args.output} ({os.path.getsize(args.output):,} bytes)")
+
+    overall = result['overall']
+    print(f"\n{overall['replies']} replies, {overall['unanswered']} unanswered, "
+          f"{overall['followed_up']} followed up")
+    if replies:
+        print(f"Reply time: median {overall['median']} days "
+              f"(p25 {overall['p25']}, p75 {overall['p75']})")
+        print("\nMost replies:")
+        busiest = sorted(result['correspondents'], key=lambda c: -c['replies'])
+        for entry in busiest[:10]:
+            if entry['replies']:
+                print(f"  {entry['replies']:3d}  {entry['to']} answering {entry['from']}: "
+                      f"median {entry['median']} days")
+
+if __name__ == '__main__':
+    main()
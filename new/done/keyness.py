@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Keyness: the words that set one group of letters apart from another
+("letters from Norway vs. Dell Rapids", "1939-1945 vs. the rest").
+
+The term counts of every letter (term_counts.py, tokenized as in
+calculate_tfidf.py) are held in memory as one sparse matrix per language,
+letters by terms, in compressed sparse row form. A comparison sums the rows
+of group A, takes group B either the same way or as the corpus totals minus
+A ("rest"), and scores every term that occurs in either group:
+
+  ll        Dunning's log-likelihood G2, signed: positive where the term is
+            relatively more frequent in A
+  log_odds  log odds ratio of the term in A against B, with 0.5 added to
+            every count
+
+Terms are ranked by ll (or by log_odds with --rank log_odds) among those
+occurring at least --min-count times in the two groups together; the top
+terms of A and of B are returned.
+
+Groups
+------
+A group is a list of conditions that a letter must all meet, each
+field:value[,value...] matching any of the values:
+
+  id:1,5,10-20       letter ids
+  year:1939-1945     year of LetterDate (or Date), see letter_dates.py
+  creator:NAME       Creator, case-insensitive (translator entry left out)
+  location:NAME      Location; destination:NAME for Destination
+  tag:NAME           tag, case-insensitive
+  text:WORD          letters using the word, in either language
+
+Group B may also be "rest": every letter not in A (the default).
+
+Usage:
+  python3 keyness.py -a location:Stjørdal -b "location:Dell Rapids"
+  python3 keyness.py -a year:1939-1945 --lang en --limit 20
+  python3 keyness.py --serve              # JSON endpoint on port 8003
+
+Endpoint:
+  GET  /keyness?a=year:1939-1945&b=rest&lang=no&limit=30&rank=ll&min_count=3
+       (repeat a= or b= for more conditions)
+  POST /keyness  {"a": [ids], "b": [ids] or "rest", "lang", "limit", ...}
+"""
+
+import argparse
+import http.server
+import json
+import math
+import sys
+import time
+from array import array
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+NEW_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(NEW_DIR))
+from corpus import NDJSON_FILE, iter_letters, letter_creators
+from letter_dates import letter_range
+from term_counts import LANGUAGES, TermCounts
+
+PORT = 8003
+LIMIT = 30
+MIN_COUNT = 3
+RANKINGS = ('ll', 'log_odds')
+
+class SparseCounts:
+    """Letters x terms count matrix of one language, in compressed sparse row form"""
+
+    def __init__(self, rows):
+        """rows: one {term: count} per letter, in matrix row order"""
+        self.terms = []
+        self.term_ids = {}
+        self.indptr = array('l', [0])
+        self.indices = array('l')
+        self.data = array('l')
+        for row in rows:
+            for term, count in row.items():
+                term_id = self.term_ids.get(term)
+                if term_id is None:
+                    term_id = self.term_ids[term] = len(self.terms)
+                    self.terms.append(term)
+                self.indices.append(term_id)
+                self.data.append(count)
+            self.indptr.append(len(self.indices))
+        self.totals = self.sum_rows(range(len(self.indptr) - 1))
+
+    def sum_rows(self, rows):
+        """Dense list of term counts summed over the given rows"""
+        totals = [0] * len(self.terms)
+        indices, data = self.indices, self.data
+        for row in rows:
+            for i in range(self.indptr[row], self.indptr[row + 1]):
+                totals[indices[i]] += data[i]
+        return totals
+
+    def column(self, term):
+        """Rows in which a term occurs"""
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            return set()
+        return {row for row in range(len(self.indptr) - 1)
+                if term_id in self.indices[self.indptr[row]:self.indptr[row + 1]]}
+
+def log_likelihood(a, b, size_a, size_b):
+    """Signed G2 of a term seen a times in size_a tokens and b times in size_b"""
+    expected_a = size_a * (a + b) / (size_a + size_b)
+    expected_b = size_b * (a + b) / (size_a + size_b)
+    g2 = 2 * ((a * math.log(a / expected_a) if a else 0) +
+              (b * math.log(b / expected_b) if b else 0))
+    return g2 if a * size_b >= b * size_a else -g2
+
+def log_odds(a, b, size_a, size_b):
+    return math.log((a + 0.5) / (size_a - a + 0.5)) - math.log((b + 0.5) / (size_b - b + 0.5))
+
+def parse_ids(value):
+    ids = set()
+    for part in value.split(','):
+        low, _, high = part.strip().partition('-')
+        ids.update(range(int(low), int(high or low) + 1))
+    return ids
+
+class KeynessEngine:
+    """Term count matrices plus the facets needed to select groups of letters"""
+
+    def __init__(self, letters, term_counts):
+        self.ids = []
+        self.facets = []   # per row: {field: set of casefolded values}
+        rows = {lang: [] for lang in LANGUAGES}
+        for letter in letters:
+            counts = term_counts.counts(letter)
+            for lang in LANGUAGES:
+                rows[lang].append(counts[lang])
+            self.ids.append(letter['id'])
+            self.facets.append(self.letter_facets(letter))
+        self.row_of = {letter_id: row for row, letter_id in enumerate(self.ids)}
+        self.matrices = {lang: SparseCounts(lang_rows) for lang, lang_rows in rows.items()}
+
+    @classmethod
+    def from_corpus(cls, corpus_path=NDJSON_FILE):
+        term_counts = TermCounts()
+        engine = cls(iter_letters(corpus_path), term_counts)
+        term_counts.save_cache()
+        return engine
+
+    @staticmethod
+    def letter_facets(letter):
+        metadata = letter.get('metadata', {})
+        first = lambda field: ((metadata.get(field) or [''])[0] or '').strip().casefold()
+        date_range = letter_range(letter)
+        return {
+            'year': {date_range.start.year} if date_range else set(),
+            'creator': {c.casefold() for c in letter_creators(letter)},
+            'location': {first('Location')},
+            'destination': {first('Destination')},
+            'tag': {t.strip().casefold() for t in letter.get('tags') or [] if t},
+        }
+
+    def select(self, conditions):
+        """Rows of the letters meeting every field:value condition"""
+        rows = set(range(len(self.ids)))
+        for condition in conditions:
+            field, sep, value = condition.partition(':')
+            field = field.strip().lower()
+            if not sep or not value.strip():
+                raise ValueError(f"expected field:value, got {condition!r}")
+            if field == 'id':
+                rows &= {self.row_of[i] for i in parse_ids(value) if i in self.row_of}
+            elif field == 'year':
+                years = parse_ids(value)
+                rows &= {row for row in rows if self.facets[row]['year'] & years}
+            elif field == 'text':
+                found = set()
+                for word in value.split(','):
+                    word = word.strip().lower()
+                    for matrix in self.matrices.values():
+                        found |= matrix.column(word)
+                rows &= found
+            elif field in ('creator', 'location', 'destination', 'tag'):
+                wanted = {v.strip().casefold() for v in value.split(',')}
+                rows &= {row for row in rows if self.facets[row][field] & wanted}
+            else:
+                raise ValueError(f"unknown field {field!r}")
+        return rows
+
+    def rows_for_ids(self, letter_ids):
+        return {self.row_of[i] for i in letter_ids if i in self.row_of}
+
+    def compare(self, rows_a, rows_b=None, lang='no', limit=LIMIT,
+                min_count=MIN_COUNT, rank='ll'):
+        """
+        Keyness of rows_a against rows_b (every other row if None), as a
+        JSON-ready dict with the top terms of each group
+        """
+        if lang not in self.matrices:
+            raise ValueError(f"unknown language {lang!r}")
+        if rank not in RANKINGS:
+            raise ValueError(f"unknown ranking {rank!r}")
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        matrix = self.matrices[lang]
+        counts_a = matrix.sum_rows(sorted(rows_a))
+        if rows_b is None:
+            rows_b = set(range(len(self.ids))) - set(rows_a)
+            counts_b = [total - a for total, a in zip(matrix.totals, counts_a)]
+        else:
+            counts_b = matrix.sum_rows(sorted(rows_b))
+        size_a, size_b = sum(counts_a), sum(counts_b)
+
+        scored = []
+        if size_a and size_b:
+            for term_id, (a, b) in enumerate(zip(counts_a, counts_b)):
+                if a + b < min_count:
+                    continue
+                scored.append((log_likelihood(a, b, size_a, size_b),
+                               log_odds(a, b, size_a, size_b), term_id, a, b))
+        key = 0 if rank == 'll' else 1
+
+        def entries(items):
+            return [{'term': matrix.terms[term_id], 'a': a, 'b': b,
+                     'll': round(ll, 3), 'log_odds': round(lo, 3)}
+                    for ll, lo, term_id, a, b in items[:limit]]
+
+        return {
+            'lang': lang,
+            'rank': rank,
+            'a': {'letters': len(rows_a), 'tokens': size_a},
+            'b': {'letters': len(rows_b), 'tokens': size_b},
+            'a_terms': entries(sorted((s for s in scored if s[0] > 0),
+                                      key=lambda s: (-s[key], s[2]))),
+            'b_terms': entries(sorted((s for s in scored if s[0] < 0),
+                                      key=lambda s: (s[key], s[2]))),
+        }
+
+    def query(self, a, b='rest', **options):
+        """compare() for groups given as condition lists or letter ids"""
+        def rows(group):
+            if group == 'rest' or group == ['rest']:
+                return None
+            if not isinstance(group, list):
+                raise ValueError("a group is a list of letter ids or field:value conditions")
+            if all(isinstance(item, int) for item in group):
+                return self.rows_for_ids(group)
+            if not all(isinstance(item, str) for item in group):
+                raise ValueError("a group is a list of letter ids or field:value conditions")
+            return self.select(group)
+
+        if not a:
+            raise ValueError("group a is required")
+        rows_a = rows(a)
+        if rows_a is None:
+            raise ValueError("group a cannot be 'rest'")
+        started = time.perf_counter()
+        result = self.compare(rows_a, rows(b), **options)
+        result['ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+class KeynessHandler(http.server.BaseHTTPRequestHandler):
+    engine = None  # set in serve()
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def answer(self, params):
+        try:
+            options = {'lang': params.get('lang', 'no'),
+                       'limit': int(params.get('limit', LIMIT)),
+                       'min_count': int(params.get('min_count', MIN_COUNT)),
+                       'rank': params.get('rank', 'll')}
+            self.send_json(self.engine.query(params.get('a') or [], params.get('b') or 'rest',
+                                             **options))
+        except (TypeError, ValueError) as e:
+            self.send_json({'error': str(e)}, status=400)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path != '/keyness':
+            self.send_error(404, "Not found")
+            return
+        query = parse_qs(url.query)
+        params = {key: values[0] for key, values in query.items()}
+        params['a'] = query.get('a', [])
+        params['b'] = query.get('b', ['rest'])
+        self.answer(params)
+
+    def do_POST(self):
+        if urlsplit(self.path).path != '/keyness':
+            self.send_error(404, "Not found")
+            return
+        try:
+            length = int(self.headers['Content-Length'])
+            params = json.loads(self.rfile.read(length).decode('utf-8'))
+        except (TypeError, ValueError):
+            params = None
+        if not isinstance(params, dict):
+            self.send_json({'error': 'expected a JSON object'}, status=400)
+            return
+        self.answer(params)
+
+    def do_OPTIONS(self):
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.end_headers()
+
+def serve(engine, port):
+    KeynessHandler.engine = engine
+    with http.server.ThreadingHTTPServer(("", port), KeynessHandler) as httpd:
+        print(f"Keyness endpoint: http://localhost:{port}/keyness")
+        print("Press Ctrl+C to stop the server")
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            print("\n✓ Server stopped")
+
+def print_terms(title, terms):
+    print(f"\n{title}")
+    for i, entry in enumerate(terms, 1):
+        print(f"  {i:2d}. {entry['term']:20s} {entry['a']:5d} {entry['b']:5d}  "
+              f"LL {entry['ll']:8.2f}  log odds {entry['log_odds']:6.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-a', action='append', default=[], metavar='FIELD:VALUE',
+                        help='condition for group A (repeat to combine)')
+    parser.add_argument('-b', action='append', default=[], metavar='FIELD:VALUE',
+                        help='condition for group B, or "rest" (default)')
+    parser.add_argument('--lang', choices=list(LANGUAGES), default='no')
+    parser.add_argument('--rank', choices=RANKINGS, default='ll')
+    parser.add_argument('--limit', type=int, default=LIMIT, help='terms per group')
+    parser.add_argument('--min-count', type=int, default=MIN_COUNT,
+                        help='leave out terms seen fewer times in both groups together')
+    parser.add_argument('--serve', nargs='?', type=int, const=PORT, metavar='PORT',
+                        help=f'answer queries over HTTP (default port {PORT})')
+    parser.add_argument('--corpus', default=NDJSON_FILE,
+                        help='letters.ndjson built by build-data.py')
+    args = parser.parse_args()
+    if not args.serve and not args.a:
+        parser.error('give conditions for group A with -a, or --serve')
+    if args.limit < 1:
+        parser.error('--limit must be at least 1')
+
+    started = time.monotonic()
+    engine = KeynessEngine.from_corpus(args.corpus)
+    print(f"Loaded {len(engine.ids)} letters in {time.monotonic() - started:.2f}s "
+          + ', '.join(f"({lang}: {len(m.terms):,} terms, {len(m.data):,} entries)"
+                      for lang, m in engine.matrices.items()))
+
+    if args.serve:
+        serve(engine, args.serve)
+        return
+
+    try:
+        result = engine.query(args.a, args.b or 'rest', lang=args.lang, limit=args.limit,
+                              min_count=args.min_count, rank=args.rank)
+    except ValueError as e:
+        parser.error(str(e))
+
+    print("=" * 60)
+    print(f"A: {' & '.join(args.a)} ({result['a']['letters']} letters, "
+          f"{result['a']['tokens']:,} terms)")
+    print(f"B: {' & '.join(args.b) or 'rest'} ({result['b']['letters']} letters, "
+          f"{result['b']['tokens']:,} terms)")
+    print(f"Compared in {result['ms']} ms")
+    print("=" * 60)
+    print_terms(f"Key terms of A ({result['lang']}):", result['a_terms'])
+    print_terms(f"Key terms of B ({result['lang']}):", result['b_terms'])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Matching of person names across spellings
+The letters spell the same people in several ways ("Klara Krogstad" /
+"Klara Korgstad", "Alma C. Wilson" / "Alma Vilson"). Two names are taken to
+be the same person when, ignoring initials, they have the same number of
+words and each word is within a small edit distance of the other (the
+gazetteer's normalize() and max_distance()). A first name with an added -a
+is a different person ("Olav" / "Olava").
+
+Usage:
+  python3 person_names.py "Alma C. Wilson" "Alma Vilson"
+"""
+
+import sys
+from pathlib import Path
+
+NEW_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(NEW_DIR))
+from gazetteer import bounded_levenshtein, max_distance, normalize
+
+def without_initials(name):
+    """Name without single-letter words and abbreviations ("Alma C. Wilson" -> "Alma Wilson")"""
+    return ' '.join(word for word in name.split()
+                    if not (word.endswith('.') or len(word) == 1))
+
+def same_person(a, b):
+    """True if two names differ only by initials and small spelling variations"""
+    words_a = normalize(without_initials(a)).split()
+    words_b = normalize(without_initials(b)).split()
+    if not words_a or len(words_a) != len(words_b):
+        return False
+    for x, y in zip(words_a, words_b):
+        # A trailing -a usually makes a woman's name of a man's (Olav, Olava)
+        if x + 'a' == y or y + 'a' == x:
+            return False
+        if bounded_levenshtein(x, y, max_distance(min(x, y, key=len))) is None:
+            return False
+    return True
+
+def group_names(name_counts):
+    """[(canonical name, [spellings])]: the most used spelling names each group"""
+    groups = []
+    for name, _ in sorted(name_counts.items(), key=lambda item: (-item[1], item[0])):
+        for spellings in groups:
+            if same_person(spellings[0], name):
+                spellings.append(name)
+                break
+        else:
+            groups.append([name])
+    return [(spellings[0], spellings) for spellings in groups]
+
+class NameIndex:
+    """Resolves spellings to the canonical names of known people"""
+
+    def __init__(self, groups):
+        self.groups = groups
+        self.canonical = {spelling: name for name, spellings in groups for spelling in spellings}
+
+    def resolve(self, name):
+        """Canonical name for a spelling, or the name itself if nobody matches"""
+        name = ' '.join(name.split())
+        if name not in self.canonical:
+            match = next((canonical for canonical, _ in self.groups
+                          if same_person(canonical, name)), name)
+            self.canonical[name] = match
+        return self.canonical[name]
+
+def main():
+    names = sys.argv[1:]
+    for name, spellings in group_names({name: 1 for name in names}):
+        print(f"{name}: {', '.join(spellings)}")
+
+if __name__ == '__main__':
+    main()
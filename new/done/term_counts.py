@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Per-letter term counts, cached between runs
+The counting stages (build-term-cube.py and others) all need the same thing:
+how often each term occurs in the Norwegian and English halves of every
+letter. Terms are tokenized and stopword-filtered exactly as
+calculate_tfidf.py does it, with the stopwords of tools/stop.txt and
+tools/stop_en.txt.
+
+Counts are cached in term-counts.json under a hash of each letter's Text,
+so after an edit only the changed letters are tokenized again. The cache is
+dropped when the stopwords change.
+
+  {
+    "stopwords": hash,
+    "letters": {"<id>": {"text": hash, "no": {term: count}, "en": {term: count}}}
+  }
+
+Usage:
+  python3 term_counts.py            # update the cache
+  python3 term_counts.py 1 17       # also show the top terms of letters 1, 17
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+from collections import Counter
+from pathlib import Path
+
+NEW_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(NEW_DIR))
+from corpus import NDJSON_FILE, iter_letters
+from calculate_tfidf import BASE_STOPWORDS, STOPWORD_FILES, document_terms, load_stopwords
+
+CACHE_FILE = NEW_DIR / 'term-counts.json'
+TOOLS_DIR = NEW_DIR / 'tools'
+
+# Language codes as in people.json and place-mentions.json -> calculate_tfidf names
+LANGUAGES = {'no': 'norwegian', 'en': 'english'}
+
+def load_language_stopwords():
+    """{'no': stopwords, 'en': stopwords}: the stopword files plus BASE_STOPWORDS"""
+    return {lang: load_stopwords(TOOLS_DIR / STOPWORD_FILES[language]) | BASE_STOPWORDS[language]
+            for lang, language in LANGUAGES.items()}
+
+def text_hash(letter):
+    text = (letter.get('metadata', {}).get('Text') or [''])[0] or ''
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def count_terms(letter, stopwords):
+    """{'no': {term: count}, 'en': {term: count}} for one letter"""
+    return {lang: dict(Counter(document_terms(letter, language, stopwords[lang])))
+            for lang, language in LANGUAGES.items()}
+
+class TermCounts:
+    """Term counts of every letter, reusing cached counts for unchanged texts"""
+
+    def __init__(self, cache_path=CACHE_FILE, stopwords=None):
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.stopwords = stopwords if stopwords is not None else load_language_stopwords()
+        words = json.dumps({lang: sorted(s) for lang, s in self.stopwords.items()},
+                           ensure_ascii=False, sort_keys=True)
+        self.stopwords_hash = hashlib.sha1(words.encode('utf-8')).hexdigest()
+        self.cache = self._load_cache()
+        self._cache_dirty = False
+        self.reused = 0
+        self.counted = 0
+
+    def _load_cache(self):
+        if self.cache_path is None:
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        # Counts are only valid for the stopwords they were made with
+        if data.get('stopwords') != self.stopwords_hash:
+            return {}
+        return data.get('letters', {})
+
+    def save_cache(self):
+        if self.cache_path is None or not self._cache_dirty:
+            return
+        with open(self.cache_path, 'w', encoding='utf-8') as f:
+            json.dump({'stopwords': self.stopwords_hash, 'letters': self.cache},
+                      f, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+        self._cache_dirty = False
+
+    def counts(self, letter):
+        """{'no': {term: count}, 'en': {term: count}} for a letter"""
+        key = str(letter['id'])
+        digest = text_hash(letter)
+        entry = self.cache.get(key)
+        if entry is not None and entry.get('text') == digest:
+            self.reused += 1
+        else:
+            entry = {'text': digest, **count_terms(letter, self.stopwords)}
+            self.cache[key] = entry
+            self._cache_dirty = True
+            self.counted += 1
+        return {lang: entry[lang] for lang in LANGUAGES}
+
+    def update(self, letters):
+        """
+        {letter id: counts} for all letters, dropping cached letters that are
+        no longer in the corpus
+        """
+        by_letter = {}
+        for letter in letters:
+            by_letter[letter['id']] = self.counts(letter)
+        removed = set(self.cache) - {str(letter_id) for letter_id in by_letter}
+        for key in removed:
+            del self.cache[key]
+        if removed:
+            self._cache_dirty = True
+        return by_letter
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('letters', nargs='*', type=int, help='letter ids to show')
+    parser.add_argument('--top', type=int, default=15, help='terms to show per letter')
+    parser.add_argument('--corpus', default=NDJSON_FILE,
+                        help='letters.ndjson built by build-data.py')
+    args = parser.parse_args()
+
+    term_counts = TermCounts()
+    by_letter = term_counts.update(iter_letters(args.corpus))
+    term_counts.save_cache()
+    print(f"{len(by_letter)} letters: {term_counts.counted} counted, "
+          f"{term_counts.reused} from {CACHE_FILE.name}")
+
+    for letter_id in args.letters:
+        if letter_id not in by_letter:
+            print(f"\nLetter {letter_id}: not in the corpus")
+            continue
+        for lang, counts in by_letter[letter_id].items():
+            top = Counter(counts).most_common(args.top)
+            print(f"\nLetter {letter_id} ({lang}, {sum(counts.values())} terms): "
+                  + ', '.join(f"{term}({count})" for term, count in top))
+
+if __name__ == '__main__':
+    main()
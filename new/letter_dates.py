@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Parsing of letter dates
+metadata.LetterDate is normally ISO (1946-12-02) and metadata.Date dotted
+(1946.12.02, sometimes 1946.12.2); either may be partial (1914-10, 1963),
+name a season (1947 Summer), carry a question mark (1948 (?)) or be empty.
+
+parse_range() turns any of these into a DateRange(start, end, precision):
+the first and last day the value can mean, and how precise it is ('day',
+'month', 'season' or 'year'). A day that does not exist (1946.2.30) falls
+back to its month. letter_range() reads LetterDate, or Date for letters
+without one.
+
+parse_date() is the strict form: a date only for values that name a day.
+
+Usage:
+  python3 letter_dates.py 1946.12.2 1914-10 "1947 Summer" "1948 (?)"
+"""
+
+import calendar
+import re
+import sys
+from collections import namedtuple
+from datetime import date
+
+DateRange = namedtuple('DateRange', 'start end precision')
+
+# Season -> (first month, last month); winter is taken as the start of the year
+SEASONS = {
+    'spring': (3, 5), 'vår': (3, 5), 'var': (3, 5),
+    'summer': (6, 8), 'sommer': (6, 8),
+    'autumn': (9, 11), 'fall': (9, 11), 'høst': (9, 11), 'host': (9, 11),
+    'winter': (1, 2), 'vinter': (1, 2),
+}
+
+DATE_RE = re.compile(
+    r'^\s*(\d{4})(?:[-./](\d{1,2})(?:[-./](\d{1,2}))?)?'
+    r'(?:\s+([^\W\d_]+))?'      # season
+    r'\s*(?:\(\?\)|\?)?\s*$')   # uncertainty mark, ignored
+
+def month_range(year, first, last):
+    return date(year, first, 1), date(year, last, calendar.monthrange(year, last)[1])
+
+def parse_range(value):
+    """DateRange for a date value, or None if it names no year"""
+    match = DATE_RE.match(value or '')
+    if not match:
+        return None
+    year, month, day, season = match.groups()
+    year = int(year)
+    try:
+        if month and day:
+            try:
+                day = date(year, int(month), int(day))
+                return DateRange(day, day, 'day')
+            except ValueError:
+                pass
+        if month:
+            return DateRange(*month_range(year, int(month), int(month)), 'month')
+        if season:
+            months = SEASONS.get(season.casefold())
+            if months is None:
+                return None
+            return DateRange(*month_range(year, *months), 'season')
+        return DateRange(date(year, 1, 1), date(year, 12, 31), 'year')
+    except ValueError:
+        return None  # month out of range, or year 0
+
+def parse_date(value):
+    """date for a full year-month-day value; None for partial or invalid ones"""
+    parsed = parse_range(value)
+    return parsed.start if parsed and parsed.precision == 'day' else None
+
+def letter_date(letter, field='LetterDate'):
+    """Parsed date of a letter (see parse_date), from LetterDate by default"""
+    return parse_date((letter.get('metadata', {}).get(field) or [''])[0])
+
+def letter_range(letter):
+    """DateRange of a letter from LetterDate, falling back to Date; or None"""
+    metadata = letter.get('metadata', {})
+    for field in ('LetterDate', 'Date'):
+        parsed = parse_range((metadata.get(field) or [''])[0])
+        if parsed:
+            return parsed
+    return None
+
+def main():
+    for value in sys.argv[1:]:
+        parsed = parse_range(value)
+        if parsed:
+            print(f"{value!r}: {parsed.start} .. {parsed.end} ({parsed.precision})")
+        else:
+            print(f"{value!r}: not a date")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Letter storage backends for the build and editing tools
+
+Two interchangeable stores hold the corpus, keyed by letter id:
+
+  DirectoryStore  one pretty-printed XXXX.json per letter (letters-raw/)
+  SQLiteStore     a single packed file (e.g. letters.db) with batched,
+                  transactional writes and random access by id
+
+letters-raw/ stays the export/import format. Convert between the two with:
+
+  python3 letter_store.py import letters-raw letters.db
+  python3 letter_store.py export letters.db letters-raw
+
+Tools pick the backend from the path they are given: *.db / *.sqlite files
+open a SQLiteStore, anything else is treated as a letter directory.
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Letter files are XXXX.json; timestamped backups (XXXX.YYYYMMDD_HHMMSS.json) are ignored
+LETTER_FILE_RE = re.compile(r'^(\d+)\.json$')
+SQLITE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+
+# Read once at import: os.umask() can only be queried by setting it, which
+# isn't safe once the editing server has started its threads
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def dump_letter(letter):
+    """Serialize a letter the way letters-raw/ files are written"""
+    return json.dumps(letter, ensure_ascii=False, indent=2)
+
+def _write_temp(path, text):
+    """Write text to a synced temp file next to path; returns the temp path"""
+    try:
+        mode = path.stat().st_mode & 0o777
+    except FileNotFoundError:
+        # mkstemp() creates 0600 files; use what open() would have given
+        mode = 0o666 & ~_UMASK
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp')
+    try:
+        os.chmod(tmp_path, mode)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        _discard(tmp_path)
+        raise
+    return tmp_path
+
+def _discard(tmp_path):
+    try:
+        os.unlink(tmp_path)
+    except FileNotFoundError:
+        pass
+
+def atomic_write(path, text):
+    """
+    Write a text file by writing a temp file next to it and renaming it over
+    the target, so readers never see a half-written file
+    """
+    path = Path(path)
+    tmp_path = _write_temp(path, text)
+    try:
+        os.replace(tmp_path, path)
+    except BaseException:
+        _discard(tmp_path)
+        raise
+
+def atomic_write_many(files):
+    """
+    Write several (path, text) files: every temp file is written and synced
+    before any is renamed into place, so a failure while writing leaves all
+    targets untouched
+    """
+    written = []
+    try:
+        for path, text in files:
+            path = Path(path)
+            written.append((_write_temp(path, text), path))
+    except BaseException:
+        for tmp_path, _ in written:
+            _discard(tmp_path)
+        raise
+
+    for tmp_path, path in written:
+        os.replace(tmp_path, path)
+
+def letter_id_from_filename(filename):
+    """Return the letter id for 'XXXX.json', or None for anything else"""
+    match = LETTER_FILE_RE.match(os.path.basename(filename))
+    return int(match.group(1)) if match else None
+
+class DirectoryStore:
+    """Letters stored as individual XXXX.json files"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def __repr__(self):
+        return f"DirectoryStore({str(self.path)!r})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.ids())
+
+    def __contains__(self, letter_id):
+        return self.path_for(letter_id).exists()
+
+    def close(self):
+        pass
+
+    def path_for(self, letter_id):
+        return self.path / f"{int(letter_id):04d}.json"
+
+    def ids(self):
+        """Sorted ids of all letters in the store"""
+        ids = []
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                letter_id = letter_id_from_filename(entry.name)
+                if letter_id is not None:
+                    ids.append(letter_id)
+        return sorted(ids)
+
+    def stamps(self):
+        """Map id -> stamp for every letter, from a single directory scan"""
+        stamps = {}
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                letter_id = letter_id_from_filename(entry.name)
+                if letter_id is not None:
+                    try:
+                        stamps[letter_id] = entry.stat().st_mtime_ns
+                    except FileNotFoundError:
+                        continue
+        return stamps
+
+    def stamp(self, letter_id):
+        """Opaque value that changes whenever the letter is rewritten"""
+        try:
+            return self.path_for(letter_id).stat().st_mtime_ns
+        except FileNotFoundError:
+            raise KeyError(letter_id) from None
+
+    def get_raw(self, letter_id):
+        """Stored JSON text of a letter"""
+        try:
+            with open(self.path_for(letter_id), 'r', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            raise KeyError(letter_id) from None
+
+    def get(self, letter_id):
+        return json.loads(self.get_raw(letter_id))
+
+    def iter_raw(self):
+        """Yield (id, JSON text) for every letter in id order"""
+        for letter_id in self.ids():
+            try:
+                yield letter_id, self.get_raw(letter_id)
+            except KeyError:
+                continue  # removed while iterating
+
+    def iter_letters(self):
+        """Yield every letter in id order"""
+        for letter_id, raw in self.iter_raw():
+            yield json.loads(raw)
+
+    def put(self, letter):
+        atomic_write(self.path_for(letter['id']), dump_letter(letter))
+
+    def put_many(self, letters):
+        """Write all letters, renaming them into place only once all are written"""
+        atomic_write_many((self.path_for(letter['id']), dump_letter(letter))
+                          for letter in letters)
+
+    def delete(self, letter_id):
+        try:
+            self.path_for(letter_id).unlink()
+        except FileNotFoundError:
+            raise KeyError(letter_id) from None
+
+class SQLiteStore:
+    """Letters packed into one SQLite file, one row per letter"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS letters (
+            id INTEGER PRIMARY KEY,
+            modified TEXT,
+            stamp INTEGER NOT NULL,
+            body TEXT NOT NULL
+        )
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        # One connection shared between threads (the editing server is
+        # threaded); every use is serialized through self._lock
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(self.SCHEMA)
+        self.conn.commit()
+
+    def __repr__(self):
+        return f"SQLiteStore({str(self.path)!r})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute('SELECT COUNT(*) FROM letters').fetchone()[0]
+
+    def __contains__(self, letter_id):
+        with self._lock:
+            row = self.conn.execute('SELECT 1 FROM letters WHERE id = ?',
+                                    (int(letter_id),)).fetchone()
+        return row is not None
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def ids(self):
+        with self._lock:
+            return [row[0] for row in self.conn.execute('SELECT id FROM letters ORDER BY id')]
+
+    def _fetch_one(self, column, letter_id):
+        with self._lock:
+            row = self.conn.execute(f'SELECT {column} FROM letters WHERE id = ?',
+                                    (int(letter_id),)).fetchone()
+        if row is None:
+            raise KeyError(letter_id)
+        return row[0]
+
+    def stamps(self):
+        with self._lock:
+            return dict(self.conn.execute('SELECT id, stamp FROM letters'))
+
+    def stamp(self, letter_id):
+        return self._fetch_one('stamp', letter_id)
+
+    def get_raw(self, letter_id):
+        return self._fetch_one('body', letter_id)
+
+    def get(self, letter_id):
+        return json.loads(self.get_raw(letter_id))
+
+    def iter_raw(self, batch_size=500):
+        """Yield (id, JSON text) for every letter in id order"""
+        last_id = -1
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    'SELECT id, body FROM letters WHERE id > ? ORDER BY id LIMIT ?',
+                    (last_id, batch_size)).fetchall()
+            if not rows:
+                return
+            yield from rows
+            last_id = rows[-1][0]
+
+    def iter_letters(self):
+        for letter_id, raw in self.iter_raw():
+            yield json.loads(raw)
+
+    def put(self, letter):
+        self.put_many([letter])
+
+    def put_many(self, letters):
+        """Write all letters in a single transaction"""
+        stamp = time.time_ns()
+        rows = [
+            (int(letter['id']), letter.get('modified'), stamp,
+             json.dumps(letter, ensure_ascii=False, separators=(',', ':')))
+            for letter in letters
+        ]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO letters (id, modified, stamp, body) VALUES (?, ?, ?, ?)',
+                rows)
+
+    def delete(self, letter_id):
+        with self._lock, self.conn:
+            cursor = self.conn.execute('DELETE FROM letters WHERE id = ?', (int(letter_id),))
+        if cursor.rowcount == 0:
+            raise KeyError(letter_id)
+
+def open_store(path):
+    """Open a SQLiteStore for *.db files, otherwise a DirectoryStore"""
+    path = Path(path)
+    if path.suffix.lower() in SQLITE_SUFFIXES:
+        return SQLiteStore(path)
+    return DirectoryStore(path)
+
+def copy_letters(source, dest, batch_size=500):
+    """Copy every letter from one store into another, in batches"""
+    batch = []
+    count = 0
+    for letter in source.iter_letters():
+        batch.append(letter)
+        if len(batch) >= batch_size:
+            dest.put_many(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        dest.put_many(batch)
+        count += len(batch)
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert between letter stores')
+    parser.add_argument('command', choices=['import', 'export'],
+                        help='import: directory -> packed store, export: packed store -> directory')
+    parser.add_argument('source')
+    parser.add_argument('dest')
+    args = parser.parse_args()
+
+    with open_store(args.source) as source, open_store(args.dest) as dest:
+        print(f"Copying letters from {source} to {dest}...")
+        count = copy_letters(source, dest)
+    print(f"✓ Copied {count} letters")
+
+if __name__ == '__main__':
+    main()